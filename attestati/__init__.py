@@ -0,0 +1,10 @@
+"""
+Generazione dei documenti (attestati .docx e archivi ZIP) a partire dai modelli Word.
+"""
+from .generatore import (
+    generate_certificate_sync, render_certificate_sync, render_certificate_stored,
+    generate_merged_sync, generate_zip_sync,
+)
+from .artefatti import ArtefactStore, artefact_key
+from .template_cache import get_template, invalidate_template, get_template_cache_stats
+from .rendering import RenderTask, render_certificates
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+# --- ARCHIVIO DEI DOCUMENTI GENERATI (indirizzato per contenuto) ---
+# Ogni attestato generato si salva una volta sola in una cartella locale, con nome =
+# hash del modello (contenuto del file) + mappa dati. Lo stesso attestato rigenerato con
+# lo stesso modello ha la stessa chiave: non si rifà il rendering, si rilegge il file.
+# T_DOCUMENTI_ATTESTATI collega ogni ID_ATTESTATO alla sua chiave: dall'archivio si
+# scarica o si ristampa senza rigenerare. I documenti non più collegati (attestato rigenerato
+# con altri dati o un altro modello) si tolgono con unlinked() + remove() (JobRunner.purge_store).
+
+DEFAULT_STORE_DIR = 'artefatti'
+DOCUMENT_EXT = '.docx'
+# Un documento più giovane di così non si toglie: il lavoro che l'ha scritto può non averlo
+# ancora collegato (il collegamento si registra a fine lotto)
+DEFAULT_GRACE_SECONDS = 86400
+# Chiavi controllate sul database per ogni query
+UNLINKED_BATCH = 1000
+
+
+def artefact_key(template_digest, data_map):
+    """Chiave del documento: sha256 del modello e della mappa dati (ordinata, valori come testo)."""
+    h = hashlib.sha256(template_digest.encode('ascii'))
+    h.update(json.dumps(data_map, sort_keys=True, default=str, ensure_ascii=False).encode('utf-8'))
+    return h.hexdigest()
+
+
+class ArtefactStore:
+    """File sotto root/<2 caratteri>/<chiave>.docx; la scrittura è atomica (file temporaneo + rename)."""
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key + DOCUMENT_EXT)
+
+    def exists(self, key):
+        return bool(key) and os.path.exists(self.path(key))
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, content):
+        path = self.path(key)
+        if os.path.exists(path):
+            # Riusato da un lavoro in corso: il periodo di grazia della pulizia riparte da ora
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return path
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            # Due processi con lo stesso documento: vince l'ultimo, il contenuto è identico
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return path
+
+    def _candidates(self, grace_seconds):
+        """(chiave, percorso) dei documenti e dei .part rimasti più vecchi del periodo di grazia."""
+        limit = time.time() - grace_seconds
+        if not os.path.isdir(self.root):
+            return
+        for folder in os.scandir(self.root):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                try:
+                    if entry.stat().st_mtime >= limit:
+                        continue
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith(DOCUMENT_EXT):
+                    yield entry.name[:-len(DOCUMENT_EXT)], entry.path
+                elif entry.name.endswith('.part'):
+                    yield None, entry.path
+
+    def unlinked(self, linked_hashes, grace_seconds=DEFAULT_GRACE_SECONDS):
+        """
+        Percorsi da togliere: documenti le cui chiavi non sono collegate a nessun attestato
+        (linked_hashes(chiavi) -> chiavi collegate, a blocchi di UNLINKED_BATCH) e .part orfani.
+        """
+        found, batch = [], {}
+
+        def check():
+            linked = linked_hashes(list(batch))
+            found.extend(p for k, p in batch.items() if k not in linked)
+            batch.clear()
+
+        for key, path in self._candidates(grace_seconds):
+            if key is None:
+                found.append(path)
+                continue
+            batch[key] = path
+            if len(batch) >= UNLINKED_BATCH:
+                check()
+        if batch:
+            check()
+        return found
+
+    @staticmethod
+    def remove(paths):
+        removed = 0
+        for path in paths:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
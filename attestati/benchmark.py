@@ -0,0 +1,74 @@
+"""
+Attestati al secondo: generazione classica (Document() + save per ogni attestato)
+contro la cache dei modelli compilati.
+
+    python -m attestati.benchmark [modello.docx] [-n 200]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from docx import Document
+
+from .generatore import generate_certificate_sync
+from .template_cache import invalidate_template
+
+SAMPLE_MAP = {
+    "{{COGNOME}}": "ROSSI", "{{NOME}}": "MARIO", "{{CODICE}}": "ANT-BASE",
+    "{{CF}}": "RSSMRA80A01L103X", "{{DATA_NASCITA}}": "01/01/1980", "{{LUOGO_NASCITA}}": "TERAMO",
+    "{{SOCIETA}}": "ACME SRL", "{{NOME_CORSO}}": "Formazione generale dei lavoratori",
+    "{{DATA_SVOLGIMENTO}}": "03/12/2025 - 05/12/2025", "{{ORE_DURATA}}": 4,
+    "{{DATA_RILASCIOAT}}": "05/12/2025", "{{SIGLA}}": "ANT-BASE", "{{DOCENTE}}": "BIANCHI LUCA",
+    "{{PROGRAMMA}}": "Concetti di rischio, danno, prevenzione, protezione.",
+}
+
+
+def _legacy_certificate(data_map, template_file, out_path):
+    # Come faceva generate_certificate_sync prima della cache
+    doc = Document(template_file)
+
+    def replace_in_p(p, m):
+        if not p.text: return
+        for k, v in m.items():
+            if k in p.text:
+                p.text = p.text.replace(k, str(v) if v is not None else '')
+
+    for p in doc.paragraphs: replace_in_p(p, data_map)
+    for t in doc.tables:
+        for r in t.rows:
+            for c in r.cells:
+                for p in c.paragraphs: replace_in_p(p, data_map)
+    doc.save(out_path)
+
+
+def _run(label, n, fn):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {n:>5} attestati  {elapsed:7.2f} s  {n / elapsed:8.1f} attestati/s")
+    return n / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m attestati.benchmark', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('template', nargs='?', default=os.path.join('templates', 'modello.docx'))
+    parser.add_argument('-n', type=int, default=200, help="attestati per ciascuna prova (default 200)")
+    args = parser.parse_args(argv)
+
+    out_dir = tempfile.mkdtemp(prefix='wsm_bench_')
+    try:
+        before = _run("prima (Document + save)", args.n,
+                      lambda i: _legacy_certificate(SAMPLE_MAP, args.template, os.path.join(out_dir, f"old_{i}.docx")))
+        invalidate_template(args.template)
+        after = _run("dopo (modello in cache)", args.n,
+                     lambda i: generate_certificate_sync(dict(SAMPLE_MAP, **{"{{NOME}}": f"MARIO {i}"}), args.template, out_dir))
+        print(f"Speedup: x{after / before:.1f}")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
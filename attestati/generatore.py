@@ -0,0 +1,108 @@
+import os
+import re
+import zipfile
+from datetime import datetime, date
+
+from .artefatti import ArtefactStore, artefact_key
+from .template_cache import get_template
+
+# --- GENERAZIONE ATTESTATI (condivisa da tutte le versioni dell'app) ---
+def _prepare(data_map, template_file):
+    if not os.path.exists(template_file): raise FileNotFoundError("Template mancante")
+    
+    # Modello letto e analizzato una volta sola per lotto (vedi template_cache.py)
+    template = get_template(template_file)
+    local_map = data_map.copy()
+    
+    # --- 1. FIX FORMATO DATA NASCITA (Invariato) ---
+    dob = local_map.get("{{DATA_NASCITA}}")
+    if isinstance(dob, (datetime, date)): 
+        local_map["{{DATA_NASCITA}}"] = dob.strftime('%d/%m/%Y')
+    elif isinstance(dob, str) and '-' in dob:
+        try:
+            dt_obj = datetime.strptime(dob.strip(), '%Y-%m-%d')
+            local_map["{{DATA_NASCITA}}"] = dt_obj.strftime('%d/%m/%Y')
+        except ValueError: pass 
+
+    # --- 2. SOSTITUZIONE NEL WORD ---
+    # Fatta in template.save(): una passata per parte (anche intestazioni, piè di pagina e
+    # caselle di testo), senza perdere la formattazione dei run (vedi placeholders.py)
+
+    # --- 3. COSTRUZIONE NOME FILE PERSONALIZZATO ---
+    
+    # A. Estrazione Dati Base
+    # .strip() toglie spazi extra ai lati, .upper() forza il maiuscolo
+    cognome = str(local_map.get('{{COGNOME}}', 'COGNOME')).strip().upper()
+    nome = str(local_map.get('{{NOME}}', 'NOME')).strip().upper()
+    azienda = str(local_map.get('{{SOCIETA}}', 'PRIVATI')).strip().upper()
+    
+    # Se azienda è vuota o None, mettiamo PRIVATI
+    if not azienda or azienda == 'NONE': 
+        azienda = "PRIVATI"
+
+    # B. Calcolo Mese e Anno (es. DIC 25)
+    # Usiamo la data rilascio presente nella mappa (formato atteso: gg/mm/aaaa)
+    data_txt = str(local_map.get('{{DATA_RILASCIOAT}}', ''))
+    
+    mesi_ita = ["", "GEN", "FEB", "MAR", "APR", "MAG", "GIU", "LUG", "AGO", "SET", "OTT", "NOV", "DIC"]
+    mese_str = "GEN" # Default
+    anno_str = "25"  # Default
+
+    try:
+        # Se la data c'è (es. "03/12/2025") la splittiamo
+        if '/' in data_txt:
+            parti = data_txt.split('/') # diventa ['03', '12', '2025']
+            if len(parti) == 3:
+                num_mese = int(parti[1]) # prende 12
+                mese_str = mesi_ita[num_mese] # prende "DIC" dalla lista
+                anno_str = parti[2][-2:] # prende gli ultimi 2 caratteri dell'anno ("25")
+    except:
+        pass # In caso di errore usa i default o la data di oggi
+
+    nome_grezzo = f"{cognome} {nome} {mese_str} {anno_str} {azienda}"
+    
+    fname = re.sub(r'[^\w\s\.\-]', '', nome_grezzo)
+    
+    # Rimuove doppi spazi eventuali creati dalla pulizia
+    fname = re.sub(r'\s+', ' ', fname).strip() + ".docx"
+
+    # -----------------------------------------------
+
+    return template, local_map, fname
+
+def generate_certificate_sync(data_map, template_file="modello.docx", output_dir=None):
+    template, local_map, fname = _prepare(data_map, template_file)
+    out_path = os.path.join(output_dir, fname) if output_dir else fname
+    return template.save(out_path, local_map)
+
+def render_certificate_sync(data_map, template_file="modello.docx"):
+    """Come generate_certificate_sync, ma senza file: restituisce (nome file, bytes del .docx)."""
+    template, local_map, fname = _prepare(data_map, template_file)
+    return fname, template.render(local_map)
+
+def render_certificate_stored(data_map, template_file, store_root):
+    """
+    Come render_certificate_sync, passando dall'archivio dei documenti: restituisce
+    (nome file, bytes, chiave). Se il documento c'è già non si rifà il rendering.
+    """
+    template, local_map, fname = _prepare(data_map, template_file)
+    store = ArtefactStore(store_root)
+    key = artefact_key(template.digest, local_map)
+    content = store.get(key)
+    if content is None:
+        content = template.render(local_map)
+        store.put(key, content)
+    return fname, content, key
+
+def generate_merged_sync(data_maps, template_file, out_path):
+    """Documento unico per la stampa di una sessione: tutti gli attestati, uno per pagina."""
+    if not os.path.exists(template_file): raise FileNotFoundError("Template mancante")
+    template = get_template(template_file)
+    # Stessa preparazione dei dati del singolo attestato, una mappa alla volta
+    maps = (_prepare(m, template_file)[1] for m in data_maps)
+    return template.save_merged(out_path, maps)
+
+def generate_zip_sync(files, base, name="attestati.zip"):
+    with zipfile.ZipFile(name, 'w', zipfile.ZIP_DEFLATED) as z:
+        for f in files: z.write(f, arcname=os.path.relpath(f, base))
+    return name
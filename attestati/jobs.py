@@ -0,0 +1,390 @@
+import asyncio
+import logging
+import os
+import shutil
+import socket
+import time
+import uuid
+import zipfile
+from datetime import date
+
+from db import AttestatiRepo, AsyncAttestatiRepo, AsyncJobRepo, operation
+
+from .artefatti import DEFAULT_STORE_DIR, ArtefactStore
+from .generatore import generate_merged_sync
+from .pdf import PdfConverter
+from .rendering import RenderTask, render_certificates
+
+logger = logging.getLogger()
+
+# --- CODA DEI LAVORI IN BACKGROUND ---
+# La generazione di un lotto non gira più nel click della pagina: on_generate prepara i dati
+# (mappe, cartelle, numeri di sessione) e li salva come lavoro in T_LAVORI. Il JobRunner,
+# avviato con l'app, esegue i lavori in ordine, al massimo max_concurrent insieme
+# (ognuno usa già tutti i core per il rendering). Ogni JobRunner ha un suo ID (ESECUTORE)
+# e segnala di essere vivo ogni heartbeat_seconds sui lavori che esegue: solo quelli senza
+# segnali da stale_seconds (processo morto) tornano in coda e ripartono da capo, così una
+# seconda istanza dell'app o un riavvio non rieseguono i lavori di un esecutore ancora attivo.
+# Rieseguire un lavoro abbandonato è sicuro: il rendering è ripetibile e il salvataggio
+# degli attestati è un upsert, quindi non crea doppioni.
+
+JOB_TYPE_ATTESTATI = 'attestati'
+
+# Config "jobs": {"max_concurrent": 1, "output_dir": "exports", "keep_days": 7, "store_dir": "artefatti",
+#                "heartbeat_seconds": 30, "stale_seconds": 120}
+DEFAULT_MAX_CONCURRENT = 1
+DEFAULT_OUTPUT_DIR = 'exports'
+DEFAULT_KEEP_DAYS = 7
+
+# ZIP ancora in scrittura
+PART_SUFFIX = '.part'
+
+# Formati di uscita degli attestati
+FORMAT_DOCX = 'docx'
+FORMAT_PDF = 'pdf'
+# Esito della conversione di ogni attestato, aggiunto allo ZIP in modalità PDF
+PDF_REPORT_NAME = 'conversione_pdf.csv'
+# Documento unico per la stampa, nella cartella di ogni sessione
+MERGED_NAME = 'STAMPA {group}.docx'
+
+# Ogni quanto si ricontrolla la coda se nessuno sveglia il runner
+POLL_SECONDS = 5
+# Scritture dell'avanzamento su DB al massimo una volta ogni ...
+PROGRESS_EVERY_SECONDS = 1.0
+# Segnale di vita sui lavori in corso e controllo di quelli abbandonati, ogni ...
+HEARTBEAT_SECONDS = 30
+# Un lavoro in corso senza segnali da ... secondi è abbandonato (tenere ben sopra HEARTBEAT_SECONDS)
+STALE_SECONDS = 120
+# Pulizia dell'archivio dei documenti (quelli non più collegati a un attestato): all'avvio e ogni ...
+STORE_PURGE_SECONDS = 86400
+
+
+def build_job_params(tasks, records, zip_name, formato=FORMAT_DOCX, merge=False):
+    """
+    Parametri del lavoro (salvati come JSON):
+    tasks = [(mappa dati, modello, cartella relativa, sessione)], records = [(id_soggetto, id_corso, data)].
+    Con merge, per ogni sessione si aggiunge allo ZIP un documento unico con tutti i suoi attestati.
+    """
+    return {
+        'tasks': [{'data_map': m, 'template': t, 'dir': d, 'group': g} for m, t, d, g in tasks],
+        'records': [[s, c, d.isoformat()] for s, c, d in records],
+        'zip_name': zip_name,
+        'formato': formato,
+        'merge': merge,
+    }
+
+
+class JobRunner:
+    def __init__(self, submit, max_concurrent=DEFAULT_MAX_CONCURRENT, output_dir=DEFAULT_OUTPUT_DIR,
+                 keep_days=DEFAULT_KEEP_DAYS, soffice=None, store_dir=DEFAULT_STORE_DIR,
+                 heartbeat_seconds=HEARTBEAT_SECONDS, stale_seconds=STALE_SECONDS):
+        self.submit = submit                  # esegue una funzione in un processo (run.cpu_bound)
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.output_dir = output_dir
+        self.keep_days = keep_days
+        self.soffice = soffice
+        self.store_dir = store_dir            # archivio dei documenti generati (artefatti.py)
+        self._pdf = None                      # PdfConverter, avviato al primo lavoro in PDF
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = max(stale_seconds, 2 * heartbeat_seconds)
+        # Identifica questo processo in T_LAVORI.ESECUTORE
+        self.runner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[-64:]
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._wake = asyncio.Event()
+        self._loop_task = None
+        self._heartbeat_task = None
+        self._store_task = None
+        self._running = set()
+
+    # --- Ciclo di vita ---
+    async def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        await asyncio.to_thread(self.purge, True)
+        try:
+            await self._requeue_stale()
+        except Exception as e:
+            logger.error(f"Coda lavori non disponibile (migrazioni 5 e 11 applicate?): {e}")
+        self._loop_task = asyncio.create_task(self._loop())
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._store_task = asyncio.create_task(self._store_cleanup())
+
+    async def stop(self):
+        tasks = [t for t in (self._loop_task, self._heartbeat_task, self._store_task, *self._running) if t]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # I lavori interrotti qui tornano subito in coda (senza aspettare stale_seconds)
+        try:
+            n = await AsyncJobRepo.release(self.runner_id)
+            if n:
+                logger.info(f"Lavori interrotti rimessi in coda: {n}")
+        except Exception as e:
+            logger.error(f"Lavori interrotti non rimessi in coda (ripresi dopo {self.stale_seconds} s): {e}")
+        if self._pdf is not None:
+            await asyncio.to_thread(self._pdf.close)
+
+    def wake(self):
+        """Da chiamare dopo aver messo in coda un lavoro: parte subito senza attendere il polling."""
+        self._wake.set()
+
+    # --- Lavori abbandonati ---
+    async def _requeue_stale(self):
+        n = await AsyncJobRepo.requeue_stale(self.stale_seconds)
+        if n:
+            logger.info(f"Lavori abbandonati rimessi in coda: {n}")
+            self.wake()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                if self._running:
+                    await AsyncJobRepo.heartbeat(self.runner_id)
+                await self._requeue_stale()
+            except Exception as e:
+                logger.error(f"Errore segnale di vita dei lavori: {e}")
+
+    # --- Esecuzione ---
+    async def _loop(self):
+        while True:
+            await self._slots.acquire()
+            try:
+                claimed = await AsyncJobRepo.claim_next(self.runner_id)
+            except Exception as e:
+                logger.error(f"Errore lettura coda lavori: {e}")
+                claimed = None
+            if claimed is None:
+                self._slots.release()
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self._run(*claimed))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, job, params):
+        job_id = job['ID_LAVORO']
+        try:
+            with operation('generazione'):
+                logger.info(f"Lavoro {job_id} avviato ({job['TIPO']}, {job['TOTALE']} elementi)")
+                result, note = await self._execute(job_id, params)
+            if not await AsyncJobRepo.finish(job_id, self.runner_id, result, note):
+                logger.error(f"Lavoro {job_id} completato ma non più assegnato a questo esecutore: esito non registrato")
+            else:
+                logger.info(f"Lavoro {job_id} completato: {result}" + (f" ({note})" if note else ""))
+            await asyncio.to_thread(self.purge)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Lavoro {job_id} fallito: {e}")
+            try:
+                await AsyncJobRepo.fail(job_id, self.runner_id, e)
+            except Exception as db_err:
+                logger.error(f"Impossibile registrare l'errore del lavoro {job_id}: {db_err}")
+        finally:
+            self._slots.release()
+
+    def _progress_writer(self, job_id):
+        # Una sola scrittura alla volta: i valori arrivati nel frattempo si riassumono nell'ultimo,
+        # scritto appena finisce quella in corso (FATTI non torna mai indietro)
+        state = {'last': 0.0, 'pending': None, 'writer': None}
+
+        async def write():
+            while state['pending'] is not None:
+                done, state['pending'] = state['pending'], None
+                try:
+                    await AsyncJobRepo.set_progress(job_id, self.runner_id, done)
+                except Exception as e:
+                    logger.error(f"Lavoro {job_id}: avanzamento non salvato: {e}")
+
+        def on_progress(done, total):
+            now = time.monotonic()
+            if done == total or now - state['last'] >= PROGRESS_EVERY_SECONDS:
+                state['last'] = now
+                state['pending'] = done
+                if state['writer'] is None or state['writer'].done():
+                    state['writer'] = asyncio.ensure_future(write())
+        return on_progress
+
+    async def _execute(self, job_id, params):
+        # Gli attestati passano dal processo che li genera direttamente nello ZIP:
+        # nessun file intermedio. Lo ZIP si scrive come .part e prende il nome finale
+        # solo a lavoro riuscito (un lavoro fallito o interrotto non lascia nulla).
+        zip_path = os.path.join(self.output_dir, params['zip_name'])
+        part_path = zip_path + PART_SUFFIX
+        entries = params['tasks']
+        tasks = [RenderTask(t['data_map'], t['template'], store_root=self.store_dir) for t in entries]
+        # Documento di ogni attestato nell'archivio: (chiave, nome file), per indice del task
+        documents = [None] * len(entries)
+        names = set()
+        pdf = params.get('formato') == FORMAT_PDF
+        report = []
+        notes = []
+
+        def add_to_zip(i, fname, content):
+            arcname = _unique_name(names, f"{entries[i]['dir']}/{fname}".replace(os.sep, '/'))
+            zf.writestr(arcname, content)
+            return arcname
+
+        async def add_as_pdf(i, fname, content):
+            # Un attestato che non si converte resta nello ZIP in .docx e finisce nel resoconto
+            start = time.perf_counter()
+            try:
+                content = await asyncio.to_thread(self._converter().convert, content)
+                fname = os.path.splitext(fname)[0] + '.pdf'
+                error = ''
+            except Exception as e:
+                logger.error(f"Lavoro {job_id}: {fname} non convertito in PDF: {e}")
+                error = str(e) or type(e).__name__
+            seconds = time.perf_counter() - start
+            report.append((add_to_zip(i, fname, content), 'errore' if error else 'ok', seconds, error))
+
+        def on_rendered(i, result):
+            fname, content, key = result
+            documents[i] = (key, fname)
+            if pdf:
+                return add_as_pdf(i, fname, content)
+            add_to_zip(i, fname, content)
+
+        try:
+            # .docx e PDF sono già compressi: si archiviano così come sono
+            started = time.perf_counter()
+            with zipfile.ZipFile(part_path, 'w', zipfile.ZIP_STORED) as zf:
+                results = await render_certificates(tasks, self.submit, self._progress_writer(job_id),
+                                                    on_result=on_rendered)
+                failed = [r for r in results if isinstance(r, Exception)]
+                if failed:
+                    raise RuntimeError(f"{len(failed)} attestati non generati: {failed[0]}")
+                if params.get('merge'):
+                    notes += await self._add_merged(zf, zip_path, entries, names)
+                if pdf:
+                    zf.writestr(PDF_REPORT_NAME, _pdf_report(report), zipfile.ZIP_DEFLATED)
+                    notes.append(_pdf_summary(report, time.perf_counter() - started))
+
+            # Salvataggio DB (una transazione per tutto il lotto)
+            records = [(s, c, date.fromisoformat(d)) for s, c, d in params['records']]
+            ok, saved = await AsyncAttestatiRepo.insert_many(records)
+            if not ok:
+                raise RuntimeError(f"Attestati NON registrati: {saved}")
+            # records e tasks sono paralleli (un attestato per partecipante)
+            links = [(saved[tuple(r)], doc[0], doc[1]) for r, doc in zip(records, documents)
+                     if doc and tuple(r) in saved]
+            if not await AsyncAttestatiRepo.link_documents(links):
+                notes.append("Documenti non collegati all'archivio (ristampa non disponibile)")
+
+            os.replace(part_path, zip_path)
+            return zip_path, '; '.join(notes) or None
+        finally:
+            _remove(part_path)
+
+    async def _add_merged(self, zf, zip_path, entries, names):
+        """
+        Documenti unici per la stampa, uno per sessione, generati in parallelo nei processi.
+        Ognuno si scrive in un file .part accanto allo ZIP (vedi save_merged: la memoria resta
+        quella di un attestato) e poi si copia nello ZIP. Restituisce le note sugli errori.
+        """
+        groups = {}
+        for t in entries:
+            groups.setdefault(t['group'], []).append(t)
+
+        async def merge(n, group, items):
+            path = f"{zip_path}.{n}{PART_SUFFIX}"
+            try:
+                await self.submit(generate_merged_sync, [t['data_map'] for t in items], items[0]['template'], path)
+                return group, path, None
+            except Exception as e:
+                _remove(path)
+                return group, None, e
+
+        notes = []
+        done = await asyncio.gather(*(merge(n, g, items) for n, (g, items) in enumerate(groups.items())))
+        for group, path, error in done:
+            if error is not None:
+                logger.error(f"Documento di stampa {group} non generato: {error}")
+                notes.append(f"Documento di stampa {group} non generato: {error}")
+                continue
+            try:
+                arcname = _unique_name(names, f"{group}/{MERGED_NAME.format(group=group)}")
+                await asyncio.to_thread(zf.write, path, arcname)
+            finally:
+                _remove(path)
+        return notes
+
+    def _converter(self):
+        if self._pdf is None:
+            self._pdf = PdfConverter(self.soffice)
+        return self._pdf
+
+    # --- Pulizia ---
+    async def _store_cleanup(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.purge_store)
+            except Exception as e:
+                # Senza risposta dal DB non si toglie niente
+                logger.error(f"Pulizia archivio documenti non eseguita: {e}")
+            await asyncio.sleep(STORE_PURGE_SECONDS)
+
+    def purge_store(self):
+        """Toglie dall'archivio i documenti che nessun attestato usa più (vedi ArtefactStore.unlinked)."""
+        store = ArtefactStore(self.store_dir)
+        removed = store.remove(store.unlinked(AttestatiRepo.linked_hashes))
+        if removed:
+            logger.info(f"Archivio documenti: tolti {removed} file non più collegati")
+        return removed
+
+    def purge(self, leftovers=False):
+        """
+        Toglie dalla cartella dei lavori gli ZIP più vecchi di keep_days (il download risponde 410)
+        e, con leftovers (solo all'avvio, quando nessun lavoro gira), gli avanzi di
+        un'esecuzione interrotta: .part e cartelle di lavoro delle versioni precedenti.
+        """
+        if not os.path.isdir(self.output_dir):
+            return
+        limit = time.time() - self.keep_days * 86400
+        for entry in os.scandir(self.output_dir):
+            if entry.is_dir():
+                if leftovers and entry.name.startswith('lavoro_'):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            elif entry.name.endswith(PART_SUFFIX):
+                if leftovers:
+                    _remove(entry.path)
+            elif entry.stat().st_mtime < limit:
+                _remove(entry.path)
+
+
+def _unique_name(names, arcname):
+    # Due omonimi della stessa azienda: il secondo diventa "NOME (2).docx" invece di sovrascrivere
+    base, ext = os.path.splitext(arcname)
+    n = 1
+    while arcname in names:
+        n += 1
+        arcname = f"{base} ({n}){ext}"
+    names.add(arcname)
+    return arcname
+
+
+def _pdf_report(report):
+    lines = ['file;esito;secondi;errore']
+    lines += [f"{name};{status};{seconds:.2f};{error.replace(';', ',').replace(chr(10), ' ')}" for name, status, seconds, error in report]
+    return '\ufeff' + '\r\n'.join(lines) + '\r\n'
+
+
+def _pdf_summary(report, elapsed):
+    ok = sum(1 for r in report if r[1] == 'ok')
+    failed = len(report) - ok
+    summary = f"PDF: {ok} convertiti in {elapsed:.0f} s ({ok / elapsed if elapsed else 0:.1f}/s)"
+    if failed:
+        summary += f", {failed} rimasti in .docx (vedi {PDF_REPORT_NAME})"
+    logger.info(summary)
+    return summary
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,162 @@
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger()
+
+# --- CONVERSIONE DOCX -> PDF (LibreOffice headless) ---
+# docx2pdf funziona solo con Word su Windows. Sul server si usa LibreOffice: un solo processo
+# soffice resta acceso ("caldo") e riceve tutti i documenti del lotto via UNO, invece di
+# avviare un convertitore per ogni file (l'avvio costa più della conversione).
+# Serve il modulo "uno" di LibreOffice (pacchetto python3-uno o il python di LibreOffice):
+# senza, pdf_available() è False e l'opzione PDF non compare.
+
+SOFFICE_NAMES = ('soffice', 'libreoffice')
+# Attesa massima perché soffice accetti connessioni
+START_TIMEOUT = 30
+PDF_FILTER = 'writer_pdf_Export'
+
+
+def find_soffice(path=None):
+    if path:
+        return path if os.path.exists(path) else None
+    for name in SOFFICE_NAMES:
+        found = shutil.which(name)
+        if found:
+            return found
+    return None
+
+
+def pdf_available(soffice=None):
+    if not find_soffice(soffice):
+        return False
+    try:
+        import uno  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class PdfConverter:
+    """
+    Un processo soffice dedicato (profilo proprio, non disturba un LibreOffice aperto)
+    e la connessione UNO verso di esso. LibreOffice converte un documento alla volta:
+    convert() è serializzato da un lock ed è pensato per girare in asyncio.to_thread.
+    Se soffice muore (es. documento che lo manda in crash) viene riavviato al documento dopo.
+    """
+    def __init__(self, soffice=None):
+        self.soffice = find_soffice(soffice)
+        self._lock = threading.Lock()
+        self._proc = None
+        self._desktop = None
+        self._work_dir = None
+        self.converted = 0
+        self.failed = 0
+
+    # --- Ciclo di vita ---
+    def _start(self):
+        import uno
+
+        if not self.soffice:
+            raise RuntimeError("LibreOffice (soffice) non trovato")
+        self._work_dir = tempfile.mkdtemp(prefix='wsm_pdf_')
+        pipe = f"wsm_{uuid.uuid4().hex}"
+        profile = uno.systemPathToFileUrl(os.path.join(self._work_dir, 'profilo'))
+        self._proc = subprocess.Popen(
+            [self.soffice, '--headless', '--invisible', '--nologo', '--norestore', '--nodefault',
+             f'-env:UserInstallation={profile}', f'--accept=pipe,name={pipe};urp;StarOffice.ComponentContext'],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local)
+        deadline = time.monotonic() + START_TIMEOUT
+        while True:
+            try:
+                ctx = resolver.resolve(f'uno:pipe,name={pipe};urp;StarOffice.ComponentContext')
+                break
+            except Exception:
+                if self._proc.poll() is not None or time.monotonic() > deadline:
+                    self._stop()
+                    raise RuntimeError("LibreOffice non risponde")
+                time.sleep(0.2)
+        self._desktop = ctx.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', ctx)
+        logger.info(f"Convertitore PDF avviato ({self.soffice}, pid {self._proc.pid})")
+
+    def _stop(self):
+        terminated = False
+        if self._desktop is not None:
+            try:
+                self._desktop.terminate()
+                terminated = True
+            except Exception:
+                pass
+            self._desktop = None
+        if self._proc is not None:
+            if not terminated and self._proc.poll() is None:
+                self._proc.terminate()
+            try:
+                self._proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+            self._proc = None
+        if self._work_dir:
+            shutil.rmtree(self._work_dir, ignore_errors=True)
+            self._work_dir = None
+
+    def close(self):
+        with self._lock:
+            self._stop()
+
+    # --- Conversione ---
+    @staticmethod
+    def _props(**values):
+        from com.sun.star.beans import PropertyValue  # importabile solo dopo "import uno"
+
+        props = []
+        for name, value in values.items():
+            p = PropertyValue()
+            p.Name, p.Value = name, value
+            props.append(p)
+        return tuple(props)
+
+    def convert(self, docx_bytes):
+        """Bytes del .docx -> bytes del PDF. Solleva un'eccezione se il documento non si converte."""
+        import uno
+
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                self._stop()
+                self._start()
+            name = uuid.uuid4().hex
+            src = os.path.join(self._work_dir, name + '.docx')
+            dst = os.path.join(self._work_dir, name + '.pdf')
+            try:
+                with open(src, 'wb') as f:
+                    f.write(docx_bytes)
+                doc = self._desktop.loadComponentFromURL(uno.systemPathToFileUrl(src), '_blank', 0,
+                                                         self._props(Hidden=True, ReadOnly=True))
+                if doc is None:
+                    raise RuntimeError("documento non leggibile")
+                try:
+                    doc.storeToURL(uno.systemPathToFileUrl(dst), self._props(FilterName=PDF_FILTER))
+                finally:
+                    doc.close(True)
+                with open(dst, 'rb') as f:
+                    pdf = f.read()
+                self.converted += 1
+                return pdf
+            except Exception:
+                self.failed += 1
+                # Connessione persa: il processo verrà riavviato alla prossima conversione
+                if self._proc is not None and self._proc.poll() is not None:
+                    self._stop()
+                raise
+            finally:
+                for path in (src, dst):
+                    if os.path.exists(path):
+                        os.remove(path)
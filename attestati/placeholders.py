@@ -0,0 +1,156 @@
+import re
+from collections import OrderedDict
+
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+# --- MOTORE DI SOSTITUZIONE DEI SEGNAPOSTO ---
+# Una sola regex per tutti i {{...}}, una sola passata su ogni parte del modello
+# (documento, intestazioni, piè di pagina, note, caselle di testo, tabelle annidate).
+# Word spezza spesso un segnaposto su più run ("{{COG" + "NOME}}"): il testo del paragrafo
+# si ricompone dai w:t, e il valore va nel run dove il segnaposto inizia (con la sua
+# formattazione); i pezzi restanti negli altri run vengono tolti. Gli altri run non si toccano.
+#
+# Il lavoro costoso si fa una volta alla compilazione del modello: per ogni w:t coinvolto si
+# registra il percorso nell'albero e la sequenza di testo fisso / chiavi. Il rendering è
+# proporzionale ai soli w:t da riscrivere.
+
+PLACEHOLDER_RE = re.compile(r'\{\{[^{}]+\}\}')
+
+_W_P = qn('w:p')
+_W_T = qn('w:t')
+_XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+
+def _path_of(root, el):
+    """Indici dei figli dalla radice all'elemento: si ritrova lo stesso nodo in una copia."""
+    path = []
+    while el is not root:
+        parent = el.getparent()
+        path.append(parent.index(el))
+        el = parent
+    return tuple(reversed(path))
+
+
+def _follow(root, path):
+    el = root
+    for i in path:
+        el = el[i]
+    return el
+
+
+def _paragraph_of(t):
+    # Il w:p più vicino: i paragrafi di una casella di testo stanno dentro un run del paragrafo esterno
+    el = t.getparent()
+    while el is not None and el.tag != _W_P:
+        el = el.getparent()
+    return el
+
+
+def _text_groups(root):
+    """w:t di ogni paragrafo, in ordine di documento (una sola visita dell'albero)."""
+    groups = OrderedDict()
+    for t in root.iter(_W_T):
+        p = _paragraph_of(t)
+        if p is not None:
+            groups.setdefault(p, []).append(t)
+    return groups
+
+
+def _node_segments(full, a, b, matches):
+    """Nuovo contenuto del w:t che copre full[a:b]: lista di (è_chiave, testo)."""
+    segments, pos = [], a
+    for m in matches:
+        if m.end() <= a or m.start() >= b:
+            continue
+        if m.start() > pos:
+            segments.append((False, full[pos:m.start()]))
+        if a <= m.start() < b:
+            segments.append((True, m.group()))
+        pos = max(pos, min(m.end(), b))
+    if pos < b:
+        segments.append((False, full[pos:b]))
+    return tuple(segments)
+
+
+def compile_part(root):
+    """
+    Modifiche da applicare a una parte: [(percorso del w:t, segmenti)].
+    Lista vuota se la parte non contiene segnaposto.
+    """
+    edits = []
+    for ts in _text_groups(root).values():
+        texts = [t.text or '' for t in ts]
+        full = ''.join(texts)
+        if '{{' not in full:
+            continue
+        matches = list(PLACEHOLDER_RE.finditer(full))
+        if not matches:
+            continue
+        a = 0
+        for t, text in zip(ts, texts):
+            b = a + len(text)
+            if b > a and any(m.start() < b and m.end() > a for m in matches):
+                edits.append((_path_of(root, t), _node_segments(full, a, b, matches)))
+            a = b
+    return edits
+
+
+def malformed_fragments(root, context=20):
+    """
+    Segnaposto scritti male ("{{NOME", "COGNOME}}", "{NOME}}"): testo dei paragrafi che dopo
+    aver tolto i segnaposto validi contiene ancora "{{" o "}}". Restituisce i frammenti attorno.
+    """
+    found = []
+    for ts in _text_groups(root).values():
+        full = ''.join(t.text or '' for t in ts)
+        if '{' not in full and '}' not in full:
+            continue
+        rest = PLACEHOLDER_RE.sub(lambda m: ' ' * len(m.group()), full)
+        for m in re.finditer(r'\{\{|\}\}', rest):
+            found.append(full[max(0, m.start() - context):m.end() + context].strip())
+    return found
+
+
+def part_keys(edits):
+    return {text for _, segments in edits for is_key, text in segments if is_key}
+
+
+def _value(key, data_map):
+    # Chiave assente dalla mappa: il segnaposto resta com'è
+    if key not in data_map:
+        return key
+    v = data_map[key]
+    return str(v) if v is not None else ''
+
+
+def _set_text(t, text):
+    if '\n' not in text and '\t' not in text:
+        t.text = text
+        t.set(_XML_SPACE, 'preserve')
+        return
+    # A capo e tabulazioni diventano w:br / w:tab nello stesso run (come fa python-docx)
+    run = t.getparent()
+    idx = run.index(t)
+    run.remove(t)
+    for piece in re.split(r'(\n|\t)', text):
+        if piece == '\n':
+            el = OxmlElement('w:br')
+        elif piece == '\t':
+            el = OxmlElement('w:tab')
+        elif piece:
+            el = OxmlElement('w:t')
+            el.text = piece
+            el.set(_XML_SPACE, 'preserve')
+        else:
+            continue
+        run.insert(idx, el)
+        idx += 1
+
+
+def apply_edits(root, edits, data_map):
+    """Applica le modifiche compilate a una copia dell'albero della parte."""
+    # Prima si ritrovano tutti i nodi: _set_text può inserire fratelli e spostare gli indici
+    nodes = [(_follow(root, path), segments) for path, segments in edits]
+    for t, segments in nodes:
+        _set_text(t, ''.join(_value(text, data_map) if is_key else text for is_key, text in segments))
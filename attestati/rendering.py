@@ -0,0 +1,93 @@
+import asyncio
+import inspect
+import logging
+import os
+
+from .generatore import generate_certificate_sync, render_certificate_sync, render_certificate_stored
+
+logger = logging.getLogger()
+
+# --- RENDERING IN PARALLELO ---
+# python-docx/lxml lavorano in CPU e tengono il GIL: con i thread un lotto usa un solo core.
+# Gli attestati si generano quindi in un pool di processi (uno per core, ciascuno con la
+# propria cache dei modelli). L'app passa la funzione che invia il lavoro al pool
+# (in main_mod_postgres: nicegui run.cpu_bound), qui si limita solo quanto lavoro è in volo.
+
+# Attestati in coda per ogni processo: abbastanza per non lasciarli fermi, senza riempire
+# la memoria con migliaia di mappe dati in attesa
+IN_FLIGHT_PER_WORKER = 2
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+class RenderTask:
+    """
+    Un attestato da generare: mappa dati, modello e cartella di destinazione.
+    Senza cartella il documento non va su disco: il risultato è (nome file, bytes);
+    con store_root passa dall'archivio dei documenti e il risultato è (nome file, bytes, chiave).
+    """
+    __slots__ = ('data_map', 'template_file', 'output_dir', 'store_root')
+
+    def __init__(self, data_map, template_file, output_dir=None, store_root=None):
+        self.data_map = data_map
+        self.template_file = template_file
+        self.output_dir = output_dir
+        self.store_root = store_root
+
+    def submit_to(self, submit):
+        if self.store_root is not None:
+            return submit(render_certificate_stored, self.data_map, self.template_file, self.store_root)
+        if self.output_dir is None:
+            return submit(render_certificate_sync, self.data_map, self.template_file)
+        return submit(generate_certificate_sync, self.data_map, self.template_file, self.output_dir)
+
+
+async def render_certificates(tasks, submit, on_progress=None, max_in_flight=None, on_result=None):
+    """
+    Genera tutti gli attestati. submit(fn, *args) è una coroutine che esegue fn in un processo
+    (es. nicegui.run.cpu_bound). on_progress(fatti, totale) viene chiamata a ogni attestato.
+    Restituisce, nell'ordine dei task, il percorso del file o l'eccezione di quell'attestato.
+    Con on_result(indice, risultato) ogni attestato riuscito viene consegnato appena pronto
+    e non resta nella lista (che per quell'indice vale None): serve per i documenti in memoria.
+    Se on_result è una coroutine, il lotto aspetta che finisca prima di inviarne altri
+    (es. conversione PDF, più lenta del rendering: così i documenti non si accumulano in RAM).
+    """
+    tasks = list(tasks)
+    total = len(tasks)
+    limit = max_in_flight or default_workers() * IN_FLIGHT_PER_WORKER
+    results = [None] * total
+    pending = {}
+    next_index = 0
+    done_count = 0
+
+    try:
+        while next_index < total or pending:
+            while next_index < total and len(pending) < limit:
+                t = tasks[next_index]
+                job = asyncio.ensure_future(t.submit_to(submit))
+                pending[job] = next_index
+                next_index += 1
+
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for job in finished:
+                i = pending.pop(job)
+                try:
+                    if on_result:
+                        pending_result = on_result(i, job.result())
+                        if inspect.isawaitable(pending_result):
+                            await pending_result
+                    else:
+                        results[i] = job.result()
+                except Exception as e:
+                    logger.error(f"Attestato {i + 1}/{total} non generato: {e}")
+                    results[i] = e
+                done_count += 1
+                if on_progress:
+                    on_progress(done_count, total)
+    finally:
+        # Pagina chiusa o generazione annullata: niente altro lavoro per questo lotto
+        for job in pending:
+            job.cancel()
+    return results
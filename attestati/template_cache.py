@@ -0,0 +1,206 @@
+import copy
+import hashlib
+import io
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+
+from docx.opc.oxml import serialize_part_xml
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from lxml import etree
+
+from .placeholders import compile_part, apply_edits, part_keys
+
+# --- CACHE DEI MODELLI COMPILATI ---
+# Un lotto usa pochi modelli centinaia di volte: ogni modello viene letto e analizzato
+# una volta sola. La versione "compilata" tiene:
+#   - uno zip con tutte le parti che non cambiano (immagini, stili, ...), già pronto;
+#   - l'albero XML di ogni parte con segnaposto (documento, intestazioni, piè di pagina, note)
+#     e le modifiche da applicarvi (vedi placeholders.py).
+# Per ogni attestato si clonano solo quelle parti, si applicano le modifiche
+# e si aggiungono allo zip statico.
+
+# Modelli diversi tenuti in memoria (i meno usati di recente escono per primi)
+TEMPLATE_CACHE_SIZE = 16
+
+# Parti XML in cui possono stare i segnaposto (le altre, es. stili e tema, non si analizzano)
+_TEXT_PART_RE = re.compile(r'^word/(document\d*|header\d*|footer\d*|footnotes|endnotes|comments)\.xml$')
+
+# Documento principale (nei documenti unificati è l'unica parte che si ripete)
+_DOCUMENT_PART = 'word/document.xml'
+_BODY_MARKER = 'WSM_BODY'
+_DOC_PR = '{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}docPr'
+
+
+class CompiledTemplate:
+    def __init__(self, path):
+        self.path = path
+        self.parts = {}              # nome parte -> (albero, modifiche)
+        self._document = None        # albero del documento se non ha segnaposto (serve per l'unione)
+        with open(path, 'rb') as f:
+            self.digest = hashlib.sha256(f.read()).hexdigest()   # contenuto del modello (vedi artefatti.py)
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if _TEXT_PART_RE.match(info.filename):
+                    root = parse_xml(zf.read(info))
+                    edits = compile_part(root)
+                    if edits:
+                        self.parts[info.filename] = (root, edits)
+                    elif info.filename == _DOCUMENT_PART:
+                        self._document = root
+
+            # Parti fisse: scritte una volta in uno zip che ogni attestato riusa così com'è
+            static = io.BytesIO()
+            with zipfile.ZipFile(static, 'w', zipfile.ZIP_DEFLATED) as out:
+                for info in zf.infolist():
+                    if info.filename not in self.parts:
+                        out.writestr(info, zf.read(info))
+            self.static_zip = static.getvalue()
+
+    def keys(self):
+        """Tutti i segnaposto presenti nel modello."""
+        return set().union(*(part_keys(edits) for _, edits in self.parts.values()))
+
+    def render(self, data_map):
+        """Bytes del .docx con i segnaposto sostituiti."""
+        buf = io.BytesIO(self.static_zip)
+        with zipfile.ZipFile(buf, 'a', zipfile.ZIP_DEFLATED) as out:
+            for name, (root, edits) in self.parts.items():
+                part = copy.deepcopy(root)
+                apply_edits(part, edits, data_map)
+                out.writestr(name, serialize_part_xml(part))
+        return buf.getvalue()
+
+    def save(self, out_path, data_map):
+        with open(out_path, 'wb') as f:
+            f.write(self.render(data_map))
+        return out_path
+
+    def save_merged(self, out_path, data_maps):
+        """
+        Un solo .docx con un attestato per ogni mappa, separati da interruzioni di sezione
+        (stessa impaginazione e stesse intestazioni del modello). Il corpo si scrive nello zip
+        un attestato alla volta: la memoria usata è quella di un attestato, non del documento intero.
+        Intestazioni e piè di pagina sono unici: prendono i dati del primo attestato.
+        """
+        doc_root, doc_edits = self.parts.get(_DOCUMENT_PART) or (self._document, [])
+        # Involucro del documento con il corpo vuoto: il corpo si inserisce al posto del segnaposto
+        shell = copy.deepcopy(doc_root)
+        body = shell.find(qn('w:body'))
+        for child in list(body):
+            body.remove(child)
+        body.append(etree.Comment(_BODY_MARKER))
+        head, tail = serialize_part_xml(shell).split(f'<!--{_BODY_MARKER}-->'.encode())
+
+        maps = iter(data_maps)
+        current = next(maps, None)
+        if current is None:
+            raise ValueError("Nessun attestato da unire")
+
+        drawing_id = 0
+        with zipfile.ZipFile(out_path, 'w', zipfile.ZIP_DEFLATED) as out:
+            with zipfile.ZipFile(io.BytesIO(self.static_zip)) as static:
+                for info in static.infolist():
+                    if info.filename != _DOCUMENT_PART:
+                        out.writestr(info, static.read(info))
+            for name, (root, edits) in self.parts.items():
+                if name != _DOCUMENT_PART:
+                    part = copy.deepcopy(root)
+                    apply_edits(part, edits, current)
+                    out.writestr(name, serialize_part_xml(part))
+
+            with out.open(_DOCUMENT_PART, 'w', force_zip64=True) as doc_out:
+                doc_out.write(head)
+                while current is not None:
+                    following = next(maps, None)
+                    part = copy.deepcopy(doc_root)
+                    apply_edits(part, doc_edits, current)
+                    children = list(part.find(qn('w:body')))
+                    sect_pr = children.pop() if children and children[-1].tag == qn('w:sectPr') else None
+                    # Gli id delle immagini devono restare unici nel documento unito
+                    for child in children:
+                        for pr in child.iter(_DOC_PR):
+                            drawing_id += 1
+                            pr.set('id', str(drawing_id))
+                        doc_out.write(_xml(child))
+                    if following is not None:
+                        # Fine attestato: paragrafo con le proprietà di sezione del modello (nuova pagina)
+                        p = etree.SubElement(etree.Element(qn('w:body')), qn('w:p'))
+                        if sect_pr is not None:
+                            etree.SubElement(p, qn('w:pPr')).append(sect_pr)
+                        else:
+                            etree.SubElement(etree.SubElement(p, qn('w:r')), qn('w:br')).set(qn('w:type'), 'page')
+                        doc_out.write(_xml(p))
+                    elif sect_pr is not None:
+                        doc_out.write(_xml(sect_pr))
+                    current = following
+                doc_out.write(tail)
+        return out_path
+
+
+def _xml(el):
+    return etree.tostring(el, encoding='UTF-8', xml_declaration=False)
+
+
+class TemplateCache:
+    """
+    Modelli compilati per percorso, validi finché il file non cambia (mtime e dimensione).
+    LRU limitata a maxsize; thread-safe (la generazione gira in asyncio.to_thread).
+    """
+    def __init__(self, maxsize=TEMPLATE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()      # percorso assoluto -> ((mtime_ns, size), CompiledTemplate)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        version = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._items.get(key)
+            if entry and entry[0] == version:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # La compilazione avviene fuori dal lock: due thread possono compilarlo insieme, vince l'ultimo
+        compiled = CompiledTemplate(key)
+        with self._lock:
+            self._items[key] = (version, compiled)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return compiled
+
+    def invalidate(self, path=None):
+        """Dimentica un modello (dopo un nuovo upload) o, senza argomenti, tutti."""
+        with self._lock:
+            if path is None:
+                self._items.clear()
+            else:
+                self._items.pop(os.path.abspath(path), None)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._items), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+_cache = TemplateCache()
+
+
+def get_template(path):
+    return _cache.get(path)
+
+
+def invalidate_template(path=None):
+    _cache.invalidate(path)
+
+
+def get_template_cache_stats():
+    return _cache.stats()
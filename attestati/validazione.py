@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+import threading
+import zipfile
+
+from docx.oxml import parse_xml
+
+from .placeholders import malformed_fragments, part_keys
+from .template_cache import CompiledTemplate, _DOCUMENT_PART, _TEXT_PART_RE
+
+logger = logging.getLogger()
+
+# --- INDICE E VALIDAZIONE DEI MODELLI ---
+# Un modello si analizza una volta sola, al caricamento: parti, segnaposto presenti,
+# segnaposto sconosciuti o scritti male. Il risultato si salva in un indice accanto ai
+# modelli (valido finché il file non cambia) e on_generate lo consulta prima di lavorare.
+# Un modello illeggibile viene rifiutato; segnaposto sconosciuti o spezzati vengono segnalati
+# (il modello si salva comunque: nel documento resterebbero scritti così come sono).
+
+# Segnaposto che on_generate sa riempire (vedi la mappa dati in main_mod_postgres.py)
+CERTIFICATE_KEYS = frozenset({
+    "{{COGNOME}}", "{{NOME}}", "{{CODICE}}", "{{CF}}", "{{DATA_NASCITA}}", "{{LUOGO_NASCITA}}",
+    "{{SOCIETA}}", "{{NOME_CORSO}}", "{{DATA_SVOLGIMENTO}}", "{{ORE_DURATA}}", "{{DATA_RILASCIOAT}}",
+    "{{SIGLA}}", "{{DOCENTE}}", "{{PROGRAMMA}}",
+})
+
+INDEX_FILENAME = 'indice_modelli.json'
+
+
+def inspect_template(path, known_keys=CERTIFICATE_KEYS):
+    """
+    Analizza un .docx: {'parts': {parte: [segnaposto]}, 'keys', 'unknown', 'malformed', 'errors'}.
+    errors non vuoto = modello da rifiutare; unknown / malformed = da segnalare.
+    """
+    info = {'parts': {}, 'keys': [], 'unknown': [], 'malformed': [], 'errors': []}
+    try:
+        with zipfile.ZipFile(path) as zf:
+            names = zf.namelist()
+            if _DOCUMENT_PART not in names:
+                info['errors'].append("Non è un documento Word (manca word/document.xml)")
+                return info
+            for name in names:
+                if _TEXT_PART_RE.match(name):
+                    info['malformed'] += malformed_fragments(parse_xml(zf.read(name)))
+        compiled = CompiledTemplate(path)
+    except zipfile.BadZipFile:
+        info['errors'].append("Il file non è un .docx valido")
+        return info
+    except Exception as e:
+        info['errors'].append(f"Modello illeggibile: {e}")
+        return info
+
+    info['parts'] = {name: sorted(part_keys(edits)) for name, (_, edits) in compiled.parts.items()}
+    keys = compiled.keys()
+    info['keys'] = sorted(keys)
+    info['unknown'] = sorted(keys - set(known_keys))
+    info['digest'] = compiled.digest
+    return info
+
+
+def describe_problems(info):
+    """Messaggi per l'utente: (errori, avvisi)."""
+    warnings = []
+    if info['unknown']:
+        warnings.append(f"Segnaposto sconosciuti (resteranno scritti così): {', '.join(info['unknown'])}")
+    if info['malformed']:
+        shown = '; '.join(f'"{m}"' for m in info['malformed'][:3])
+        more = f" e altri {len(info['malformed']) - 3}" if len(info['malformed']) > 3 else ''
+        warnings.append(f"Segnaposto scritti male: {shown}{more}")
+    if not info['errors'] and not info['keys']:
+        warnings.append("Nessun segnaposto: tutti gli attestati saranno identici")
+    return list(info['errors']), warnings
+
+
+class TemplateIndex:
+    """
+    Risultati di inspect_template per i modelli di una cartella, salvati in INDEX_FILENAME.
+    Ogni voce vale finché mtime e dimensione del modello non cambiano.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._items = None
+
+    def _load(self):
+        if self._items is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._items = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._items = {}
+        return self._items
+
+    def _save(self):
+        tmp = self.path + '.part'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._items, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    def get(self, filename):
+        """Analisi del modello (dall'indice se aggiornata, altrimenti rifatta e salvata). None se manca."""
+        path = os.path.join(self.folder, filename)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        version = [st.st_mtime_ns, st.st_size]
+        with self._lock:
+            entry = self._load().get(filename)
+            if entry and entry.get('version') == version:
+                return entry
+        info = dict(inspect_template(path), version=version)
+        with self._lock:
+            self._load()[filename] = info
+            try:
+                self._save()
+            except OSError as e:
+                logger.error(f"Indice modelli non salvato: {e}")
+        return info
+
+    def put(self, filename, info):
+        """Registra un'analisi già fatta (al caricamento, senza rileggere il file appena analizzato)."""
+        st = os.stat(os.path.join(self.folder, filename))
+        with self._lock:
+            self._load()[filename] = dict(info, version=[st.st_mtime_ns, st.st_size])
+            try:
+                self._save()
+            except OSError as e:
+                # Il modello è già installato: l'analisi resta in memoria e si salverà alla prossima
+                logger.error(f"Indice modelli non salvato: {e}")
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_template_index(folder):
+    """Un indice per cartella dei modelli (condiviso da tutte le pagine)."""
+    key = os.path.abspath(folder)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = TemplateIndex(key)
+        return _indexes[key]
@@ -0,0 +1,5 @@
+"""
+Componenti NiceGUI riutilizzati dalle pagine di WorkSafeManager.
+"""
+from .tabella_paginata import PagedTable
+from .ricerca import LiveSearch
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+
+logger = logging.getLogger()
+
+# --- RICERCA MENTRE SI DIGITA ---
+# Ogni tasto cambia il testo, ma il database si interroga solo dopo una pausa (debounce lato
+# server) e conta solo l'ultima ricerca: quella precedente, in attesa o già partita, viene
+# annullata. Su PostgreSQL annullare il task annulla anche l'istruzione sul server (psycopg);
+# su Firebird la query già partita finisce nel suo thread ma il risultato viene scartato.
+
+DEFAULT_DELAY = 0.25
+DEFAULT_MIN_CHARS = 2
+
+
+class LiveSearch:
+    """
+    search: funzione async(testo) -> risultati; on_results: funzione(testo, risultati) chiamata
+    solo per l'ultima ricerca richiesta (può essere async).
+    """
+    def __init__(self, search, on_results, delay=DEFAULT_DELAY, min_chars=DEFAULT_MIN_CHARS):
+        self.search = search
+        self.on_results = on_results
+        self.delay = delay
+        self.min_chars = min_chars
+        self._task = None
+
+    def request(self, text):
+        """Nuovo testo: annulla la ricerca precedente e ne programma un'altra dopo la pausa."""
+        self.cancel()
+        text = (text or '').strip()
+        if len(text) < self.min_chars:
+            return
+        self._task = asyncio.create_task(self._run(text))
+
+    def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self, text):
+        try:
+            await asyncio.sleep(self.delay)
+            results = await self.search(text)
+            outcome = self.on_results(text, results)
+            if asyncio.iscoroutine(outcome):
+                await outcome
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Errore ricerca '{text}': {e}")
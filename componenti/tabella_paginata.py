@@ -0,0 +1,70 @@
+from nicegui import ui
+
+from db.paging import DEFAULT_PAGE_SIZE
+
+# --- TABELLA PAGINATA LATO SERVER ---
+# Al browser arriva solo la pagina visibile. Ordinamento e cambio pagina
+# arrivano con l'evento 'request' di Quasar e vengono girati al repository.
+# Per ogni pagina già vista si ricorda il cursore dell'ultima riga: la pagina
+# successiva si legge in keyset, senza OFFSET.
+
+ROWS_PER_PAGE_OPTIONS = [10, 25, 50, 100]
+
+
+class PagedTable:
+    """
+    fetch: funzione async(sort_by, descending, after, limit, offset, with_total)
+    che restituisce la pagina nel formato dei repository ({'rows', 'cursor', 'total', 'estimated'}).
+    """
+    def __init__(self, columns, row_key, fetch, sort_by=None, descending=False, rows_per_page=DEFAULT_PAGE_SIZE):
+        self.fetch = fetch
+        self._cursors = {}        # pagina -> cursore dell'ultima riga
+        self._order = None        # (sort_by, descending, rows_per_page) a cui si riferiscono i cursori
+        self._total = 0
+        self.table = ui.table(
+            columns=columns, rows=[], row_key=row_key,
+            pagination={'page': 1, 'rowsPerPage': rows_per_page, 'sortBy': sort_by,
+                        'descending': descending, 'rowsNumber': 0},
+        ).props(f':rows-per-page-options="{ROWS_PER_PAGE_OPTIONS}"')
+        self.table.on('request', self._on_request)
+
+    async def refresh(self):
+        """Filtri cambiati o dati modificati: si riparte dalla prima pagina con un nuovo totale."""
+        self._cursors = {}
+        await self._load({**self.table.pagination, 'page': 1}, with_total=True)
+
+    async def reload(self):
+        """Ricarica la pagina corrente (es. dopo modifica o eliminazione di una riga)."""
+        await self._load(dict(self.table.pagination), with_total=True)
+
+    async def _on_request(self, e):
+        await self._load(e.args['pagination'])
+
+    async def _load(self, pagination, with_total=False):
+        page = max(1, int(pagination.get('page') or 1))
+        per_page = int(pagination.get('rowsPerPage') or DEFAULT_PAGE_SIZE)
+        sort_by = pagination.get('sortBy')
+        descending = bool(pagination.get('descending'))
+
+        # Cambio ordinamento o dimensione pagina: i cursori salvati non valgono più
+        order = (sort_by, descending, per_page)
+        if order != self._order:
+            self._order = order
+            self._cursors = {}
+            with_total = with_total or not self._total
+
+        after = self._cursors.get(page - 1)
+        result = await self.fetch(
+            sort_by=sort_by, descending=descending, after=after, limit=per_page,
+            # Salto diretto a una pagina mai vista: solo qui serve l'OFFSET
+            offset=0 if after else (page - 1) * per_page,
+            with_total=with_total,
+        )
+        if result['cursor'] is not None:
+            self._cursors[page] = result['cursor']
+        if result['total'] is not None:
+            self._total = result['total']
+
+        self.table.rows = result['rows']
+        self.table.pagination = {**pagination, 'page': page, 'rowsPerPage': per_page, 'rowsNumber': self._total}
+        self.table.update()
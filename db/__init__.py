@@ -0,0 +1,25 @@
+"""
+Accesso ai dati di WorkSafeManager, indipendente dal database.
+Il backend (Firebird o PostgreSQL) si sceglie dal file di configurazione
+(chiave "backend" di config.json / config_postgres.json).
+"""
+from .backend import (
+    Backend, configure, get_backend, db_connection, get_pool_stats, get_query_stats, get_metrics_text,
+)
+from .metrics import QueryMetrics, operation, timed
+from .queries import QueryRegistry
+from .pool import ConnectionPool
+from .paging import PageQuery, empty_page
+from .search_index import SubjectIndex, subject_index
+from .repos import (
+    UserRepo, AttestatiRepo, AuthRepo, CorsoRepo, EnteRepo, JobRepo,
+    JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_FINAL_STATES,
+    allocate_session_numbers_sync, get_user_details_from_db_sync, get_corsi_from_db_sync,
+    get_count_attestati_oggi_sync, check_user_credentials_sync,
+)
+from .async_repos import (
+    AsyncUserRepo, AsyncAttestatiRepo, AsyncAuthRepo, AsyncCorsoRepo, AsyncEnteRepo, AsyncJobRepo,
+    allocate_session_numbers_async, get_corsi_async, get_count_attestati_oggi_async,
+    check_user_credentials_async,
+)
+from .export import EXPORTS, stream_export, xlsx_available
@@ -0,0 +1,460 @@
+import asyncio
+import json
+import logging
+
+from .backend import get_backend
+from .paging import empty_page
+from .metrics import instrumented, timed
+from .search_index import subject_index
+from .repos import (
+    UserRepo, AttestatiRepo, AuthRepo, CorsoRepo, EnteRepo, JobRepo,
+    SQL_CORSI_LIST, JOB_QUEUED,
+    SESSIONS_ATTEMPTS, _session_requests, _session_statements, _session_numbers,
+    _map_corsi_rows, _verify_password, parse_subject_lines,
+)
+
+logger = logging.getLogger()
+
+# --- REPOSITORY ASINCRONI ---
+# Stesse query e mappature dei repo sincroni, ma attese direttamente sull'event loop
+# (pool psycopg 3 su PostgreSQL, thread del pool sincrono su Firebird).
+
+# Ricaricamento dell'indice di ricerca dei soggetti in corso (uno alla volta)
+_index_reload = None
+
+
+def _reload_search_index_if_expired():
+    """Indice scaduto: si ricarica in background, intanto si risponde con il contenuto attuale."""
+    global _index_reload
+    if subject_index.expired() and (_index_reload is None or _index_reload.done()):
+        _index_reload = asyncio.create_task(AsyncUserRepo.load_search_index())
+
+
+@instrumented
+class AsyncUserRepo:
+    SEARCH_LIMIT = UserRepo.SEARCH_LIMIT
+
+    @staticmethod
+    async def get_all(search_term='', solo_docenti=False):
+        if search_term and UserRepo._from_index():
+            _reload_search_index_if_expired()
+            return subject_index.search(search_term, solo_docenti)
+        try:
+            if search_term:
+                rows = await get_backend().afetchall(*UserRepo._sql_get_all_search(search_term, solo_docenti))
+            else:
+                rows = await get_backend().aquery_all(*UserRepo._query_get_all(solo_docenti))
+            return [UserRepo._map_row(r) for r in rows]
+        except Exception as e:
+            logger.error(f"Err AsyncUserRepo: {e}")
+            return []
+
+    @staticmethod
+    async def search(search_term, solo_docenti=False, limit=UserRepo.SEARCH_LIMIT):
+        if not search_term.strip():
+            return []
+        if UserRepo._from_index():
+            _reload_search_index_if_expired()
+            return subject_index.search(search_term, solo_docenti, limit, ranked=True)
+        try:
+            # Se il task viene annullato (ricerca superata da una più recente) psycopg
+            # annulla anche l'istruzione sul server
+            rows = await get_backend().afetchall(*UserRepo._sql_search(search_term, solo_docenti, limit))
+            return [UserRepo._map_row(r) for r in rows]
+        except Exception as e:
+            logger.error(f"Err AsyncUserRepo.search: {e}")
+            return []
+
+    @staticmethod
+    async def get_page(search_term='', solo_docenti=False, with_total=True, **page):
+        _reload_search_index_if_expired()
+        ids = UserRepo._index_ids(search_term, solo_docenti)
+        if ids == []:
+            return empty_page()
+        try:
+            return await get_backend().afetch_page(UserRepo._page_query(search_term, solo_docenti, ids=ids, **page),
+                                                   UserRepo._map_with_societa, with_total)
+        except Exception as e:
+            logger.error(f"Err AsyncUserRepo.get_page: {e}")
+            return empty_page()
+
+    @staticmethod
+    async def upsert(data, is_new=True):
+        backend = get_backend()
+        try:
+            UserRepo._index_saved(await backend.arun_batch([UserRepo._sql_upsert(data, is_new)],
+                                                           UserRepo.UPSERT_LABEL))
+            return True, "Salvataggio completato."
+        except backend.integrity_errors as e:
+            return False, f"Errore integrità dati (es. CF già presente): {e}"
+        except Exception as e:
+            return False, f"Errore DB: {str(e)}"
+
+    @staticmethod
+    async def delete(id_utente):
+        try:
+            await get_backend().aexecute(UserRepo.SQL_DELETE, (id_utente,))
+            subject_index.remove(id_utente)
+            return True, "Eliminato"
+        except Exception as e:
+            return False, str(e)
+
+    @staticmethod
+    async def get_select_options():
+        try:
+            return UserRepo._map_options(await get_backend().afetchall(UserRepo.SQL_SELECT_OPTIONS))
+        except Exception as e:
+            logger.error(f"Err options: {e}")
+            return {}
+
+    @staticmethod
+    async def load_search_index():
+        subject_index.begin_load()
+        try:
+            rows = await get_backend().aquery_all('SoggettiList')
+        except Exception as e:
+            subject_index.cancel_load()
+            logger.error(f"Indice ricerca soggetti non caricato: {e}")
+            return 0
+        # Ordinare le chiavi di molti soggetti richiede tempo: fuori dall'event loop
+        await asyncio.to_thread(lambda: subject_index.load([UserRepo._map_row(r) for r in rows]))
+        return len(rows)
+
+    @staticmethod
+    async def resolve_list(text):
+        entries = parse_subject_lines(text)
+        if not entries:
+            return UserRepo._resolve_entries([], [])
+        try:
+            rows = await get_backend().afetchall(*UserRepo._sql_resolve_list(entries))
+        except Exception as e:
+            logger.error(f"Err AsyncUserRepo.resolve_list: {e}")
+            rows = []
+        return UserRepo._resolve_entries(entries, rows)
+
+    @staticmethod
+    async def get_by_ente(id_ente, id_corso=None, filtro='tutti', days_lookahead=60):
+        try:
+            rows = await get_backend().afetchall(*UserRepo._sql_by_ente(id_ente, id_corso, filtro, days_lookahead))
+            return [UserRepo._map_with_societa(r) for r in rows]
+        except Exception as e:
+            logger.error(f"Err AsyncUserRepo.get_by_ente: {e}")
+            return []
+
+@instrumented
+class AsyncAttestatiRepo:
+    @staticmethod
+    async def get_history(search='', start_date=None, end_date=None):
+        try:
+            rows = await get_backend().aquery_all(*AttestatiRepo._query_history(search, start_date, end_date))
+            return [AttestatiRepo._map_history_row(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Errore AsyncAttestatiRepo: {e}")
+            return []
+
+    @staticmethod
+    async def get_history_page(search='', start_date=None, end_date=None, with_total=True, **page):
+        try:
+            return await get_backend().afetch_page(AttestatiRepo._page_query(search, start_date, end_date, **page),
+                                                   AttestatiRepo._map_history_row, with_total)
+        except Exception as e:
+            logger.error(f"Errore AsyncAttestatiRepo.get_history_page: {e}")
+            return empty_page()
+
+    @staticmethod
+    async def get_scadenze_page(mode='in_scadenza', days_lookahead=60, search='', with_total=True, **page):
+        try:
+            return await get_backend().afetch_page(AttestatiRepo._scadenze_query(mode, days_lookahead, search, **page),
+                                                   AttestatiRepo._map_scadenza_row, with_total)
+        except Exception as e:
+            logger.error(f"Errore AsyncAttestatiRepo.get_scadenze_page: {e}")
+            return empty_page()
+
+    @staticmethod
+    async def insert_attestato(id_soggetto, id_corso, data_svolgimento):
+        try:
+            await get_backend().aexecute(AttestatiRepo.SQL_INSERT, (id_soggetto, id_corso, data_svolgimento))
+            return True
+        except Exception as e:
+            logger.error(f"Errore Insert Attestato: {e}")
+            return False
+
+    @staticmethod
+    async def insert_many(records):
+        rows = AttestatiRepo._bulk_rows(records)
+        if not rows:
+            return True, {}
+        try:
+            result = await get_backend().abulk_upsert(
+                AttestatiRepo.BULK_TABLE, AttestatiRepo.BULK_COLUMNS, AttestatiRepo.BULK_COLUMNS,
+                rows, AttestatiRepo.BULK_RETURNING)
+            return True, AttestatiRepo._map_bulk_result(result)
+        except Exception as e:
+            logger.error(f"Errore Insert lotto attestati: {e}")
+            return False, f"Errore DB: {str(e)}"
+
+    @staticmethod
+    async def link_documents(links):
+        rows = list({r[0]: tuple(r) for r in links}.values())
+        if not rows:
+            return True
+        try:
+            await get_backend().abulk_upsert(AttestatiRepo.DOCS_TABLE, AttestatiRepo.DOCS_COLUMNS,
+                                             AttestatiRepo.DOCS_KEYS, rows, AttestatiRepo.DOCS_KEYS)
+            return True
+        except Exception as e:
+            logger.error(f"Errore collegamento documenti attestati: {e}")
+            return False
+
+    @staticmethod
+    async def get_documents(ids):
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+        try:
+            rows = await get_backend().afetchall(AttestatiRepo._sql_documents(len(ids)), tuple(ids))
+            return AttestatiRepo._map_documents(rows)
+        except Exception as e:
+            logger.error(f"Errore lettura documenti attestati: {e}")
+            return {}
+
+    @staticmethod
+    async def linked_hashes(keys):
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return set()
+        rows = await get_backend().afetchall(AttestatiRepo._sql_linked_hashes(len(keys)), tuple(keys))
+        return {r[0].strip() for r in rows}
+
+@instrumented
+class AsyncAuthRepo:
+    @staticmethod
+    async def get_all_users():
+        try:
+            rows = await get_backend().afetchall(AuthRepo.SQL_ALL_USERS)
+            return [{'USERNAME': r[0], 'RUOLO': r[1]} for r in rows]
+        except Exception as e:
+            logger.error(f"Err AsyncAuthRepo.get_all: {e}")
+            return []
+
+    @staticmethod
+    async def create_user(username, password_clear, role='user'):
+        backend = get_backend()
+        try:
+            # bcrypt è CPU-bound: resta in un thread per non bloccare l'event loop
+            pwd_hash = await asyncio.to_thread(AuthRepo._hash_password, password_clear)
+            await backend.aexecute(AuthRepo.SQL_CREATE_USER, (username, pwd_hash, role))
+            return True, "Utente creato con successo."
+        except backend.integrity_errors:
+            logger.info("Errore: Username già esistente")
+            return False, "Errore: Username già esistente."
+        except Exception as e:
+            return False, f"Errore DB: {str(e)}"
+
+    @staticmethod
+    async def delete_user(username):
+        try:
+            await get_backend().aexecute(AuthRepo.SQL_DELETE_USER, (username,))
+            return True
+        except Exception: return False
+
+@instrumented
+class AsyncCorsoRepo:
+    @staticmethod
+    async def get_all(search=''):
+        try:
+            return await get_backend().afetchall_dicts(*CorsoRepo._sql_get_all(search))
+        except Exception as e:
+            logger.error(f"Errore AsyncCorsoRepo.get_all: {e}")
+            return []
+
+    @staticmethod
+    async def get_page(search='', with_total=True, **page):
+        try:
+            return await get_backend().afetch_page(CorsoRepo._page_query(search, **page), CorsoRepo._map_row, with_total)
+        except Exception as e:
+            logger.error(f"Errore AsyncCorsoRepo.get_page: {e}")
+            return empty_page()
+
+    @staticmethod
+    async def get_next_id():
+        backend = get_backend()
+        try:
+            return await backend.anext_value(CorsoRepo.SEQUENCE)
+        except Exception:
+            # Sequenza non ancora creata (migrazione 3 non applicata)
+            row = await backend.afetchone(CorsoRepo.SQL_NEXT_ID)
+            return row[0]
+
+    @staticmethod
+    async def upsert(data, is_new):
+        try:
+            query, params, msg = CorsoRepo._sql_upsert(data, is_new)
+            await get_backend().aexecute(query, params)
+            return True, msg
+        except Exception as e:
+            return False, str(e)
+
+    @staticmethod
+    async def delete(id_corso):
+        await get_backend().aexecute(CorsoRepo.SQL_DELETE, (id_corso,))
+        return True, "Eliminato"
+
+@instrumented
+class AsyncEnteRepo:
+    @staticmethod
+    async def get_all(search_term=''):
+        try:
+            rows = await get_backend().afetchall(*EnteRepo._sql_get_all(search_term))
+            return [EnteRepo._map_row(r) for r in rows]
+        except Exception as e:
+            logger.error(f"Errore AsyncEnteRepo.get_all: {e}")
+            return []
+
+    @staticmethod
+    async def get_page(search_term='', with_total=True, **page):
+        try:
+            return await get_backend().afetch_page(EnteRepo._page_query(search_term, **page), EnteRepo._map_row, with_total)
+        except Exception as e:
+            logger.error(f"Errore AsyncEnteRepo.get_page: {e}")
+            return empty_page()
+
+    @staticmethod
+    async def get_next_id():
+        backend = get_backend()
+        try:
+            return await backend.anext_value(EnteRepo.SEQUENCE)
+        except Exception:
+            pass
+        try:
+            row = await backend.afetchone(EnteRepo.SQL_MAX_ID)
+            max_id = row[0] if row and row[0] is not None else 0
+            return max_id + 1
+        except Exception as e:
+            logger.error(f"Errore calcolo ID Ente: {e}")
+            return 1
+
+    @staticmethod
+    async def upsert(data, is_new=True):
+        try:
+            await get_backend().aexecute(*EnteRepo._sql_upsert(data, is_new))
+            return True, "Salvataggio completato."
+        except Exception as e:
+            return False, f"Errore DB: {str(e)}"
+
+    @staticmethod
+    async def delete(id_ente):
+        try:
+            await get_backend().aexecute(EnteRepo.SQL_DELETE, (id_ente,))
+            return True
+        except Exception:
+            return False
+
+@instrumented
+class AsyncJobRepo:
+    @staticmethod
+    async def create(tipo, utente, parametri, totale):
+        try:
+            job_id = await get_backend().anext_value(JobRepo.SEQUENCE)
+            await get_backend().aexecute(JobRepo.SQL_INSERT, (job_id, tipo, JOB_QUEUED, utente,
+                                                              json.dumps(parametri, default=str), totale))
+            return job_id
+        except Exception as e:
+            logger.error(f"Errore creazione lavoro: {e}")
+            return None
+
+    @staticmethod
+    async def get(job_id):
+        row = await get_backend().afetchone(JobRepo.SQL_GET, (job_id,))
+        return JobRepo._map_row(row) if row else None
+
+    @staticmethod
+    async def list_for_user(utente, limit=5):
+        try:
+            rows = await get_backend().afetchall(JobRepo._sql_for_user(limit), (utente,))
+            return [JobRepo._map_row(r) for r in rows]
+        except Exception as e:
+            logger.error(f"Errore lista lavori: {e}")
+            return []
+
+    @staticmethod
+    async def claim_next(runner_id):
+        backend = get_backend()
+        while True:
+            row = await backend.afetchone(JobRepo.SQL_NEXT_QUEUED)
+            if not row or row[0] is None:
+                return None
+            if await backend.aexecute(JobRepo.SQL_CLAIM, (runner_id, row[0])) == 1:
+                raw = (await backend.afetchone(JobRepo.SQL_PARAMS, (row[0],)))[0]
+                return await AsyncJobRepo.get(row[0]), JobRepo._load_params(raw)
+
+    @staticmethod
+    async def set_progress(job_id, runner_id, fatti):
+        return await get_backend().aexecute(JobRepo.SQL_PROGRESS, (fatti, job_id, runner_id))
+
+    @staticmethod
+    async def finish(job_id, runner_id, file_risultato, nota=None):
+        return await get_backend().aexecute(JobRepo.SQL_FINISH, (file_risultato, nota, job_id, runner_id))
+
+    @staticmethod
+    async def fail(job_id, runner_id, errore):
+        return await get_backend().aexecute(JobRepo.SQL_FAIL,
+                                            (str(errore)[:JobRepo.ERROR_MAX_LEN], job_id, runner_id))
+
+    @staticmethod
+    async def heartbeat(runner_id):
+        return await get_backend().aexecute(JobRepo.SQL_HEARTBEAT, (runner_id,))
+
+    @staticmethod
+    async def requeue_stale(stale_seconds):
+        return await get_backend().aexecute(JobRepo._sql_requeue_stale(stale_seconds))
+
+    @staticmethod
+    async def release(runner_id):
+        return await get_backend().aexecute(JobRepo.SQL_RELEASE, (runner_id,))
+
+# --- HELPERS ASINCRONI ---
+@timed("allocate_session_numbers_async")
+async def allocate_session_numbers_async(groups):
+    pending = _session_requests(groups)
+    result = {}
+    backend = get_backend()
+    for _ in range(SESSIONS_ATTEMPTS):
+        if not pending:
+            break
+        try:
+            rows = await backend.arun_batch(_session_statements(pending), "ALLOCA sessioni")
+        except backend.integrity_errors as e:
+            logger.info(f"Contatore di sessione creato da un'altra generazione, si ripete: {e}")
+            continue
+        result.update(_session_numbers(rows))
+        pending = [r for r in pending if (r[0], r[1]) not in result]
+    if pending:
+        raise RuntimeError(f"Numero di sessione non assegnato per {len(pending)} sessioni")
+    return result
+
+@timed("get_corsi_async")
+async def get_corsi_async():
+    try:
+        return _map_corsi_rows(await get_backend().afetchall(SQL_CORSI_LIST))
+    except Exception as e:
+        logger.error(f"Errore critico durante la lettura del CorsoRepo: {e}")
+        return []
+
+@timed("get_count_attestati_oggi_async")
+async def get_count_attestati_oggi_async():
+    try:
+        row = await get_backend().aquery_one('CountAttestatiOggi')
+        return row[0] if row else 0
+    except Exception as e:
+        logger.error(f"Err Count Oggi: {e}")
+        return 0
+
+@timed("check_user_credentials_async")
+async def check_user_credentials_async(username, plain_password):
+    try:
+        row = await get_backend().aquery_one('LoginHash', (username,))
+        return await asyncio.to_thread(_verify_password, username, plain_password, row)
+    except Exception as e:
+        logger.warning(f" Errore grave!! {e}")
+        return False
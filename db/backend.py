@@ -0,0 +1,436 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager, asynccontextmanager
+
+from .config import load_config
+from .dialects import get_dialect
+from .metrics import QueryMetrics, statement_label
+from .paging import EXACT_COUNT_LIMIT
+from .pool import ConnectionPool
+from .queries import QueryRegistry, QUERIES_FILE
+
+logger = logging.getLogger()
+
+# Righe lette dal server per ogni giro delle esportazioni in streaming
+STREAM_ITERSIZE = 2000
+
+
+class _Probe:
+    """Misura di una singola istruzione, compilata dal metodo che la esegue."""
+    def __init__(self, wait):
+        self.wait = wait
+        self.rows = 0
+        self.failed = False
+        self._start = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+
+class Backend:
+    """
+    Punto unico di accesso al database: dialetto + pool sincrono + pool asincrono.
+    Pooling, traduzione delle query e conversione dei tipi sono fatti qui una volta sola
+    per Firebird e PostgreSQL.
+    """
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.dialect = get_dialect(cfg['backend'])
+        self._conn_params = cfg['connection']
+        pool_cfg = cfg.get('pool') or {}
+
+        self.pool = ConnectionPool(
+            lambda: self.dialect.connect(self._conn_params),
+            min_size=pool_cfg.get('min_size', 1),
+            max_size=pool_cfg.get('max_size', 10),
+            max_lifetime=pool_cfg.get('max_lifetime', 1800),
+            timeout=pool_cfg.get('timeout', 30),
+            ping_after=pool_cfg.get('ping_after', 10),
+            ping_sql=self.dialect.ping_sql,
+        )
+        # Solo PostgreSQL ha un driver async: per Firebird le chiamate async
+        # vengono eseguite sul pool sincrono in un thread.
+        self.async_pool = self.dialect.create_async_pool(self._conn_params, pool_cfg)
+        self._sql_cache = {}
+        self._label_cache = {}
+        # Query "calde" con nome (queries.json), caricate una volta sola
+        self.queries = QueryRegistry.load(cfg.get('queries') or QUERIES_FILE)
+        # Tempi, righe e attese di ogni istruzione + log delle query lente
+        self.metrics = QueryMetrics(cfg.get('metrics'))
+        # Versioni dello schema applicate (T_MIGRAZIONI), lette una volta: vedi has_migration
+        self._migrations = None
+
+    @property
+    def name(self):
+        return self.dialect.name
+
+    @property
+    def integrity_errors(self):
+        return self.dialect.integrity_errors()
+
+    def sql(self, text):
+        """Query tradotta nel dialetto (memorizzata: la traduzione si fa una volta per testo)."""
+        translated = self._sql_cache.get(text)
+        if translated is None:
+            translated = self._sql_cache[text] = self.dialect.sql(text)
+        return translated
+
+    # --- MISURE (vedi metrics.py) ---
+    def _label(self, sql):
+        label = self._label_cache.get(sql)
+        if label is None:
+            label = self._label_cache[sql] = statement_label(sql)
+        return label
+
+    @contextmanager
+    def _measured(self, query, sql, params):
+        """
+        Connessione dal pool per una sola istruzione, misurata:
+        attesa del pool, tempo da execute all'ultima fetch, righe (probe.rows).
+        """
+        started = time.perf_counter()
+        with self.pool.connection() as conn:
+            probe = _Probe(time.perf_counter() - started)
+            try:
+                yield conn, probe
+            except Exception:
+                probe.failed = True
+                raise
+            finally:
+                self.metrics.observe(query or self._label(sql), probe.elapsed(), probe.rows,
+                                     probe.wait, probe.failed, sql, params)
+
+    @asynccontextmanager
+    async def _ameasured(self, query, sql, params):
+        started = time.perf_counter()
+        async with self.async_pool.connection() as conn:
+            probe = _Probe(time.perf_counter() - started)
+            try:
+                yield conn, probe
+            except Exception:
+                probe.failed = True
+                raise
+            finally:
+                self.metrics.observe(query or self._label(sql), probe.elapsed(), probe.rows,
+                                     probe.wait, probe.failed, sql, params)
+
+    # --- API SINCRONA ---
+    def connection(self):
+        """Uso: with backend.connection() as conn: ... (non misurata: per le migrazioni e casi speciali)"""
+        return self.pool.connection()
+
+    def _run(self, cur, sql, params):
+        cur.execute(self.sql(sql), self.dialect.adapt_params(params))
+
+    def fetchall(self, sql, params=()):
+        with self._measured(None, sql, params) as (conn, probe):
+            cur = conn.cursor()
+            self._run(cur, sql, params)
+            rows = cur.fetchall()
+            probe.rows = len(rows)
+        return [self.dialect.adapt_row(r) for r in rows]
+
+    def fetchall_dicts(self, sql, params=()):
+        """Righe come dizionari con i nomi colonna in MAIUSCOLO."""
+        with self._measured(None, sql, params) as (conn, probe):
+            cur = conn.cursor()
+            self._run(cur, sql, params)
+            col_names = [desc[0].upper() for desc in cur.description]
+            rows = cur.fetchall()
+            probe.rows = len(rows)
+        return [dict(zip(col_names, self.dialect.adapt_row(r))) for r in rows]
+
+    def fetchone(self, sql, params=()):
+        with self._measured(None, sql, params) as (conn, probe):
+            cur = conn.cursor()
+            self._run(cur, sql, params)
+            row = cur.fetchone()
+            probe.rows = 1 if row else 0
+        return self.dialect.adapt_row(row) if row else row
+
+    def execute(self, sql, params=()):
+        """Esegue una scrittura e fa commit. Restituisce il rowcount."""
+        with self._measured(None, sql, params) as (conn, probe):
+            cur = conn.cursor()
+            self._run(cur, sql, params)
+            conn.commit()
+            probe.rows = max(cur.rowcount, 0)
+            return cur.rowcount
+
+    def stream(self, sql, params=(), itersize=STREAM_ITERSIZE, label=None):
+        """
+        Generatore di righe per le esportazioni: legge a blocchi di itersize righe da un
+        cursore lato server, quindi la memoria non cresce con la dimensione del risultato.
+        La connessione resta presa dal pool finché il generatore non termina o viene chiuso
+        (il tempo misurato comprende anche quello del download).
+        """
+        with self._measured(label, sql, params) as (conn, probe):
+            cur = self.dialect.stream_cursor(conn)
+            try:
+                cur.execute(self.sql(sql), self.dialect.adapt_params(params))
+                while True:
+                    rows = cur.fetchmany(itersize)
+                    if not rows:
+                        break
+                    probe.rows += len(rows)
+                    for r in rows:
+                        yield self.dialect.adapt_row(r)
+            finally:
+                cur.close()
+
+    def bulk_upsert(self, table, columns, keys, rows, returning):
+        """
+        Inserisce tutte le righe in UNA transazione (una connessione, un commit),
+        senza duplicare quelle già presenti sulle colonne keys.
+        Restituisce le tuple returning di tutte le righe; se qualcosa fallisce non scrive nulla.
+        """
+        return self.run_batch(self.dialect.bulk_upsert(table, columns, keys, rows, returning),
+                              f"UPSERT {table.split('.')[-1].lower()}")
+
+    def run_batch(self, statements, label):
+        """
+        Esegue le istruzioni (sql, params) in UNA transazione e restituisce le righe
+        di tutte le istruzioni che ne producono (es. con RETURNING; le altre, come un lock,
+        non aggiungono niente).
+        """
+        result = []
+        with self._measured(label, None, ()) as (conn, probe):
+            cur = conn.cursor()
+            for sql, params in statements:
+                cur.execute(self.dialect.sql(sql), self.dialect.adapt_params(params))
+                if cur.description is not None:
+                    result.extend(self.dialect.adapt_row(r) for r in cur.fetchall())
+            conn.commit()
+            probe.rows = len(result)
+        return result
+
+    def next_value(self, sequence):
+        """Prossimo valore di una sequenza (vedi migrazioni)."""
+        return self.fetchone(self.dialect.next_value_sql(sequence))[0]
+
+    # --- PAGINE (tabelle paginate lato server) ---
+    def count(self, page_query):
+        """
+        Totale righe di una PageQuery: (totale, stimato).
+        Su PostgreSQL le tabelle grandi usano la stima del planner invece di COUNT(*).
+        """
+        sql, params = page_query.estimate_sql()
+        explain = self.dialect.explain_sql(sql)
+        if explain:
+            estimate = self.dialect.parse_explain(self.fetchone(explain, params))
+            if estimate >= EXACT_COUNT_LIMIT:
+                return estimate, True
+        return self.fetchone(*page_query.count_sql())[0], False
+
+    def fetch_page(self, page_query, map_row, with_total=True):
+        rows = self.fetchall(*page_query.rows_sql(self.dialect))
+        total, estimated = self.count(page_query) if with_total else (None, False)
+        return page_query.page(rows, map_row, total, estimated)
+
+    # --- QUERY CON NOME (preparate per connessione) ---
+    def _run_named(self, name, params, fetch):
+        sql = self.queries.sql(name, self.dialect)
+        with self._measured(name, sql, params) as (conn, probe):
+            cur = self.dialect.execute_prepared(conn, name, sql, self.dialect.adapt_params(params))
+            result = fetch(cur)
+            probe.rows = len(result) if isinstance(result, list) else int(result is not None)
+        return result
+
+    def query_all(self, name, params=()):
+        rows = self._run_named(name, params, lambda cur: cur.fetchall())
+        return [self.dialect.adapt_row(r) for r in rows]
+
+    def query_one(self, name, params=()):
+        row = self._run_named(name, params, lambda cur: cur.fetchone())
+        return self.dialect.adapt_row(row) if row else row
+
+    async def _arun_named(self, name, params, fetch):
+        sql = self.queries.sql(name, self.dialect)
+        async with self._ameasured(name, sql, params) as (conn, probe):
+            # psycopg 3 prepara lato server e tiene la cache per connessione
+            cur = await conn.execute(sql, self.dialect.adapt_params(params), prepare=True)
+            result = await fetch(cur)
+            probe.rows = len(result) if isinstance(result, list) else int(result is not None)
+        return result
+
+    async def aquery_all(self, name, params=()):
+        if self.async_pool is None:
+            return await asyncio.to_thread(self.query_all, name, params)
+        rows = await self._arun_named(name, params, lambda cur: cur.fetchall())
+        return [self.dialect.adapt_row(r) for r in rows]
+
+    async def aquery_one(self, name, params=()):
+        if self.async_pool is None:
+            return await asyncio.to_thread(self.query_one, name, params)
+        row = await self._arun_named(name, params, lambda cur: cur.fetchone())
+        return self.dialect.adapt_row(row) if row else row
+
+    def query_stats(self):
+        return self.metrics.stats()
+
+    def metrics_text(self):
+        """Metriche in formato Prometheus (endpoint /metrics)."""
+        return self.metrics.prometheus(self.pool.stats())
+
+    # --- API ASINCRONA ---
+    async def afetchall(self, sql, params=()):
+        if self.async_pool is None:
+            return await asyncio.to_thread(self.fetchall, sql, params)
+        async with self._ameasured(None, sql, params) as (conn, probe):
+            cur = await conn.execute(self.sql(sql), self.dialect.adapt_params(params))
+            rows = await cur.fetchall()
+            probe.rows = len(rows)
+        return [self.dialect.adapt_row(r) for r in rows]
+
+    async def afetchall_dicts(self, sql, params=()):
+        if self.async_pool is None:
+            return await asyncio.to_thread(self.fetchall_dicts, sql, params)
+        async with self._ameasured(None, sql, params) as (conn, probe):
+            cur = await conn.execute(self.sql(sql), self.dialect.adapt_params(params))
+            col_names = [desc[0].upper() for desc in cur.description]
+            rows = await cur.fetchall()
+            probe.rows = len(rows)
+        return [dict(zip(col_names, self.dialect.adapt_row(r))) for r in rows]
+
+    async def afetchone(self, sql, params=()):
+        if self.async_pool is None:
+            return await asyncio.to_thread(self.fetchone, sql, params)
+        async with self._ameasured(None, sql, params) as (conn, probe):
+            cur = await conn.execute(self.sql(sql), self.dialect.adapt_params(params))
+            row = await cur.fetchone()
+            probe.rows = 1 if row else 0
+        return self.dialect.adapt_row(row) if row else row
+
+    async def abulk_upsert(self, table, columns, keys, rows, returning):
+        return await self.arun_batch(self.dialect.bulk_upsert(table, columns, keys, rows, returning),
+                                     f"UPSERT {table.split('.')[-1].lower()}")
+
+    async def arun_batch(self, statements, label):
+        if self.async_pool is None:
+            return await asyncio.to_thread(self.run_batch, list(statements), label)
+        result = []
+        async with self._ameasured(label, None, ()) as (conn, probe):
+            for sql, params in statements:
+                cur = await conn.execute(self.dialect.sql(sql), self.dialect.adapt_params(params))
+                if cur.description is not None:
+                    result.extend(self.dialect.adapt_row(r) for r in await cur.fetchall())
+            await conn.commit()
+            probe.rows = len(result)
+        return result
+
+    async def acount(self, page_query):
+        sql, params = page_query.estimate_sql()
+        explain = self.dialect.explain_sql(sql)
+        if explain:
+            estimate = self.dialect.parse_explain(await self.afetchone(explain, params))
+            if estimate >= EXACT_COUNT_LIMIT:
+                return estimate, True
+        return (await self.afetchone(*page_query.count_sql()))[0], False
+
+    async def afetch_page(self, page_query, map_row, with_total=True):
+        rows = await self.afetchall(*page_query.rows_sql(self.dialect))
+        total, estimated = await self.acount(page_query) if with_total else (None, False)
+        return page_query.page(rows, map_row, total, estimated)
+
+    async def anext_value(self, sequence):
+        return (await self.afetchone(self.dialect.next_value_sql(sequence)))[0]
+
+    async def aexecute(self, sql, params=()):
+        if self.async_pool is None:
+            return await asyncio.to_thread(self.execute, sql, params)
+        async with self._ameasured(None, sql, params) as (conn, probe):
+            cur = await conn.execute(self.sql(sql), self.dialect.adapt_params(params))
+            await conn.commit()
+            probe.rows = max(cur.rowcount, 0)
+            return cur.rowcount
+
+    # --- SCHEMA ---
+    def load_migrations(self):
+        """Rilegge le versioni applicate (all'avvio, dopo le migrazioni automatiche)."""
+        from .migrations import applied_versions
+        try:
+            self._migrations = frozenset(applied_versions(self))
+        except Exception as e:
+            logger.error(f"Versioni dello schema non lette: {e}")
+            self._migrations = frozenset()
+        return self._migrations
+
+    def has_migration(self, version):
+        """
+        La migrazione è applicata? Le query che usano oggetti creati da una migrazione
+        ripiegano sulla forma di prima se manca. Una migrazione applicata a mano mentre
+        l'app gira vale dal riavvio successivo.
+        """
+        if self._migrations is None:
+            self.load_migrations()
+        return version in self._migrations
+
+    # --- CICLO DI VITA ---
+    async def open(self):
+        if (self.cfg.get('migrations') or {}).get('auto', True):
+            from .migrations import migrate
+            try:
+                done = await asyncio.to_thread(migrate, self, startup=True)
+                if done:
+                    logger.info(f"Migrazioni applicate all'avvio: {done}")
+            except Exception as e:
+                # L'app funziona anche senza gli indici: si segnala e si prosegue
+                logger.error(f"Migrazioni non completate: {e}")
+        await asyncio.to_thread(self.load_migrations)
+        if self.async_pool is not None:
+            await self.async_pool.open()
+        else:
+            await asyncio.to_thread(self.pool.warmup)
+        logger.info(f"Backend {self.name} pronto: {self.stats()}")
+
+    async def close(self):
+        logger.info(f"Chiusura backend {self.name}: {self.stats()}")
+        if self.async_pool is not None:
+            await self.async_pool.close()
+        self.pool.closeall()
+
+    def stats(self):
+        """Statistiche dei pool (in uso, inattive, tempi di attesa) per dimensionarli."""
+        return {
+            'backend': self.name,
+            'pool': self.pool.stats(),
+            'async_pool': self.async_pool.get_stats() if self.async_pool is not None else None,
+            'operations': self.metrics.by_operation(),
+            'queries': self.query_stats(),
+        }
+
+
+# --- BACKEND DI PROCESSO ---
+_backend = None
+
+
+def configure(path=None):
+    """Crea il backend dal file di configurazione (default: WSM_CONFIG o config_postgres.json)."""
+    global _backend
+    _backend = Backend(load_config(path))
+    return _backend
+
+
+def get_backend():
+    if _backend is None:
+        configure()
+    return _backend
+
+
+def db_connection():
+    """Context manager che presta una connessione dal pool e la restituisce all'uscita."""
+    return get_backend().connection()
+
+
+def get_pool_stats():
+    return get_backend().stats()
+
+
+def get_query_stats():
+    """Esecuzioni, righe, attese e istogramma latenze per (operazione, query)."""
+    return get_backend().query_stats()
+
+
+def get_metrics_text():
+    return get_backend().metrics_text()
@@ -0,0 +1,55 @@
+import json
+import os
+import logging
+
+logger = logging.getLogger()
+
+# --- CONFIGURAZIONE DATABASE ---
+# Il file di configurazione si sceglie con la variabile d'ambiente WSM_CONFIG
+# (main_mod.py -> config.json / Firebird, main_mod_postgres.py -> config_postgres.json).
+DEFAULT_CONFIG_FILE = 'config_postgres.json'
+
+DEFAULT_CONFIG = {
+    'backend': 'postgres',
+    'host': 'localhost',
+    'database': 'postgres',
+    'user': 'postgres',
+    'password': 'abcd1234',
+    'port': 5432
+}
+
+# Sezioni del config che NON sono parametri di connessione del driver
+# ("queries": percorso del file delle query con nome, default queries.json;
+#  "migrations": {"auto": false} per non applicare le migrazioni all'avvio;
+#  "metrics": {"slow_ms": 500, "slow_log": "slow_queries.log"} per il log delle query lente;
+#  "jobs": {"max_concurrent": 1, "output_dir": "exports", "keep_days": 7, "soffice": null} per la coda
+#   dei lavori in background; "soffice" è il percorso di LibreOffice se non è nel PATH;
+#  "search": {"index": true, "refresh_seconds": 300} per l'indice in memoria della ricerca soggetti)
+CONFIG_SECTIONS = ('backend', 'pool', 'queries', 'migrations', 'metrics', 'jobs', 'search')
+
+
+def _guess_backend(cfg):
+    """Compatibilità con i vecchi config senza chiave "backend"."""
+    if cfg.get('port') == 3050 or str(cfg.get('database', '')).lower().endswith('.fdb'):
+        return 'firebird'
+    return 'postgres'
+
+
+def load_config(path=None):
+    """
+    Legge il file di configurazione e lo divide in:
+    backend (nome dialetto), connection (parametri del driver) e le altre sezioni.
+    """
+    path = path or os.environ.get('WSM_CONFIG', DEFAULT_CONFIG_FILE)
+    try:
+        with open(path, 'r') as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        logger.error(f"ATTENZIONE: File {path} non trovato. Uso parametri di default.")
+        raw = dict(DEFAULT_CONFIG)
+
+    cfg = {section: raw.pop(section, {}) for section in CONFIG_SECTIONS}
+    cfg['backend'] = cfg['backend'] or _guess_backend(raw)
+    cfg['connection'] = raw
+    cfg['path'] = path
+    return cfg
@@ -0,0 +1,287 @@
+import itertools
+import json
+import re
+import weakref
+
+# --- DIALETTI ---
+# Le query dei repository sono scritte una sola volta in stile PostgreSQL
+# (segnaposto %s, schema public.) e ogni dialetto le adatta al proprio driver.
+# I driver sono importati solo quando servono: chi usa Firebird non deve
+# installare psycopg e viceversa.
+
+
+class Dialect:
+    name = ''
+    ping_sql = 'SELECT 1'
+    supports_async = False
+    transactional_ddl = True   # CREATE INDEX/SEQUENCE annullabili con rollback
+
+    def connect(self, params):
+        raise NotImplementedError
+
+    def sql(self, text):
+        """Traduce una query scritta in stile PostgreSQL nel dialetto del driver."""
+        return text
+
+    def ilike(self, expr):
+        """Confronto case-insensitive 'expr ILIKE %s'."""
+        return f"{expr} ILIKE %s"
+
+    def add_years(self, date_expr, years_expr):
+        """Espressione SQL: data + N anni (come DATE)."""
+        return f"CAST({date_expr} + {years_expr} * INTERVAL '1 year' AS DATE)"
+
+    def add_seconds(self, ts_expr, seconds_expr):
+        """Espressione SQL: timestamp + N secondi."""
+        return f"({ts_expr} + {seconds_expr} * INTERVAL '1 second')"
+
+    def adapt_params(self, params):
+        return tuple(params)
+
+    def adapt_row(self, row):
+        return row
+
+    def integrity_errors(self):
+        return ()
+
+    def execute_prepared(self, conn, name, sql, params):
+        """
+        Esegue una query del registro (sql già tradotta) e restituisce il cursore da cui leggere.
+        Di default è una execute normale; i dialetti che lo supportano la preparano
+        una volta per connessione del pool.
+        """
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        return cur
+
+    def stream_cursor(self, conn):
+        """
+        Cursore per leggere risultati grandi a blocchi (fetchmany) senza caricarli tutti.
+        Di default un cursore normale: i driver che scaricano tutto all'execute lo ridefiniscono.
+        """
+        return conn.cursor()
+
+    def paginate(self, sql, limit, offset):
+        return f"{sql} LIMIT {int(limit)} OFFSET {int(offset)}"
+
+    def next_value_sql(self, sequence):
+        raise NotImplementedError
+
+    def migration_lock_sql(self):
+        """Lock di transazione che serializza le migrazioni tra più processi (None se non serve)."""
+        return None
+
+    def explain_sql(self, sql):
+        """Query che restituisce la stima delle righe del planner (None se non disponibile)."""
+        return None
+
+    def parse_explain(self, row):
+        return None
+
+    # Valori per singola lista IN (Firebird ne accetta al massimo 1500)
+    IN_CHUNK = 1000
+
+    def any_of(self, expr, values):
+        """Condizione (sql, params): expr uguale a uno dei valori. Di default liste IN."""
+        values = list(values)
+        groups = [values[i:i + self.IN_CHUNK] for i in range(0, len(values), self.IN_CHUNK)]
+        sql = " OR ".join(f"{expr} IN ({', '.join(['%s'] * len(g))})" for g in groups)
+        return f"({sql})", tuple(values)
+
+    def bulk_upsert(self, table, columns, keys, rows, returning):
+        """
+        Istruzioni (sql, params) che inseriscono tutte le righe, ignorando i duplicati
+        sulle colonne keys, e restituiscono le colonne returning di ogni riga.
+        Il Backend le traduce e le esegue tutte nella stessa transazione.
+        """
+        raise NotImplementedError
+
+    def create_async_pool(self, params, pool_cfg):
+        return None
+
+
+class PostgresDialect(Dialect):
+    name = 'postgres'
+    supports_async = True
+
+    # connessione -> nomi già preparati (PREPARE vale per la sessione, non per la transazione)
+    _prepared = weakref.WeakKeyDictionary()
+    _placeholder_re = re.compile(r'%s')
+    _stream_ids = itertools.count(1)
+
+    def connect(self, params):
+        import psycopg2
+        return psycopg2.connect(**params)
+
+    def integrity_errors(self):
+        errors = []
+        try:
+            import psycopg2
+            errors.append(psycopg2.IntegrityError)
+        except ImportError: pass
+        try:
+            import psycopg
+            errors.append(psycopg.IntegrityError)
+        except ImportError: pass
+        return tuple(errors)
+
+    def execute_prepared(self, conn, name, sql, params):
+        # psycopg2 non prepara lato server: PREPARE/EXECUTE espliciti, una volta per connessione
+        cur = conn.cursor()
+        stmt = f"wsm_{name.lower()}"
+        prepared = self._prepared.setdefault(conn, set())
+        if stmt not in prepared:
+            counter = itertools.count(1)
+            numbered = self._placeholder_re.sub(lambda m: f"${next(counter)}", sql)
+            cur.execute(f"PREPARE {stmt} AS {numbered}")
+            prepared.add(stmt)
+        if params:
+            cur.execute(f"EXECUTE {stmt} ({', '.join(['%s'] * len(params))})", params)
+        else:
+            cur.execute(f"EXECUTE {stmt}")
+        return cur
+
+    def stream_cursor(self, conn):
+        # Cursore con nome = cursore lato server: psycopg2 scarica solo le righe di ogni fetchmany
+        return conn.cursor(name=f"wsm_stream_{next(self._stream_ids)}")
+
+    def explain_sql(self, sql):
+        return f"EXPLAIN (FORMAT JSON) {sql}"
+
+    def any_of(self, expr, values):
+        # Un solo parametro array, qualunque sia il numero di valori (il driver lo adatta)
+        return f"{expr} = ANY(%s)", (list(values),)
+
+    def next_value_sql(self, sequence):
+        return f"SELECT nextval('{sequence}')"
+
+    def migration_lock_sql(self):
+        # Chiave arbitraria ma fissa per le migrazioni di WorkSafeManager
+        return "SELECT pg_advisory_xact_lock(72615)"
+
+    def parse_explain(self, row):
+        plan = row[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    # Righe per singola INSERT multi-VALUES (resta ben sotto il limite di 65535 parametri)
+    BULK_CHUNK = 1000
+
+    def bulk_upsert(self, table, columns, keys, rows, returning):
+        # INSERT ... VALUES (...), (...) ON CONFLICT: DO UPDATE invece di DO NOTHING così RETURNING
+        # restituisce anche le righe già presenti. Si aggiornano le colonne fuori dalla chiave
+        # (come UPDATE OR INSERT di Firebird); se sono tutte chiave, l'aggiornamento è a vuoto
+        updates = [c for c in columns if c not in keys] or [keys[0]]
+        row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        head = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+        tail = (f" ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+                + ', '.join(f"{c} = EXCLUDED.{c}" for c in updates)
+                + f" RETURNING {', '.join(returning)}")
+        for i in range(0, len(rows), self.BULK_CHUNK):
+            chunk = rows[i:i + self.BULK_CHUNK]
+            yield head + ', '.join([row_sql] * len(chunk)) + tail, tuple(v for r in chunk for v in r)
+
+    def create_async_pool(self, params, pool_cfg):
+        """Pool psycopg 3 per le pagine NiceGUI (None se psycopg_pool non è installato)."""
+        try:
+            from psycopg_pool import AsyncConnectionPool
+        except ImportError:
+            return None
+        return AsyncConnectionPool(
+            kwargs={('dbname' if k == 'database' else k): v for k, v in params.items()},
+            min_size=pool_cfg.get('min_size', 1),
+            max_size=pool_cfg.get('max_size', 10),
+            max_lifetime=pool_cfg.get('max_lifetime', 1800),
+            timeout=pool_cfg.get('timeout', 30),
+            check=AsyncConnectionPool.check_connection,
+            open=False,
+        )
+
+
+class FirebirdDialect(Dialect):
+    name = 'firebird'
+    ping_sql = 'SELECT 1 FROM RDB$DATABASE'
+    transactional_ddl = False
+
+    _schema_re = re.compile(r'\bpublic\.', re.IGNORECASE)
+    # connessione -> {nome: (cursore, PreparedStatement)}: in fdb lo statement preparato
+    # appartiene al cursore che l'ha creato
+    _prepared = weakref.WeakKeyDictionary()
+
+    def connect(self, params):
+        import fdb
+        return fdb.connect(
+            host=params['host'], database=params['database'],
+            user=params['user'], password=params['password'],
+            port=params.get('port', 3050), charset=params.get('charset', 'UTF8')
+        )
+
+    def sql(self, text):
+        # fdb usa il paramstyle qmark e Firebird non ha schemi
+        return self._schema_re.sub('', text).replace('%s', '?')
+
+    def ilike(self, expr):
+        # Firebird non ha ILIKE
+        return f"UPPER({expr}) LIKE UPPER(%s)"
+
+    def add_years(self, date_expr, years_expr):
+        return f"DATEADD(YEAR, {years_expr}, {date_expr})"
+
+    def add_seconds(self, ts_expr, seconds_expr):
+        return f"DATEADD(SECOND, {seconds_expr}, {ts_expr})"
+
+    def adapt_params(self, params):
+        # I flag booleani (IS_DOCENTE) sono SMALLINT su Firebird
+        return tuple(int(p) if isinstance(p, bool) else p for p in params)
+
+    def adapt_row(self, row):
+        # I campi CHAR di Firebird arrivano con gli spazi di riempimento
+        return tuple(v.rstrip() if isinstance(v, str) else v for v in row)
+
+    def execute_prepared(self, conn, name, sql, params):
+        statements = self._prepared.setdefault(conn, {})
+        entry = statements.get(name)
+        if entry is None:
+            cur = conn.cursor()
+            entry = statements[name] = (cur, cur.prep(sql))
+        cur, ps = entry
+        cur.execute(ps, params)
+        return cur
+
+    def next_value_sql(self, sequence):
+        return f"SELECT NEXT VALUE FOR {sequence} FROM RDB$DATABASE"
+
+    def paginate(self, sql, limit, offset):
+        # ROWS m TO n (1-based) esiste anche su Firebird 2.x, a differenza di OFFSET/FETCH
+        return f"{sql} ROWS {int(offset) + 1} TO {int(offset) + int(limit)}"
+
+    def bulk_upsert(self, table, columns, keys, rows, returning):
+        # Firebird non ha VALUES multi-riga né ON CONFLICT: UPDATE OR INSERT ... MATCHING,
+        # una riga per istruzione ma sempre sulla stessa connessione e transazione
+        sql = (f"UPDATE OR INSERT INTO {table} ({', '.join(columns)}) "
+               f"VALUES ({', '.join(['%s'] * len(columns))}) "
+               f"MATCHING ({', '.join(keys)}) RETURNING {', '.join(returning)}")
+        for r in rows:
+            yield sql, tuple(r)
+
+    def integrity_errors(self):
+        try:
+            import fdb
+            return (fdb.IntegrityError,)
+        except ImportError:
+            return ()
+
+
+DIALECTS = {
+    'postgres': PostgresDialect,
+    'postgresql': PostgresDialect,
+    'firebird': FirebirdDialect,
+}
+
+
+def get_dialect(name):
+    try:
+        return DIALECTS[name.lower()]()
+    except KeyError:
+        raise ValueError(f"Backend database non supportato: {name}")
@@ -0,0 +1,169 @@
+import csv
+import io
+import logging
+import tempfile
+from datetime import date, datetime
+
+from .backend import get_backend
+from .repos import UserRepo, AttestatiRepo, CorsoRepo, EnteRepo
+
+logger = logging.getLogger()
+
+# --- ESPORTAZIONI IN STREAMING ---
+# Le righe arrivano dal cursore lato server (Backend.stream) e vengono codificate
+# a blocchi: né la lista delle righe né il file intero stanno mai in memoria.
+# Il risultato è un generatore di bytes da passare a una StreamingResponse.
+
+# Righe CSV accumulate prima di mandare un blocco al browser
+CSV_CHUNK_ROWS = 500
+# L'XLSX è uno zip e si chiude solo alla fine: resta in RAM fino a 8 MB, poi su disco
+XLSX_SPOOL_MAX = 8 * 1024 * 1024
+XLSX_READ_CHUNK = 64 * 1024
+
+MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def _fmt_date(value):
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%d/%m/%Y')
+    return value or ''
+
+
+class ExportDataset:
+    """
+    Una tabella esportabile: intestazioni, query (la stessa PageQuery della pagina,
+    quindi stessi filtri e stesso ordinamento) e formattazione della riga.
+    """
+    def __init__(self, filename, header, page_query, format_row):
+        self.filename = filename
+        self.header = header
+        self.page_query = page_query
+        self.format_row = format_row
+
+    def rows(self, filters):
+        pq = self.page_query(filters)
+        sql, params = pq.all_sql()
+        for r in get_backend().stream(sql, params, label=f"EXPORT {self.filename}"):
+            yield self.format_row(pq.strip_keys(r))
+
+
+def _v(value):
+    return '' if value is None else value
+
+
+def _format_attestato(r):
+    row = AttestatiRepo._map_history_row(r)
+    scadenza = row['SCADENZA']
+    stato = "VALIDO" if scadenza and scadenza > date.today() else "SCADUTO"
+    return [row['ID'], _fmt_date(row['DATA_EMISSIONE']), row['CORSISTA'], row['CF'],
+            row['CORSO'], _fmt_date(scadenza), stato]
+
+
+def _format_soggetto(r):
+    return [r[0], _v(r[1]), r[2], r[3], _fmt_date(r[4]), _v(r[5]), _v(r[6]), "SI" if r[7] else "NO"]
+
+
+def _format_corso(r):
+    return [r[0], _v(r[3]), r[1], _v(r[2]), _v(r[6]), _v(r[5]), _v(r[4])]
+
+
+def _format_ente(r):
+    return [r[0], r[1], _v(r[2])]
+
+
+EXPORTS = {
+    'attestati': ExportDataset(
+        'Archivio_Attestati',
+        ['ID', 'Data Emissione', 'Corsista', 'Codice Fiscale', 'Corso', 'Scadenza', 'Stato'],
+        lambda f: AttestatiRepo._page_query(f.get('search', ''), f.get('date_start'), f.get('date_end')),
+        _format_attestato),
+    'soggetti': ExportDataset(
+        'Soggetti',
+        ['ID', 'Codice Fiscale', 'Cognome', 'Nome', 'Data Nascita', 'Luogo Nascita', 'ID Ente', 'Docente'],
+        lambda f: UserRepo._page_query(f.get('search', ''), bool(f.get('solo_docenti'))),
+        _format_soggetto),
+    'corsi': ExportDataset(
+        'Corsi',
+        ['ID', 'Codice', 'Nome Corso', 'Ore', 'Validità (anni)', 'Modello', 'Programma'],
+        lambda f: CorsoRepo._page_query(f.get('search', '')),
+        _format_corso),
+    'enti': ExportDataset(
+        'Enti',
+        ['ID', 'Descrizione', 'Partita IVA'],
+        lambda f: EnteRepo._page_query(f.get('search', '')),
+        _format_ente),
+}
+
+
+def iter_csv(header, rows, delimiter=';'):
+    """
+    CSV per Excel italiano (';' e BOM utf-8 per gli accenti), un blocco ogni CSV_CHUNK_ROWS righe.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=delimiter)
+    writer.writerow(header)
+    yield '\ufeff'.encode('utf-8') + buf.getvalue().encode('utf-8')
+    buf.seek(0)
+    buf.truncate()
+
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % CSV_CHUNK_ROWS == 0:
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode('utf-8')
+
+
+def xlsx_available():
+    try:
+        import openpyxl  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def iter_xlsx(header, rows, sheet_title='Export'):
+    """
+    XLSX con openpyxl in modalità write-only (le righe non restano in memoria).
+    Lo zip si può inviare solo a file chiuso: si scrive su uno SpooledTemporaryFile
+    e poi lo si legge a blocchi.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title[:31])
+    ws.append(header)
+    for row in rows:
+        ws.append(row)
+
+    with tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX) as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(XLSX_READ_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+
+
+def stream_export(name, fmt='csv', **filters):
+    """
+    (nome file, media type, generatore di bytes) per l'esportazione richiesta.
+    KeyError/ValueError per tabella o formato sconosciuti.
+    """
+    dataset = EXPORTS[name]
+    if fmt == 'csv':
+        body = iter_csv(dataset.header, dataset.rows(filters))
+    elif fmt == 'xlsx':
+        if not xlsx_available():
+            raise ValueError("Esportazione XLSX non disponibile: installare openpyxl")
+        body = iter_xlsx(dataset.header, dataset.rows(filters), dataset.filename)
+    else:
+        raise ValueError(f"Formato di esportazione non supportato: {fmt}")
+    logger.info(f"Export {name}.{fmt} avviato (filtri: {sorted(k for k, v in filters.items() if v)})")
+    return f"{dataset.filename}.{fmt}", MEDIA_TYPES[fmt], body
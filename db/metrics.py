@@ -0,0 +1,275 @@
+import contextvars
+import functools
+import inspect
+import logging
+import re
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger()
+
+# --- METRICHE DELLE QUERY ---
+# Ogni istruzione eseguita dal Backend registra: tempo (dalla execute all'ultima fetch),
+# righe restituite/modificate e attesa per avere la connessione dal pool.
+# Le misure sono raggruppate per (operazione, query):
+#   operazione = metodo del repository che l'ha chiesta (es. AsyncAttestatiRepo.get_history_page)
+#                oppure una sezione della UI marcata con operation('generazione');
+#   query      = nome della query del registro, o "SELECT t_attestati" per le query libere.
+# /metrics le espone in formato testo Prometheus.
+
+# Limiti superiori (in millisecondi) dei bucket dell'istogramma delle latenze
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Sopra questa durata la query finisce nel log delle query lente (config "metrics": {"slow_ms": ...})
+DEFAULT_SLOW_MS = 500
+DEFAULT_SLOW_LOG = 'slow_queries.log'
+
+NO_OPERATION = '-'
+
+_operation = contextvars.ContextVar('wsm_db_operation', default=None)
+
+
+# --- OPERAZIONI ---
+@contextmanager
+def operation(label):
+    """
+    Attribuisce a label tutte le query eseguite nel blocco (anche nei thread di asyncio.to_thread).
+    Se un'operazione è già attiva vince quella esterna: un metodo di repository chiamato
+    da un altro non sposta il tempo su di sé.
+    """
+    if _operation.get() is not None:
+        yield
+        return
+    token = _operation.set(label)
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+
+
+def current_operation():
+    return _operation.get() or NO_OPERATION
+
+
+def timed(label):
+    """Decoratore: la funzione (sincrona o async) diventa l'operazione label."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with operation(label):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with operation(label):
+                    return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrumented(cls):
+    """Decoratore di classe: ogni metodo statico pubblico del repository diventa un'operazione."""
+    for name, attr in list(vars(cls).items()):
+        if isinstance(attr, staticmethod) and not name.startswith('_'):
+            setattr(cls, name, staticmethod(timed(f"{cls.__name__}.{name}")(attr.__func__)))
+    return cls
+
+
+# --- ETICHETTE E PARAMETRI ---
+_statement_re = re.compile(
+    r'^\s*(?:WITH\b.*?\)\s*)?(SELECT|INSERT|UPDATE|DELETE|EXECUTE|CREATE|ALTER|DROP)\b'
+    r'(?:\s+(?:.*?\b(?:FROM|INTO)\s+)?([\w.$]+))?',
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+_explain_re = re.compile(r'^\s*EXPLAIN\s*(?:\([^)]*\))?', re.IGNORECASE)
+_count_re = re.compile(r'^\s*SELECT\s+COUNT\s*\(', re.IGNORECASE)
+
+
+def statement_label(sql):
+    """Etichetta breve di una query libera: verbo + prima tabella (es. "SELECT t_attestati")."""
+    explain = _explain_re.match(sql)
+    if explain:
+        return "EXPLAIN " + statement_label(sql[explain.end():]).split(' ', 1)[-1]
+    m = _statement_re.match(sql)
+    if not m:
+        return sql.split(None, 1)[0].upper() if sql.strip() else 'SQL'
+    verb, table = m.group(1).upper(), m.group(2)
+    if verb == 'SELECT' and _count_re.match(sql):
+        verb = 'COUNT'
+    if table:
+        table = table.split('.')[-1].lower()
+    return f"{verb} {table}" if table else verb
+
+
+def redact_params(params):
+    """
+    Parametri per il log: solo tipo e lunghezza, mai il valore
+    (codici fiscali, nomi, hash delle password).
+    """
+    out = []
+    for p in params or ():
+        if p is None:
+            out.append('NULL')
+        elif isinstance(p, (str, bytes, list, tuple)):
+            out.append(f"<{type(p).__name__}:{len(p)}>")
+        else:
+            out.append(f"<{type(p).__name__}>")
+    return out
+
+
+def _compact_sql(sql, limit=500):
+    text = ' '.join(sql.split())
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+# --- AGGREGATI ---
+class QueryStats:
+    """Contatori + istogramma latenze di una coppia (operazione, query)."""
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.slow = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.wait = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)  # l'ultimo è +Inf
+
+    def observe(self, seconds, rows, wait, failed, slow):
+        self.count += 1
+        self.errors += failed
+        self.slow += slow
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.rows += rows or 0
+        self.wait += wait
+        ms = seconds * 1000
+        for i, limit in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= limit:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'slow': self.slow,
+            'total_s': self.total,
+            'avg_ms': (self.total / self.count * 1000) if self.count else 0.0,
+            'max_ms': self.max * 1000,
+            'rows': self.rows,
+            'pool_wait_s': self.wait,
+            'histogram_ms': dict(zip([str(b) for b in LATENCY_BUCKETS_MS] + ['+Inf'], self.buckets)),
+        }
+
+
+class QueryMetrics:
+    def __init__(self, cfg=None):
+        cfg = cfg or {}
+        self.slow_seconds = cfg.get('slow_ms', DEFAULT_SLOW_MS) / 1000
+        self._stats = {}             # (operazione, query) -> QueryStats
+        self._lock = threading.Lock()
+        self.slow_log = self._slow_logger(cfg.get('slow_log', DEFAULT_SLOW_LOG))
+
+    @staticmethod
+    def _slow_logger(path):
+        """Logger dedicato alle query lente (file separato da WorkSafeManager.log)."""
+        slow = logging.getLogger('WorkSafeManager.slow_queries')
+        if path and not slow.handlers:
+            handler = logging.FileHandler(path, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+            slow.addHandler(handler)
+            slow.setLevel(logging.INFO)
+            slow.propagate = False
+        return slow
+
+    def observe(self, query, seconds, rows=0, wait=0.0, failed=False, sql=None, params=()):
+        op = current_operation()
+        slow = seconds >= self.slow_seconds
+        with self._lock:
+            stats = self._stats.get((op, query))
+            if stats is None:
+                stats = self._stats[(op, query)] = QueryStats()
+            stats.observe(seconds, rows, wait, failed, slow)
+        if slow:
+            self.slow_log.warning(
+                f"{seconds * 1000:.0f} ms | attesa pool {wait * 1000:.0f} ms | righe {rows} | "
+                f"{op} | {query} | params {redact_params(params)} | {_compact_sql(sql or query)}"
+            )
+
+    def stats(self):
+        """Statistiche per (operazione, query), ordinate per tempo totale (chi pesa di più sul DB in cima)."""
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda kv: kv[1].total, reverse=True)
+            return {f"{op} | {query}": s.as_dict() for (op, query), s in items}
+
+    def by_operation(self):
+        """Tempo totale, esecuzioni e attesa pool per operazione (vista riassuntiva)."""
+        out = {}
+        with self._lock:
+            for (op, _), s in self._stats.items():
+                agg = out.setdefault(op, {'count': 0, 'total_s': 0.0, 'rows': 0, 'pool_wait_s': 0.0})
+                agg['count'] += s.count
+                agg['total_s'] += s.total
+                agg['rows'] += s.rows
+                agg['pool_wait_s'] += s.wait
+        return dict(sorted(out.items(), key=lambda kv: kv[1]['total_s'], reverse=True))
+
+    # --- FORMATO PROMETHEUS ---
+    def prometheus(self, pool_stats=None):
+        """Testo per /metrics (formato di esposizione Prometheus 0.0.4)."""
+        with self._lock:
+            items = [((op, query), s.count, s.errors, s.slow, s.total, s.rows, s.wait, list(s.buckets))
+                     for (op, query), s in sorted(self._stats.items())]
+
+        lines = [
+            '# HELP wsm_db_query_duration_seconds Durata delle query (execute + fetch).',
+            '# TYPE wsm_db_query_duration_seconds histogram',
+        ]
+        for key, count, _, _, total, _, _, buckets in items:
+            labels = _labels(*key)
+            cumulative = 0
+            for limit, n in zip(LATENCY_BUCKETS_MS, buckets):
+                cumulative += n
+                lines.append(f'wsm_db_query_duration_seconds_bucket{{{labels},le="{limit / 1000:g}"}} {cumulative}')
+            lines.append(f'wsm_db_query_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'wsm_db_query_duration_seconds_sum{{{labels}}} {total:.6f}')
+            lines.append(f'wsm_db_query_duration_seconds_count{{{labels}}} {count}')
+
+        counters = (
+            ('wsm_db_query_rows_total', 'Righe restituite o modificate.', 5, '{}'),
+            ('wsm_db_pool_wait_seconds_total', 'Attesa per ottenere una connessione dal pool.', 6, '{:.6f}'),
+            ('wsm_db_query_errors_total', 'Query terminate con errore.', 2, '{}'),
+            ('wsm_db_slow_queries_total', 'Query oltre la soglia del log delle query lente.', 3, '{}'),
+        )
+        for metric, help_text, idx, fmt in counters:
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} counter')
+            for item in items:
+                lines.append(f'{metric}{{{_labels(*item[0])}}} {fmt.format(item[idx])}')
+
+        if pool_stats:
+            gauges = (('in_use', 'Connessioni in uso.'), ('idle', 'Connessioni inattive.'),
+                      ('size', 'Connessioni aperte.'), ('max_size', 'Dimensione massima del pool.'))
+            for key, help_text in gauges:
+                lines.append(f'# HELP wsm_db_pool_{key} {help_text}')
+                lines.append(f'# TYPE wsm_db_pool_{key} gauge')
+                lines.append(f'wsm_db_pool_{key} {pool_stats.get(key, 0)}')
+            for key, help_text in (('waits', 'Checkout che hanno dovuto attendere.'),
+                                   ('timeouts', 'Checkout scaduti senza connessione.')):
+                lines.append(f'# HELP wsm_db_pool_{key}_total {help_text}')
+                lines.append(f'# TYPE wsm_db_pool_{key}_total counter')
+                lines.append(f'wsm_db_pool_{key}_total {pool_stats.get(key, 0)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(op, query):
+    return f'operation="{_escape(op)}",query="{_escape(query)}"'
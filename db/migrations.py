@@ -0,0 +1,479 @@
+"""
+Migrazioni versionate dello schema (indici, vincoli, sequenze).
+
+Si applicano all'avvio dell'app (Backend.open, disattivabile con
+"migrations": {"auto": false} nel config) oppure a mano. Quelle con auto=False
+(riscrivono tabelle grandi sotto lock) si applicano solo a mano, fuori orario:
+
+    python -m db.migrations status   [--config config_postgres.json]
+    python -m db.migrations migrate  [--config config_postgres.json]
+"""
+import argparse
+import logging
+import re
+import sys
+
+from .search_index import FOLD_FROM, FOLD_TO
+
+logger = logging.getLogger()
+
+MIGRATIONS_TABLE = "T_MIGRAZIONI"
+
+
+class MigrationError(Exception):
+    """Migrazione non applicabile (es. dati da sistemare a mano): il messaggio dice cosa fare."""
+
+
+class Migration:
+    def __init__(self, version, description, statements, requires=(), check=None, auto=True):
+        self.version = version
+        self.description = description
+        self.statements = statements   # {dialetto: [sql, ...]}; lista vuota = niente da fare
+        self.requires = tuple(requires)  # versioni senza le quali questa non può girare
+        self.check = check             # check(backend, cur): problemi che impediscono la migrazione
+        self.auto = auto               # False = mai all'avvio dell'app, solo con "migrate" a mano
+
+    def statements_for(self, dialect):
+        return self.statements.get(dialect.name, [])
+
+
+def _duplicate_attestati(backend, cur):
+    """Gruppi (soggetto, corso, data) con più attestati: l'indice univoco non si può creare."""
+    cur.execute("""
+        SELECT ID_SOGGETTO, ID_CORSO_FK, DATA_SVOLGIMENTO, COUNT(*), MIN(ID_ATTESTATO), MAX(ID_ATTESTATO)
+        FROM T_ATTESTATI
+        WHERE ID_SOGGETTO IS NOT NULL AND ID_CORSO_FK IS NOT NULL AND DATA_SVOLGIMENTO IS NOT NULL
+        GROUP BY ID_SOGGETTO, ID_CORSO_FK, DATA_SVOLGIMENTO
+        HAVING COUNT(*) > 1
+        ORDER BY ID_SOGGETTO, ID_CORSO_FK, DATA_SVOLGIMENTO""")
+    return [f"soggetto {sid}, corso {cid}, data {data}: {n} attestati (ID da {first} a {last})"
+            for sid, cid, data, n, first, last in cur.fetchall()]
+
+
+# --- ELENCO MIGRAZIONI ---
+# Solo in coda: una migrazione già rilasciata non si modifica, se ne aggiunge una nuova.
+MIGRATIONS = [
+    Migration(1, "Indici B-tree per storico, conteggio di oggi, sessioni e ordinamenti", {
+        'postgres': [
+            # storico / archivio: ORDER BY data_svolgimento DESC + paginazione keyset
+            "CREATE INDEX IF NOT EXISTS ix_attestati_data ON t_attestati (data_svolgimento, id_attestato)",
+            # get_count_attestati_oggi: WHERE data_creazione = CURRENT_DATE
+            "CREATE INDEX IF NOT EXISTS ix_attestati_creazione ON t_attestati (data_creazione)",
+            # numero sessione: WHERE id_corso_fk = ? AND data_svolgimento ...
+            "CREATE INDEX IF NOT EXISTS ix_attestati_corso_data ON t_attestati (id_corso_fk, data_svolgimento)",
+            "CREATE INDEX IF NOT EXISTS ix_soggetti_cognome_nome ON t_soggetti (cognome, nome, id_soggetto)",
+            "CREATE INDEX IF NOT EXISTS ix_soggetti_ente ON t_soggetti (id_ente_fk)",
+            "CREATE INDEX IF NOT EXISTS ix_enti_descrizione ON t_enti (descrizione, id_ente)",
+            "CREATE INDEX IF NOT EXISTS ix_corsi_nome ON t_corsi (nome_corso, id_corso)",
+        ],
+        'firebird': [
+            # Gli indici Firebird si percorrono in un solo verso: serve anche quello discendente
+            "CREATE INDEX IX_ATTESTATI_DATA ON T_ATTESTATI (DATA_SVOLGIMENTO, ID_ATTESTATO)",
+            "CREATE DESCENDING INDEX IX_ATTESTATI_DATA_DESC ON T_ATTESTATI (DATA_SVOLGIMENTO, ID_ATTESTATO)",
+            "CREATE INDEX IX_ATTESTATI_CREAZIONE ON T_ATTESTATI (DATA_CREAZIONE)",
+            "CREATE INDEX IX_ATTESTATI_CORSO_DATA ON T_ATTESTATI (ID_CORSO_FK, DATA_SVOLGIMENTO)",
+            "CREATE INDEX IX_SOGGETTI_COGNOME_NOME ON T_SOGGETTI (COGNOME, NOME, ID_SOGGETTO)",
+            "CREATE INDEX IX_SOGGETTI_ENTE ON T_SOGGETTI (ID_ENTE_FK)",
+            "CREATE INDEX IX_ENTI_DESCRIZIONE ON T_ENTI (DESCRIZIONE, ID_ENTE)",
+            "CREATE INDEX IX_CORSI_NOME ON T_CORSI (NOME_CORSO, ID_CORSO)",
+        ],
+    }),
+    Migration(2, "Un solo attestato per (soggetto, corso, data): chiave dell'inserimento massivo", {
+        # Se ci sono già doppioni la migrazione si ferma e li elenca: vanno ripuliti a mano,
+        # non si cancellano attestati (né i documenti collegati) in automatico
+        'postgres': [
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_attestati_soggetto_corso_data "
+            "ON t_attestati (id_soggetto, id_corso_fk, data_svolgimento)",
+        ],
+        'firebird': [
+            "CREATE UNIQUE INDEX UX_ATTESTATI_SOGG_CORSO_DATA ON T_ATTESTATI (ID_SOGGETTO, ID_CORSO_FK, DATA_SVOLGIMENTO)",
+        ],
+    }, check=_duplicate_attestati),
+    Migration(3, "Sequenze per i nuovi ID di enti e corsi (al posto di MAX + 1)", {
+        'postgres': [
+            "CREATE SEQUENCE IF NOT EXISTS seq_t_enti",
+            "SELECT setval('seq_t_enti', COALESCE((SELECT MAX(id_ente) FROM t_enti), 0) + 1, false)",
+            "CREATE SEQUENCE IF NOT EXISTS seq_t_corsi",
+            "SELECT setval('seq_t_corsi', COALESCE((SELECT MAX(id_corso) FROM t_corsi), 0) + 1, false)",
+        ],
+        'firebird': [
+            "CREATE SEQUENCE SEQ_T_ENTI",
+            "EXECUTE BLOCK AS DECLARE m BIGINT; BEGIN "
+            "SELECT COALESCE(MAX(ID_ENTE), 0) FROM T_ENTI INTO :m; "
+            "EXECUTE STATEMENT 'SET GENERATOR SEQ_T_ENTI TO ' || m; END",
+            "CREATE SEQUENCE SEQ_T_CORSI",
+            "EXECUTE BLOCK AS DECLARE m BIGINT; BEGIN "
+            "SELECT COALESCE(MAX(ID_CORSO), 0) FROM T_CORSI INTO :m; "
+            "EXECUTE STATEMENT 'SET GENERATOR SEQ_T_CORSI TO ' || m; END",
+        ],
+    }),
+    Migration(4, "Indici trigram (pg_trgm) per la ricerca ILIKE/LIKE '%...%' su soggetti", {
+        'postgres': [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            # ricerca soggetti: UPPER(col) ILIKE %s
+            "CREATE INDEX IF NOT EXISTS ix_soggetti_cognome_trgm ON t_soggetti USING gin (UPPER(cognome) gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_soggetti_nome_trgm ON t_soggetti USING gin (UPPER(nome) gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_soggetti_cf_trgm ON t_soggetti USING gin (UPPER(codice_fiscale) gin_trgm_ops)",
+            # ricerca archivio: LOWER(col) LIKE %s
+            "CREATE INDEX IF NOT EXISTS ix_soggetti_cognome_lower_trgm ON t_soggetti USING gin (LOWER(cognome) gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_soggetti_nome_lower_trgm ON t_soggetti USING gin (LOWER(nome) gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS ix_soggetti_cf_lower_trgm ON t_soggetti USING gin (LOWER(codice_fiscale) gin_trgm_ops)",
+        ],
+        # Firebird non ha indici trigram: la versione viene solo registrata
+        'firebird': [],
+    }),
+    Migration(5, "Coda persistente dei lavori in background (generazione attestati)", {
+        'postgres': [
+            "CREATE SEQUENCE IF NOT EXISTS seq_t_lavori",
+            """CREATE TABLE IF NOT EXISTS t_lavori (
+                id_lavoro INTEGER NOT NULL PRIMARY KEY,
+                tipo VARCHAR(30) NOT NULL,
+                stato VARCHAR(20) NOT NULL,
+                utente VARCHAR(100),
+                parametri TEXT,
+                totale INTEGER DEFAULT 0,
+                fatti INTEGER DEFAULT 0,
+                file_risultato VARCHAR(500),
+                errore VARCHAR(1000),
+                creato_il TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                avviato_il TIMESTAMP,
+                finito_il TIMESTAMP
+            )""",
+            # prossimo lavoro da eseguire e posizione in coda: WHERE stato = ? ORDER BY id_lavoro
+            "CREATE INDEX IF NOT EXISTS ix_lavori_stato ON t_lavori (stato, id_lavoro)",
+            "CREATE INDEX IF NOT EXISTS ix_lavori_utente ON t_lavori (utente, id_lavoro)",
+        ],
+        'firebird': [
+            "CREATE SEQUENCE SEQ_T_LAVORI",
+            """CREATE TABLE T_LAVORI (
+                ID_LAVORO INTEGER NOT NULL PRIMARY KEY,
+                TIPO VARCHAR(30) NOT NULL,
+                STATO VARCHAR(20) NOT NULL,
+                UTENTE VARCHAR(100),
+                PARAMETRI BLOB SUB_TYPE TEXT,
+                TOTALE INTEGER DEFAULT 0,
+                FATTI INTEGER DEFAULT 0,
+                FILE_RISULTATO VARCHAR(500),
+                ERRORE VARCHAR(1000),
+                CREATO_IL TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                AVVIATO_IL TIMESTAMP,
+                FINITO_IL TIMESTAMP
+            )""",
+            "CREATE INDEX IX_LAVORI_STATO ON T_LAVORI (STATO, ID_LAVORO)",
+            "CREATE INDEX IX_LAVORI_UTENTE ON T_LAVORI (UTENTE, ID_LAVORO)",
+        ],
+    }),
+    Migration(6, "Documenti generati collegati agli attestati (archivio indirizzato per contenuto)", {
+        'postgres': [
+            """CREATE TABLE IF NOT EXISTS t_documenti_attestati (
+                id_attestato INTEGER NOT NULL PRIMARY KEY,
+                hash_documento CHAR(64) NOT NULL,
+                nome_file VARCHAR(255),
+                creato_il TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""",
+            # documenti ancora collegati (pulizia dell'archivio su disco: JobRunner.purge_store)
+            "CREATE INDEX IF NOT EXISTS ix_documenti_hash ON t_documenti_attestati (hash_documento)",
+        ],
+        'firebird': [
+            """CREATE TABLE T_DOCUMENTI_ATTESTATI (
+                ID_ATTESTATO INTEGER NOT NULL PRIMARY KEY,
+                HASH_DOCUMENTO CHAR(64) NOT NULL,
+                NOME_FILE VARCHAR(255),
+                CREATO_IL TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""",
+            "CREATE INDEX IX_DOCUMENTI_HASH ON T_DOCUMENTI_ATTESTATI (HASH_DOCUMENTO)",
+        ],
+    }),
+    Migration(7, "Numeri di sessione per corso e mese (contatore invece di COUNT su T_ATTESTATI)", {
+        # T_SESSIONI: numero già assegnato a ogni (corso, data); T_CONTATORI_SESSIONI: ultimo
+        # numero usato per (corso, anno, mese). Si riempiono con le sessioni già presenti,
+        # numerate come prima (ordine delle date nel mese): le sigle passate non cambiano
+        'postgres': [
+            """CREATE TABLE IF NOT EXISTS t_sessioni (
+                id_corso INTEGER NOT NULL,
+                data_svolgimento DATE NOT NULL,
+                numero INTEGER NOT NULL,
+                PRIMARY KEY (id_corso, data_svolgimento)
+            )""",
+            """CREATE TABLE IF NOT EXISTS t_contatori_sessioni (
+                id_corso INTEGER NOT NULL,
+                anno INTEGER NOT NULL,
+                mese INTEGER NOT NULL,
+                ultimo INTEGER NOT NULL,
+                PRIMARY KEY (id_corso, anno, mese)
+            )""",
+            """INSERT INTO t_sessioni (id_corso, data_svolgimento, numero)
+               SELECT id_corso_fk, data_svolgimento,
+                      DENSE_RANK() OVER (PARTITION BY id_corso_fk, EXTRACT(YEAR FROM data_svolgimento),
+                                                      EXTRACT(MONTH FROM data_svolgimento)
+                                         ORDER BY data_svolgimento)
+               FROM (SELECT DISTINCT id_corso_fk, data_svolgimento FROM t_attestati
+                     WHERE id_corso_fk IS NOT NULL AND data_svolgimento IS NOT NULL) d
+               ON CONFLICT DO NOTHING""",
+            """INSERT INTO t_contatori_sessioni (id_corso, anno, mese, ultimo)
+               SELECT id_corso, EXTRACT(YEAR FROM data_svolgimento), EXTRACT(MONTH FROM data_svolgimento), MAX(numero)
+               FROM t_sessioni GROUP BY 1, 2, 3
+               ON CONFLICT DO NOTHING""",
+        ],
+        'firebird': [
+            """CREATE TABLE T_SESSIONI (
+                ID_CORSO INTEGER NOT NULL,
+                DATA_SVOLGIMENTO DATE NOT NULL,
+                NUMERO INTEGER NOT NULL,
+                PRIMARY KEY (ID_CORSO, DATA_SVOLGIMENTO)
+            )""",
+            """CREATE TABLE T_CONTATORI_SESSIONI (
+                ID_CORSO INTEGER NOT NULL,
+                ANNO INTEGER NOT NULL,
+                MESE INTEGER NOT NULL,
+                ULTIMO INTEGER NOT NULL,
+                PRIMARY KEY (ID_CORSO, ANNO, MESE)
+            )""",
+            # Niente funzioni finestra su Firebird 2.5: il numero è 1 + le date precedenti nel mese
+            """INSERT INTO T_SESSIONI (ID_CORSO, DATA_SVOLGIMENTO, NUMERO)
+               SELECT d.ID_CORSO_FK, d.DATA_SVOLGIMENTO,
+                      (SELECT COUNT(DISTINCT p.DATA_SVOLGIMENTO) FROM T_ATTESTATI p
+                       WHERE p.ID_CORSO_FK = d.ID_CORSO_FK
+                         AND EXTRACT(YEAR FROM p.DATA_SVOLGIMENTO) = EXTRACT(YEAR FROM d.DATA_SVOLGIMENTO)
+                         AND EXTRACT(MONTH FROM p.DATA_SVOLGIMENTO) = EXTRACT(MONTH FROM d.DATA_SVOLGIMENTO)
+                         AND p.DATA_SVOLGIMENTO <= d.DATA_SVOLGIMENTO)
+               FROM (SELECT DISTINCT ID_CORSO_FK, DATA_SVOLGIMENTO FROM T_ATTESTATI
+                     WHERE ID_CORSO_FK IS NOT NULL AND DATA_SVOLGIMENTO IS NOT NULL) d""",
+            """INSERT INTO T_CONTATORI_SESSIONI (ID_CORSO, ANNO, MESE, ULTIMO)
+               SELECT ID_CORSO, EXTRACT(YEAR FROM DATA_SVOLGIMENTO), EXTRACT(MONTH FROM DATA_SVOLGIMENTO), MAX(NUMERO)
+               FROM T_SESSIONI
+               GROUP BY ID_CORSO, EXTRACT(YEAR FROM DATA_SVOLGIMENTO), EXTRACT(MONTH FROM DATA_SVOLGIMENTO)""",
+        ],
+    }),
+    Migration(8, "Colonna di ricerca soggetti senza accenti con indice trigram (al posto di tre ILIKE)", {
+        'postgres': [
+            # Maiuscolo, senza accenti, solo lettere e cifre separate da uno spazio: "D'Angelo" -> "D ANGELO".
+            # Stessa tabella e stessi passi di db.search_index.fold_text (translate, separatori, maiuscolo)
+            f"""CREATE OR REPLACE FUNCTION wsm_normalizza(testo text) RETURNS text
+                LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+                SELECT upper(btrim(regexp_replace(
+                    translate(coalesce(testo, ''), '{FOLD_FROM}', '{FOLD_TO}'),
+                    '[^A-Za-z0-9]+', ' ', 'g')))
+            $$""",
+            # Calcolata dal database a ogni INSERT/UPDATE: l'applicazione non la scrive mai.
+            # Aggiungerla riscrive t_soggetti sotto lock ACCESS EXCLUSIVE: per questo la migrazione
+            # non parte all'avvio (auto=False) e si applica a mano fuori orario
+            # (python -m db.migrations migrate). Fino ad allora la ricerca resta per prefisso
+            """ALTER TABLE t_soggetti ADD COLUMN IF NOT EXISTS ricerca_norm text
+               GENERATED ALWAYS AS (wsm_normalizza(coalesce(cognome, '') || ' ' || coalesce(nome, '')
+                                                   || ' ' || coalesce(codice_fiscale, ''))) STORED""",
+            "CREATE INDEX IF NOT EXISTS ix_soggetti_ricerca_trgm ON t_soggetti USING gin (ricerca_norm gin_trgm_ops)",
+            # Sostituiti dall'indice qui sopra (quelli su LOWER restano per l'archivio)
+            "DROP INDEX IF EXISTS ix_soggetti_cognome_trgm",
+            "DROP INDEX IF EXISTS ix_soggetti_nome_trgm",
+            "DROP INDEX IF EXISTS ix_soggetti_cf_trgm",
+        ],
+        # Firebird non ha trigrammi né colonne generate con funzioni: resta la ricerca per prefisso
+        'firebird': [],
+    }, requires=(4,), auto=False),
+    Migration(9, "Indici per trovare molti soggetti insieme per codice fiscale o cognome e nome", {
+        # UserRepo.resolve_list: CODICE_FISCALE = ANY(...) e nominativo = ANY(...)
+        'postgres': [
+            "CREATE INDEX IF NOT EXISTS ix_soggetti_cf ON t_soggetti (codice_fiscale)",
+            "CREATE INDEX IF NOT EXISTS ix_soggetti_nominativo "
+            "ON t_soggetti (wsm_normalizza(coalesce(cognome, '') || ' ' || coalesce(nome, '')))",
+        ],
+        'firebird': [
+            "CREATE INDEX IX_SOGGETTI_CF ON T_SOGGETTI (CODICE_FISCALE)",
+            "CREATE INDEX IX_SOGGETTI_NOMINATIVO ON T_SOGGETTI COMPUTED BY (UPPER(COGNOME || ' ' || NOME))",
+        ],
+    }, requires=(8,)),
+    Migration(10, "Indici sulle chiavi di ordinamento delle pagine con i NULL come stringa vuota", {
+        # PAGE_SORTS ordina su COALESCE(col, ''): gli indici devono avere la stessa espressione
+        'postgres': [
+            "CREATE INDEX IF NOT EXISTS ix_soggetti_cognome_nome_nn "
+            "ON t_soggetti (COALESCE(cognome, ''), COALESCE(nome, ''), id_soggetto)",
+            "CREATE INDEX IF NOT EXISTS ix_enti_descrizione_nn ON t_enti (COALESCE(descrizione, ''), id_ente)",
+            "CREATE INDEX IF NOT EXISTS ix_corsi_nome_nn ON t_corsi (COALESCE(nome_corso, ''), id_corso)",
+        ],
+        # Gli indici COMPUTED BY di Firebird hanno una sola espressione: la prima chiave basta
+        'firebird': [
+            "CREATE INDEX IX_SOGGETTI_COGNOME_NN ON T_SOGGETTI COMPUTED BY (COALESCE(COGNOME, ''))",
+            "CREATE INDEX IX_ENTI_DESCRIZIONE_NN ON T_ENTI COMPUTED BY (COALESCE(DESCRIZIONE, ''))",
+            "CREATE INDEX IX_CORSI_NOME_NN ON T_CORSI COMPUTED BY (COALESCE(NOME_CORSO, ''))",
+        ],
+    }),
+    Migration(11, "Lavori in corso con esecutore e ultimo segnale di vita (ripresa solo dei lavori abbandonati)", {
+        'postgres': [
+            "ALTER TABLE t_lavori ADD COLUMN IF NOT EXISTS esecutore VARCHAR(64)",
+            "ALTER TABLE t_lavori ADD COLUMN IF NOT EXISTS heartbeat_il TIMESTAMP",
+        ],
+        'firebird': [
+            "ALTER TABLE T_LAVORI ADD ESECUTORE VARCHAR(64)",
+            "ALTER TABLE T_LAVORI ADD HEARTBEAT_IL TIMESTAMP",
+        ],
+    }, requires=(5,)),
+]
+
+
+# --- RUNNER ---
+def _ensure_table(backend):
+    try:
+        backend.fetchone(f"SELECT COUNT(*) FROM {MIGRATIONS_TABLE}")
+    except Exception:
+        backend.execute(f"""
+            CREATE TABLE {MIGRATIONS_TABLE} (
+                VERSIONE INTEGER NOT NULL PRIMARY KEY,
+                DESCRIZIONE VARCHAR(200),
+                APPLICATA_IL TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        logger.info(f"Creata tabella {MIGRATIONS_TABLE}")
+
+
+def applied_versions(backend):
+    """{versione: data applicazione} delle migrazioni già eseguite."""
+    _ensure_table(backend)
+    return dict(backend.fetchall(f"SELECT VERSIONE, APPLICATA_IL FROM {MIGRATIONS_TABLE}"))
+
+
+def status(backend):
+    """Elenco (versione, descrizione, applicata_il | None) di tutte le migrazioni."""
+    applied = applied_versions(backend)
+    return [(m.version, m.description, applied.get(m.version)) for m in MIGRATIONS]
+
+
+# Firebird fa il commit di ogni istruzione: una migrazione interrotta a metà resta applicata
+# in parte. Prima di ogni istruzione si guarda nel catalogo se il suo effetto c'è già, così
+# la migrazione si può rilanciare. (PostgreSQL annulla tutto con il rollback e usa IF NOT EXISTS.)
+_CATALOG_CHECKS = [
+    (re.compile(r'CREATE\s+(?:UNIQUE\s+)?(?:(?:ASC|ASCENDING|DESC|DESCENDING)\s+)?INDEX\s+(\w+)', re.I),
+     "SELECT COUNT(*) FROM RDB$INDICES WHERE RDB$INDEX_NAME = %s"),
+    (re.compile(r'CREATE\s+(?:SEQUENCE|GENERATOR)\s+(\w+)', re.I),
+     "SELECT COUNT(*) FROM RDB$GENERATORS WHERE RDB$GENERATOR_NAME = %s"),
+    (re.compile(r'CREATE\s+TABLE\s+(\w+)', re.I),
+     "SELECT COUNT(*) FROM RDB$RELATIONS WHERE RDB$RELATION_NAME = %s"),
+    (re.compile(r'ALTER\s+TABLE\s+(\w+)\s+ADD\s+(\w+)', re.I),
+     "SELECT COUNT(*) FROM RDB$RELATION_FIELDS WHERE RDB$RELATION_NAME = %s AND RDB$FIELD_NAME = %s"),
+]
+# Riempimento di una tabella appena creata: già fatto se la tabella ha righe
+_SEED_RE = re.compile(r'^\s*INSERT\s+INTO\s+(\w+)', re.I)
+
+
+def _already_done(backend, cur, sql):
+    for pattern, check_sql in _CATALOG_CHECKS:
+        m = pattern.match(sql.strip())
+        if m:
+            cur.execute(backend.sql(check_sql), tuple(g.upper() for g in m.groups()))
+            return cur.fetchone()[0] > 0
+    m = _SEED_RE.match(sql)
+    if m:
+        cur.execute(f"SELECT COUNT(*) FROM RDB$DATABASE WHERE EXISTS (SELECT 1 FROM {m.group(1)})")
+        return cur.fetchone()[0] > 0
+    # Le altre istruzioni (es. SET GENERATOR al massimo attuale) si possono ripetere
+    return False
+
+
+def _apply(backend, migration):
+    dialect = backend.dialect
+    with backend.connection() as conn:
+        cur = conn.cursor()
+        lock_sql = dialect.migration_lock_sql()
+        if lock_sql:
+            # Più istanze che partono insieme: una sola applica, le altre trovano la versione registrata
+            cur.execute(lock_sql)
+        cur.execute(backend.sql(f"SELECT COUNT(*) FROM {MIGRATIONS_TABLE} WHERE VERSIONE = %s"), (migration.version,))
+        if cur.fetchone()[0]:
+            conn.rollback()
+            return False
+        if migration.check is not None:
+            problems = migration.check(backend, cur)
+            if problems:
+                shown = '\n  '.join(problems[:50])
+                more = f"\n  ... e altri {len(problems) - 50}" if len(problems) > 50 else ''
+                raise MigrationError(f"Dati da sistemare a mano prima di rilanciarla ({len(problems)}):\n  {shown}{more}")
+        for sql in migration.statements_for(dialect):
+            if not dialect.transactional_ddl and _already_done(backend, cur, sql):
+                first_line = sql.strip().splitlines()[0]
+                logger.info(f"Migrazione {migration.version}: già presente, salto {first_line[:80]}")
+                continue
+            cur.execute(sql)
+            if not dialect.transactional_ddl:
+                # Su Firebird gli oggetti creati si possono usare solo dopo il commit
+                conn.commit()
+        cur.execute(backend.sql(f"INSERT INTO {MIGRATIONS_TABLE} (VERSIONE, DESCRIZIONE) VALUES (%s, %s)"),
+                    (migration.version, migration.description))
+        conn.commit()
+    return True
+
+
+def migrate(backend, startup=False):
+    """
+    Applica in ordine le migrazioni mancanti, una transazione ciascuna.
+    Una migrazione che fallisce blocca solo quelle che la richiedono (requires): le altre
+    si applicano comunque. Alla fine solleva MigrationError se qualcuna è rimasta indietro.
+    startup (Backend.open): le migrazioni con auto=False, e quelle che le richiedono,
+    restano in sospeso con un avviso invece di partire.
+    Restituisce le versioni applicate in questa chiamata.
+    """
+    applied = applied_versions(backend)
+    done, failed, pending = [], {}, []
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            continue
+        if startup and ((not migration.auto and migration.statements_for(backend.dialect))
+                        or any(v in pending for v in migration.requires)):
+            pending.append(migration.version)
+            continue
+        blocked = [v for v in migration.requires if v in failed]
+        if blocked:
+            failed[migration.version] = f"richiede la migrazione {', '.join(map(str, blocked))}"
+            logger.error(f"Migrazione {migration.version} rimandata: {failed[migration.version]}")
+            continue
+        logger.info(f"Migrazione {migration.version}: {migration.description}")
+        try:
+            if _apply(backend, migration):
+                done.append(migration.version)
+        except Exception as e:
+            logger.error(f"Migrazione {migration.version} FALLITA: {e}")
+            failed[migration.version] = str(e)
+    if pending:
+        logger.warning(f"Migrazioni in sospeso {pending}: non si applicano all'avvio, "
+                       "vanno lanciate a mano fuori orario con: python -m db.migrations migrate")
+    if failed:
+        raise MigrationError("Migrazioni non applicate: " + "; ".join(f"{v} ({msg})" for v, msg in failed.items())
+                             + (f". Applicate ora: {done}" if done else ""))
+    return done
+
+
+def _print_status(backend):
+    manual = {m.version for m in MIGRATIONS if not m.auto}
+    for version, description, applied_at in status(backend):
+        flag = (f"applicata il {applied_at}" if applied_at
+                else "DA APPLICARE (a mano)" if version in manual else "DA APPLICARE")
+        print(f"{version:>4}  {flag:<40} {description}")
+
+
+def main(argv=None):
+    from .backend import configure
+
+    parser = argparse.ArgumentParser(prog='python -m db.migrations', description="Migrazioni dello schema WorkSafeManager")
+    parser.add_argument('comando', nargs='?', choices=['status', 'migrate'], default='status')
+    parser.add_argument('--config', help="file di configurazione (default: WSM_CONFIG o config_postgres.json)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    backend = configure(args.config)
+    failed = False
+    try:
+        if args.comando == 'migrate':
+            try:
+                done = migrate(backend)
+                print(f"Migrazioni applicate ora: {done or 'nessuna'}")
+            except MigrationError as e:
+                print(e)
+                failed = True
+        _print_status(backend)
+    finally:
+        backend.pool.closeall()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# --- PAGINAZIONE KEYSET ---
+# Le tabelle delle pagine chiedono al server una pagina alla volta.
+# Invece di OFFSET (che rilegge tutte le righe precedenti) si riparte dalla chiave
+# dell'ultima riga della pagina precedente: "WHERE (ordine, id) > (ultima riga)".
+# L'OFFSET resta solo per i salti diretti a una pagina mai vista.
+
+# Sotto questa stima il totale viene contato esattamente (COUNT(*) costa poco)
+EXACT_COUNT_LIMIT = 20000
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 500
+
+
+class PageQuery:
+    """
+    Query di una pagina: righe (con le chiavi di ordinamento in coda) + conteggio.
+    sort_exprs sono le espressioni dell'ordinamento scelto; pk_expr rende l'ordine univoco.
+    """
+    def __init__(self, columns, from_sql, conditions, params, sort_exprs, pk_expr,
+                 descending=False, after=None, limit=DEFAULT_PAGE_SIZE, offset=0):
+        self.columns = columns
+        self.from_sql = from_sql
+        self.conditions = list(conditions)
+        self.params = tuple(params)
+        self.keys = list(sort_exprs) + [pk_expr]
+        self.descending = descending
+        self.after = tuple(after) if after else None
+        self.limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+        self.offset = 0 if self.after else max(0, int(offset or 0))
+
+    def _where(self, conditions):
+        return (" WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    def _seek(self):
+        # (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... : niente row-value, funziona anche su Firebird
+        op = '<' if self.descending else '>'
+        clauses, params = [], []
+        for i, key in enumerate(self.keys):
+            parts = [f"{k} = %s" for k in self.keys[:i]] + [f"{key} {op} %s"]
+            clauses.append("(" + " AND ".join(parts) + ")")
+            params.extend(self.after[:i + 1])
+        return "(" + " OR ".join(clauses) + ")", params
+
+    def _select(self, conditions):
+        direction = ' DESC' if self.descending else ''
+        return (f"SELECT {self.columns}, {', '.join(self.keys)} FROM {self.from_sql}"
+                f"{self._where(conditions)}"
+                f" ORDER BY {', '.join(k + direction for k in self.keys)}")
+
+    def rows_sql(self, dialect):
+        conditions, params = list(self.conditions), list(self.params)
+        if self.after:
+            seek_sql, seek_params = self._seek()
+            conditions.append(seek_sql)
+            params.extend(seek_params)
+        return dialect.paginate(self._select(conditions), self.limit, self.offset), tuple(params)
+
+    def all_sql(self):
+        """Tutte le righe filtrate, nello stesso ordine delle pagine (per le esportazioni)."""
+        return self._select(self.conditions), self.params
+
+    def strip_keys(self, row):
+        """Riga senza le chiavi di ordinamento in coda."""
+        return row[:-len(self.keys)]
+
+    def count_sql(self):
+        return f"SELECT COUNT(*) FROM {self.from_sql}{self._where(self.conditions)}", self.params
+
+    def estimate_sql(self):
+        return f"SELECT 1 FROM {self.from_sql}{self._where(self.conditions)}", self.params
+
+    def page(self, rows, map_row, total=None, estimated=False):
+        """
+        Risultato per la UI: righe mappate, cursore dell'ultima riga (da passare come after
+        per la pagina successiva) e totale (None se non richiesto).
+        """
+        n_keys = len(self.keys)
+        return {
+            'rows': [map_row(self.strip_keys(r)) for r in rows],
+            'cursor': tuple(rows[-1][-n_keys:]) if rows else None,
+            'total': total,
+            'estimated': estimated,
+        }
+
+
+def resolve_sort(sorts, sort_by, default):
+    """Ordinamento dalla whitelist: una colonna sconosciuta torna al default (mai SQL dal browser)."""
+    return sorts[sort_by] if sort_by in sorts else sorts[default]
+
+
+def empty_page():
+    return {'rows': [], 'cursor': None, 'total': 0, 'estimated': False}
@@ -0,0 +1,206 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# --- POOL CONNESSIONI ---
+class ConnectionPool:
+    """
+    Pool di connessioni thread-safe.
+    Tiene aperte fino a max_size connessioni e le riusa tra le chiamate,
+    evitando un handshake TCP+auth verso il server per ogni query.
+    """
+    def __init__(self, connect_fn, min_size=1, max_size=10, max_lifetime=1800,
+                 timeout=30, ping_after=10, ping_sql="SELECT 1"):
+        self._connect_fn = connect_fn
+        self.ping_sql = ping_sql           # query di validazione (dipende dal dialetto)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime   # secondi dopo i quali la connessione viene riaperta
+        self.timeout = timeout             # attesa massima per ottenere una connessione
+        self.ping_after = ping_after       # secondi di inattività oltre i quali si valida con ping_sql
+
+        self._cond = threading.Condition()
+        self._idle = deque()               # (conn, creata_il, restituita_il)
+        self._created_at = {}              # id(conn) -> timestamp apertura
+        self._in_use = 0
+        self._closed = False
+
+        self._stats = {
+            'checkouts': 0, 'waits': 0, 'wait_time_total': 0.0, 'wait_time_max': 0.0,
+            'timeouts': 0, 'created': 0, 'discarded': 0,
+        }
+
+    # --- Apertura / chiusura fisica ---
+    def _open(self):
+        conn = self._connect_fn()
+        with self._cond:  # RLock: rientrante anche da warmup()
+            self._created_at[id(conn)] = time.monotonic()
+            self._stats['created'] += 1
+        return conn
+
+    def _forget(self, conn):
+        """Contabilità di una connessione scartata (sotto lock); la chiusura si fa dopo, fuori dal lock."""
+        self._created_at.pop(id(conn), None)
+        self._stats['discarded'] += 1
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, conn):
+        created = self._created_at.get(id(conn), 0)
+        return self.max_lifetime and (time.monotonic() - created) > self.max_lifetime
+
+    def _is_valid(self, conn, idle_since):
+        """Controllo al checkout: connessione chiusa, scaduta o (se inattiva da tempo) non risponde."""
+        if getattr(conn, 'closed', False) or self._is_expired(conn):
+            return False
+        if time.monotonic() - idle_since < self.ping_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute(self.ping_sql)
+            cur.fetchone()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def warmup(self):
+        """Apre subito min_size connessioni (chiamato all'avvio dell'app)."""
+        with self._cond:
+            while len(self._idle) + self._in_use < self.min_size:
+                conn = self._open()
+                now = time.monotonic()
+                self._idle.append((conn, now, now))
+
+    # --- Checkout / restituzione ---
+    # Sotto lock si fa solo la contabilità: ping, rollback, apertura e chiusura sono I/O di rete
+    # e si fanno fuori, così una connessione lenta o morta non blocca gli altri thread.
+    def getconn(self):
+        start = time.monotonic()
+        waited = False
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Pool connessioni chiuso")
+
+                    # 1. Connessione inattiva disponibile: la si prende (slot occupato) e si valida dopo
+                    if self._idle:
+                        conn, _, idle_since = self._idle.pop()
+                        self._in_use += 1
+                        break
+
+                    # 2. Spazio per aprirne una nuova
+                    if self._in_use < self.max_size:
+                        self._in_use += 1
+                        break
+
+                    # 3. Pool pieno: attendiamo una restituzione
+                    waited = True
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        self._stats['timeouts'] += 1
+                        raise TimeoutError(f"Nessuna connessione libera entro {self.timeout}s (max_size={self.max_size})")
+
+            if conn is None:
+                break
+            if self._is_valid(conn, idle_since):
+                with self._cond:
+                    self._record_checkout(start, waited)
+                return conn
+            # Non valida: si libera lo slot e si riprova con la prossima
+            self._close(conn)
+            with self._cond:
+                self._forget(conn)
+                self._in_use -= 1
+                self._cond.notify()
+
+        # L'apertura avviene fuori dal lock per non bloccare gli altri thread
+        try:
+            conn = self._open()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._record_checkout(start, waited)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        keep = not discard and not self._closed and not getattr(conn, 'closed', False) and not self._is_expired(conn)
+        if keep:
+            try:
+                # Niente transazioni aperte dentro il pool (anche una SELECT apre una transazione)
+                conn.rollback()
+            except Exception:
+                keep = False
+        with self._cond:
+            self._in_use -= 1
+            keep = keep and not self._closed
+            if keep:
+                now = time.monotonic()
+                self._idle.append((conn, self._created_at.get(id(conn), now), now))
+            else:
+                self._forget(conn)
+            self._cond.notify()
+        if not keep:
+            self._close(conn)
+
+    def _record_checkout(self, start, waited):
+        self._stats['checkouts'] += 1
+        if waited:
+            wait = time.monotonic() - start
+            self._stats['waits'] += 1
+            self._stats['wait_time_total'] += wait
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait)
+
+    @contextmanager
+    def connection(self):
+        """
+        Uso: with pool.connection() as conn: ...
+        In caso di eccezione fa rollback; una connessione rotta non torna nel pool.
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.putconn(conn, discard=broken or getattr(conn, 'closed', False))
+
+    def stats(self):
+        with self._cond:
+            s = dict(self._stats)
+            s.update({
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'size': self._in_use + len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'wait_time_avg': (s['wait_time_total'] / s['waits']) if s['waits'] else 0.0,
+            })
+            return s
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _, _ in self._idle]
+            self._idle.clear()
+            for conn in idle:
+                self._forget(conn)
+            self._cond.notify_all()
+        for conn in idle:
+            self._close(conn)
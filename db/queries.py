@@ -0,0 +1,44 @@
+import json
+import logging
+
+logger = logging.getLogger()
+
+# --- REGISTRO QUERY CON NOME ---
+# Le query "calde" stanno in queries.json e si chiamano per nome.
+# Il valore può essere una stringa (stessa query per tutti i backend, stile %s)
+# oppure un oggetto {"postgres": "...", "firebird": "...", "default": "..."} quando la sintassi cambia.
+# Il file viene letto una sola volta all'avvio; i tempi di esecuzione sono in metrics.py.
+QUERIES_FILE = 'queries.json'
+
+
+class QueryRegistry:
+    def __init__(self, queries):
+        self._queries = queries
+        self._resolved = {}          # (nome, dialetto) -> sql già tradotta
+
+    @classmethod
+    def load(cls, path=QUERIES_FILE):
+        try:
+            with open(path, 'r') as f:
+                queries = json.load(f)
+        except FileNotFoundError:
+            logger.error(f"ATTENZIONE: File {path} non trovato. Nessuna query con nome disponibile.")
+            queries = {}
+        logger.info(f"Registro query caricato: {len(queries)} query da {path}")
+        return cls(queries)
+
+    def sql(self, name, dialect):
+        """Testo della query per il dialetto, già tradotto (paramstyle, schema)."""
+        key = (name, dialect.name)
+        sql = self._resolved.get(key)
+        if sql is None:
+            try:
+                entry = self._queries[name]
+            except KeyError:
+                raise KeyError(f"Query '{name}' non presente in {QUERIES_FILE}")
+            if isinstance(entry, dict):
+                entry = entry.get(dialect.name) or entry.get('default')
+                if entry is None:
+                    raise KeyError(f"Query '{name}' senza variante per il backend {dialect.name}")
+            sql = self._resolved[key] = dialect.sql(entry)
+        return sql
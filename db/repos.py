@@ -0,0 +1,1527 @@
+import csv
+import json
+import logging
+import re
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+
+import bcrypt
+
+from .backend import get_backend
+from .paging import PageQuery, resolve_sort, empty_page, DEFAULT_PAGE_SIZE
+from .metrics import instrumented, timed
+from .search_index import subject_index, fold_text
+
+logger = logging.getLogger()
+
+# Le query sono scritte in stile PostgreSQL (%s, public., ILIKE tramite _ilike):
+# il Backend le traduce per il dialetto configurato.
+
+
+def _ilike(expr):
+    return get_backend().dialect.ilike(expr)
+
+
+def _add_years(expr, years):
+    return get_backend().dialect.add_years(expr, years)
+
+
+# Migrazione che crea wsm_normalizza e la colonna RICERCA_NORM di T_SOGGETTI
+NORMALIZED_SEARCH_MIGRATION = 8
+
+
+def _normalized_search():
+    """
+    Ricerca dei soggetti su RICERCA_NORM e wsm_normalizza? Solo PostgreSQL con la migrazione 8:
+    senza (Firebird, o migrazione non ancora applicata) si cerca per prefisso come prima.
+    """
+    backend = get_backend()
+    return backend.dialect.name == 'postgres' and backend.has_migration(NORMALIZED_SEARCH_MIGRATION)
+
+
+def _name_search(search_term, alias=''):
+    """
+    Condizione (sql, params) per cercare un soggetto per cognome, nome o CF.
+    Con RICERCA_NORM: ogni parola, senza accenti né apostrofi, contenuta nella colonna
+    (calcolata dal database, indice trigram). Altrimenti: inizio di cognome, nome o CF.
+    """
+    if _normalized_search():
+        words = fold_text(search_term).split() or ['']
+        return ("(" + " AND ".join([f"{alias}RICERCA_NORM LIKE %s"] * len(words)) + ")",
+                tuple(f"%{w}%" for w in words))
+    prefix = ' '.join(search_term.upper().split()) + '%'
+    return (f"({_ilike(f'UPPER({alias}COGNOME)')} OR {_ilike(f'UPPER({alias}NOME)')} "
+            f"OR {_ilike(f'UPPER({alias}CODICE_FISCALE)')})", (prefix, prefix, prefix))
+
+
+# --- NUMERI DI SESSIONE ---
+# Il numero di sessione (prima cifra della sigla) vale per (corso, data) e riparte ogni mese.
+# T_SESSIONI ricorda il numero già dato a ogni (corso, data), T_CONTATORI_SESSIONI l'ultimo
+# numero usato per (corso, anno, mese) (migrazione 7): niente COUNT su T_ATTESTATI, che
+# cresce, e niente doppioni se due generazioni partono insieme.
+# Tutte le sessioni di un lotto si assegnano con una sola chiamata (una transazione).
+# I numeri si assegnano quando il lotto va in coda: se il lavoro poi fallisce, la sessione
+# resta numerata e una nuova generazione per lo stesso (corso, data) riusa quel numero;
+# resta un buco nella numerazione del mese solo se quella sessione non si genera più.
+
+# PostgreSQL, prima istruzione: blocca le righe dei contatori del lotto (create a 0 se mancano),
+# in ordine, così le allocazioni concorrenti sugli stessi mesi si mettono in fila
+SQL_SESSIONS_PG_LOCK = """
+    INSERT INTO public.t_contatori_sessioni (id_corso, anno, mese, ultimo)
+    SELECT id_corso, anno, mese, 0 FROM (VALUES {values}) AS req (id_corso, anno, mese)
+    ORDER BY id_corso, anno, mese
+    ON CONFLICT (id_corso, anno, mese) DO UPDATE SET ultimo = t_contatori_sessioni.ultimo
+"""
+SQL_SESSIONS_PG_LOCK_ROW = "(%s::integer, %s::integer, %s::integer)"
+# Poi una istruzione per blocco di richieste. Con i contatori bloccati, la nuova istantanea vede
+# le sessioni già assegnate da chi li aveva prima: le nuove dello stesso mese prendono
+# ultimo + 1, ultimo + 2, ... in ordine di data, e il contatore avanza solo fino all'ultimo
+# numero davvero inserito (RETURNING di assegnate), mai per le righe scartate dal conflitto
+SQL_SESSIONS_PG = """
+    WITH req (id_corso, data_svolgimento, anno, mese) AS (VALUES {values}),
+    esistenti AS (
+        SELECT s.id_corso, s.data_svolgimento, s.numero
+        FROM public.t_sessioni s
+        JOIN req r ON r.id_corso = s.id_corso AND r.data_svolgimento = s.data_svolgimento
+    ),
+    nuove AS (
+        SELECT r.id_corso, r.data_svolgimento, r.anno, r.mese,
+               ROW_NUMBER() OVER (PARTITION BY r.id_corso, r.anno, r.mese ORDER BY r.data_svolgimento) AS k
+        FROM req r
+        WHERE NOT EXISTS (SELECT 1 FROM esistenti e
+                          WHERE e.id_corso = r.id_corso AND e.data_svolgimento = r.data_svolgimento)
+    ),
+    assegnate AS (
+        INSERT INTO public.t_sessioni (id_corso, data_svolgimento, numero)
+        SELECT n.id_corso, n.data_svolgimento, c.ultimo + n.k
+        FROM nuove n JOIN public.t_contatori_sessioni c
+             ON c.id_corso = n.id_corso AND c.anno = n.anno AND c.mese = n.mese
+        ON CONFLICT (id_corso, data_svolgimento) DO NOTHING
+        RETURNING id_corso, data_svolgimento, numero
+    ),
+    contatori AS (
+        UPDATE public.t_contatori_sessioni c SET ultimo = a.massimo
+        FROM (SELECT id_corso, CAST(EXTRACT(YEAR FROM data_svolgimento) AS integer) AS anno,
+                     CAST(EXTRACT(MONTH FROM data_svolgimento) AS integer) AS mese, MAX(numero) AS massimo
+              FROM assegnate GROUP BY 1, 2, 3) a
+        WHERE c.id_corso = a.id_corso AND c.anno = a.anno AND c.mese = a.mese
+    )
+    SELECT id_corso, data_svolgimento, numero FROM esistenti
+    UNION ALL
+    SELECT id_corso, data_svolgimento, numero FROM assegnate
+"""
+SQL_SESSIONS_PG_ROW = "(%s::integer, %s::date, %s::integer, %s::integer)"
+# Richieste per istruzione (4 parametri ciascuna)
+SESSIONS_CHUNK = 1000
+
+# Firebird (niente CTE che scrivono): un EXECUTE BLOCK per richiesta, tutti nella stessa transazione.
+# Se due lotti creano insieme il contatore di un mese nuovo, il secondo INSERT viola la chiave:
+# il lotto intero torna indietro e si ripete (vedi allocate_session_numbers_sync), trovando il contatore
+SQL_SESSIONS_FB = """
+    EXECUTE BLOCK (C INTEGER = %s, D DATE = %s, A INTEGER = %s, M INTEGER = %s)
+    RETURNS (ID_CORSO INTEGER, DATA_SVOLGIMENTO DATE, NUMERO INTEGER) AS
+    BEGIN
+        ID_CORSO = :C;
+        DATA_SVOLGIMENTO = :D;
+        NUMERO = NULL;
+        SELECT s.NUMERO FROM T_SESSIONI s WHERE s.ID_CORSO = :C AND s.DATA_SVOLGIMENTO = :D INTO :NUMERO;
+        IF (NUMERO IS NULL) THEN
+        BEGIN
+            UPDATE T_CONTATORI_SESSIONI SET ULTIMO = ULTIMO + 1
+            WHERE ID_CORSO = :C AND ANNO = :A AND MESE = :M RETURNING ULTIMO INTO :NUMERO;
+            IF (ROW_COUNT = 0) THEN
+            BEGIN
+                NUMERO = 1;
+                INSERT INTO T_CONTATORI_SESSIONI (ID_CORSO, ANNO, MESE, ULTIMO) VALUES (:C, :A, :M, 1);
+            END
+            INSERT INTO T_SESSIONI (ID_CORSO, DATA_SVOLGIMENTO, NUMERO) VALUES (:C, :D, :NUMERO);
+        END
+        SUSPEND;
+    END
+"""
+
+# Tentativi per le sessioni create nello stesso istante da un'altra generazione
+SESSIONS_ATTEMPTS = 3
+
+
+def _session_requests(groups):
+    """(id_corso, data) distinte, in ordine di data -> parametri (id_corso, data, anno, mese)."""
+    keys = sorted(set(groups), key=lambda k: (k[1], k[0]))
+    return [(id_corso, d, d.year, d.month) for id_corso, d in keys]
+
+
+def _session_statements(requests):
+    if get_backend().dialect.name == 'firebird':
+        for r in requests:
+            yield SQL_SESSIONS_FB, r
+        return
+    # Prima tutti i contatori del lotto, in un ordine unico (niente deadlock tra due lotti)
+    counters = sorted({(r[0], r[2], r[3]) for r in requests})
+    for i in range(0, len(counters), SESSIONS_CHUNK):
+        chunk = counters[i:i + SESSIONS_CHUNK]
+        yield (SQL_SESSIONS_PG_LOCK.format(values=', '.join([SQL_SESSIONS_PG_LOCK_ROW] * len(chunk))),
+               tuple(v for c in chunk for v in c))
+    for i in range(0, len(requests), SESSIONS_CHUNK):
+        chunk = requests[i:i + SESSIONS_CHUNK]
+        yield (SQL_SESSIONS_PG.format(values=', '.join([SQL_SESSIONS_PG_ROW] * len(chunk))),
+               tuple(v for r in chunk for v in r))
+
+
+def _session_numbers(rows):
+    return {(r[0], r[1]): r[2] for r in rows}
+
+
+@timed("allocate_session_numbers_sync")
+def allocate_session_numbers_sync(groups):
+    """
+    Numeri di sessione per le coppie (id_corso, data): {(id_corso, data): numero}.
+    Una coppia già numerata mantiene il suo numero; le nuove prendono i successivi del mese.
+    """
+    pending = _session_requests(groups)
+    result = {}
+    backend = get_backend()
+    for _ in range(SESSIONS_ATTEMPTS):
+        if not pending:
+            break
+        # Una richiesta può mancare solo se un'altra transazione ha creato la stessa sessione:
+        # al giro dopo la si trova tra le esistenti
+        try:
+            rows = backend.run_batch(_session_statements(pending), "ALLOCA sessioni")
+        except backend.integrity_errors as e:
+            logger.info(f"Contatore di sessione creato da un'altra generazione, si ripete: {e}")
+            continue
+        result.update(_session_numbers(rows))
+        pending = [r for r in pending if (r[0], r[1]) not in result]
+    if pending:
+        raise RuntimeError(f"Numero di sessione non assegnato per {len(pending)} sessioni")
+    return result
+
+
+# --- ELENCHI DI SOGGETTI (incollati o da CSV) ---
+# Una riga per soggetto: codice fiscale, "Cognome Nome" oppure una riga CSV (; , o tab)
+# con questi campi. UserRepo.resolve_list li cerca tutti con una sola query.
+_CF_RE = re.compile(r'^(?=.*\d)(?=.*[A-Z])[A-Z0-9]{16}$')
+_LIST_HEADERS = {'CF', 'CODICE FISCALE', 'CODICE_FISCALE', 'COGNOME', 'NOME', 'SOCIETA', 'ENTE'}
+# Oltre queste parole non si provano tutti gli ordini di cognome e nome
+_MAX_NAME_WORDS = 5
+
+
+def parse_subject_lines(text):
+    """Testo -> [(riga, cf, nominativo)]: cf se la riga ne contiene uno, altrimenti nominativo."""
+    entries = []
+    for line in (text or '').splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        delimiter = next((d for d in (';', '\t', ',') if d in line), None)
+        fields = next(csv.reader([line], delimiter=delimiter)) if delimiter else [line]
+        fields = [f.strip() for f in fields if f.strip()]
+        if not fields or all(f.upper() in _LIST_HEADERS for f in fields):
+            continue
+        cf = next((f.upper().replace(' ', '') for f in fields if _CF_RE.match(f.upper().replace(' ', ''))), None)
+        nominativo = None if cf else ' '.join(fields[:2])
+        entries.append((line, cf, nominativo))
+    return entries
+
+
+def _name_orders(words):
+    """Cognome e nome nei possibili ordini: "MARIO ROSSI" -> ["MARIO ROSSI", "ROSSI MARIO"]."""
+    if not words or len(words) > _MAX_NAME_WORDS:
+        return [' '.join(words)] if words else []
+    return [' '.join(words[i:] + words[:i]) for i in range(len(words))]
+
+
+# --- REPOSITORY SOGGETTI ---
+@instrumented
+class UserRepo:
+    # --- SQL e mappature (condivise con AsyncUserRepo) ---
+    @staticmethod
+    def _query_get_all(solo_docenti=False):
+        # <<< MODIFICA 1: Selezioniamo l'ID come primo campo (vedi queries.json)
+        # Elenchi completi: query con nome, così restano preparabili
+        return ('DocentiList' if solo_docenti else 'SoggettiList'), ()
+
+    @staticmethod
+    def _sql_get_all_search(search_term, solo_docenti=False):
+        # La ricerca testuale funziona ancora anche sul CF se presente
+        condition, params = _name_search(search_term)
+        if solo_docenti:
+            condition += " AND IS_DOCENTE = 1"
+        return f"SELECT {UserRepo.PAGE_COLUMNS} FROM T_SOGGETTI WHERE {condition} ORDER BY COGNOME, NOME", params
+
+    # --- Paginazione (tabelle gestioneutenti / gestionedocenti) ---
+    # Colonne ordinabili dalla UI -> espressioni SQL (l'ID in coda rende l'ordine univoco).
+    # Le colonne che possono essere NULL vanno in COALESCE: il keyset confronta con = e >,
+    # mai veri su NULL, e quelle righe sparirebbero passando alla pagina successiva
+    PAGE_SORTS = {
+        'COGNOME': ("COALESCE(COGNOME, '')", "COALESCE(NOME, '')"),
+        'NOME': ("COALESCE(NOME, '')", "COALESCE(COGNOME, '')"),
+        'CODICE_FISCALE': ("COALESCE(CODICE_FISCALE, '')",),
+    }
+    PAGE_COLUMNS = "ID_SOGGETTO, CODICE_FISCALE, COGNOME, NOME, DATA_NASCITA, LUOGO_NASCITA, ID_ENTE_FK, IS_DOCENTE"
+    # Nome dell'ente di ogni riga della pagina (chiave primaria di T_ENTI: una lettura per riga mostrata)
+    PAGE_ENTE_COLUMN = "(SELECT e.DESCRIZIONE FROM T_ENTI e WHERE e.ID_ENTE = T_SOGGETTI.ID_ENTE_FK)"
+
+    # Oltre questo numero di soggetti trovati dall'indice la pagina filtra in SQL (lista IN troppo lunga)
+    INDEX_PAGE_MAX_IDS = 1000
+
+    @staticmethod
+    def _page_query(search_term='', solo_docenti=False, sort_by=None, descending=False,
+                    after=None, limit=DEFAULT_PAGE_SIZE, offset=0, ids=None):
+        conditions, params = [], []
+        if ids is not None:
+            # Soggetti già trovati dall'indice in memoria: la query ordina e pagina soltanto
+            conditions.append(f"ID_SOGGETTO IN ({', '.join(['%s'] * len(ids))})")
+            params.extend(ids)
+        elif search_term:
+            condition, search_params = _name_search(search_term)
+            conditions.append(condition)
+            params.extend(search_params)
+        if solo_docenti:
+            conditions.append("IS_DOCENTE = 1")
+        return PageQuery(f"{UserRepo.PAGE_COLUMNS}, {UserRepo.PAGE_ENTE_COLUMN}", "T_SOGGETTI", conditions, params,
+                         resolve_sort(UserRepo.PAGE_SORTS, sort_by, 'COGNOME'), 'ID_SOGGETTO',
+                         descending, after, limit, offset)
+
+    @staticmethod
+    def _map_row(r):
+        # Gestione Data
+        d_nascita = r[4] # <<< Nota: gli indici sono shiftati di +1 perché c'è l'ID all'inizio
+        if isinstance(d_nascita, (date, datetime)):
+            d_nascita = d_nascita.strftime('%Y-%m-%d')
+        elif d_nascita is None:
+            d_nascita = ''
+
+        return {
+            # <<< MODIFICA: Mappiamo l'ID del DB nel campo ID_UTENTE usato dalla UI
+            'ID_UTENTE': r[0],       # ID_SOGGETTO
+            'CODICE_FISCALE': r[1],  # Ora può essere None
+            'COGNOME': r[2],
+            'NOME': r[3],
+            'DATA_NASCITA': str(d_nascita),
+            'LUOGO_NASCITA': r[5],
+            'ID_ENTE_FK': r[6],
+            'IS_DOCENTE': bool(r[7])
+        }
+
+    @staticmethod
+    def _sql_upsert(data, is_new=True):
+        # 1. FIX DATA NASCITA
+        dt_nascita = None
+        raw_data = str(data.get('DATA_NASCITA', '')).strip()
+        if raw_data and raw_data != 'None':
+            try:
+                if '-' in raw_data:
+                    dt_nascita = datetime.strptime(raw_data, '%Y-%m-%d').date()
+                elif '/' in raw_data:
+                    dt_nascita = datetime.strptime(raw_data, '%d/%m/%Y').date()
+            except ValueError: pass
+
+        # 2. FIX ID ENTE
+        id_ente_val = str(data.get('ID_ENTE_FK', '')).strip()
+        if not id_ente_val or id_ente_val == 'None':
+            id_ente_val = None
+
+        # 3. GESTIONE CF NULLABLE
+        # Se il CF è vuoto, salviamo NULL (None in Python) nel DB
+        cf_val = (data.get('CODICE_FISCALE') or '').strip().upper()
+        if not cf_val:
+            cf_val = None
+
+        # 4. GESTIONE DOCENTE
+        is_doc = 1 if data.get('IS_DOCENTE') else 0
+
+        if is_new:
+            # <<< INSERT: Non passiamo l'ID, lo genera il DB
+            sql = """
+                INSERT INTO T_SOGGETTI
+                (CODICE_FISCALE, COGNOME, NOME, DATA_NASCITA, LUOGO_NASCITA, ID_ENTE_FK, IS_DOCENTE)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                RETURNING """ + UserRepo.PAGE_COLUMNS + """
+            """
+            params = (cf_val, data['COGNOME'], data['NOME'], dt_nascita, data['LUOGO_NASCITA'], id_ente_val, is_doc)
+        else:
+            # <<< UPDATE: Usiamo l'ID per trovare la riga, NON il CF
+            sql = """
+                UPDATE T_SOGGETTI
+                SET CODICE_FISCALE=%s, COGNOME=%s, NOME=%s, DATA_NASCITA=%s,
+                    LUOGO_NASCITA=%s, ID_ENTE_FK=%s, IS_DOCENTE=%s
+                WHERE ID_SOGGETTO=%s
+                RETURNING """ + UserRepo.PAGE_COLUMNS + """
+            """
+            # Recuperiamo l'ID passato dalla UI
+            id_row = data['ID_UTENTE']
+            params = (cf_val, data['COGNOME'], data['NOME'], dt_nascita, data['LUOGO_NASCITA'], id_ente_val, is_doc, id_row)
+        return sql, params
+
+    SQL_DELETE = "DELETE FROM T_SOGGETTI WHERE ID_SOGGETTO = %s"
+    UPSERT_LABEL = "UPSERT t_soggetti"
+
+    @staticmethod
+    def uses_search_index():
+        """
+        Le ricerche dei soggetti passano dall'indice in memoria? Solo dove anche il database
+        cerca per prefisso (Firebird, PostgreSQL senza migrazione 8). Con RICERCA_NORM risponde
+        sempre il database, che trova anche le parole scritte in modo simile ("Rosi" -> "Rossi"):
+        gli stessi risultati che l'indice sia caricato o no.
+        """
+        return not _normalized_search()
+
+    @staticmethod
+    def _from_index():
+        return subject_index.ready and UserRepo.uses_search_index()
+
+    @staticmethod
+    def _index_ids(search_term, solo_docenti):
+        """ID trovati dall'indice in memoria per la pagina; None = filtrare in SQL."""
+        if not search_term or not UserRepo._from_index():
+            return None
+        ids = subject_index.search_ids(search_term, solo_docenti)
+        return ids if len(ids) <= UserRepo.INDEX_PAGE_MAX_IDS else None
+
+    # --- Ricerca mentre si digita (dialog di creaattestati) ---
+    # Risultati massimi: si mostrano i migliori, chi non trova continua a scrivere
+    SEARCH_LIMIT = 20
+
+    @staticmethod
+    def _sql_search(search_term, solo_docenti=False, limit=SEARCH_LIMIT):
+        """
+        Ricerca sul database (indice non caricato), i più somiglianti per primi.
+        Con RICERCA_NORM: anche parole scritte in modo simile (word_similarity di pg_trgm sulla
+        colonna senza accenti); prima chi inizia con la ricerca, poi chi contiene tutte le parole.
+        """
+        backend = get_backend()
+        condition, params = _name_search(search_term)
+        docenti = " AND IS_DOCENTE = 1" if solo_docenti else ""
+        if _normalized_search():
+            phrase = fold_text(search_term)
+            sql = (f"SELECT {UserRepo.PAGE_COLUMNS} FROM T_SOGGETTI "
+                   f"WHERE ({condition} OR %s <%% RICERCA_NORM){docenti} "
+                   f"ORDER BY CASE WHEN RICERCA_NORM LIKE %s THEN 0 WHEN {condition} THEN 1 ELSE 2 END, "
+                   "word_similarity(%s, RICERCA_NORM) DESC, COGNOME, NOME, ID_SOGGETTO")
+            params = params + (phrase, phrase + '%') + params + (phrase,)
+        else:
+            # Stessa classifica di SubjectIndex._rank
+            term = ' '.join(search_term.upper().split())
+            prefix = term + '%'
+            sql = (f"SELECT {UserRepo.PAGE_COLUMNS} FROM T_SOGGETTI WHERE {condition}{docenti} "
+                   "ORDER BY CASE WHEN UPPER(COGNOME) = %s OR UPPER(CODICE_FISCALE) = %s THEN 0 "
+                   "WHEN UPPER(COGNOME) LIKE %s OR UPPER(CODICE_FISCALE) LIKE %s THEN 1 "
+                   "WHEN UPPER(NOME) LIKE %s THEN 2 ELSE 3 END, COGNOME, NOME, ID_SOGGETTO")
+            params = params + (term, term, prefix, prefix, prefix)
+        return backend.dialect.paginate(sql, limit, 0), params
+
+    @staticmethod
+    def _index_saved(rows):
+        # La riga salvata (RETURNING) passa subito nell'indice
+        if rows:
+            subject_index.put(UserRepo._map_row(rows[0]))
+    SQL_SELECT_OPTIONS = "SELECT ID_SOGGETTO, COGNOME, NOME, CODICE_FISCALE FROM T_SOGGETTI ORDER BY COGNOME, NOME"
+
+    @staticmethod
+    def _map_options(rows):
+        options = {}
+        for r in rows:
+            id_sogg = r[0]
+            cognome = r[1]
+            nome = r[2]
+            cf = r[3] if r[3] else "No CF"
+            # Crea l'etichetta leggibile
+            options[id_sogg] = f"{cognome} {nome} ({cf})"
+        return options
+
+    # --- API sincrona ---
+    @staticmethod
+    def get_all(search_term='', solo_docenti=False):
+        """
+        Recupera utenti con il nuovo ID univoco.
+        """
+        if search_term and UserRepo._from_index():
+            return subject_index.search(search_term, solo_docenti)
+        try:
+            if search_term:
+                rows = get_backend().fetchall(*UserRepo._sql_get_all_search(search_term, solo_docenti))
+            else:
+                rows = get_backend().query_all(*UserRepo._query_get_all(solo_docenti))
+            return [UserRepo._map_row(r) for r in rows]
+        except Exception as e:
+            print(f"Err UserRepo: {e}")
+            return []
+
+    @staticmethod
+    def search(search_term, solo_docenti=False, limit=SEARCH_LIMIT):
+        """I primi `limit` soggetti trovati, i più somiglianti per primi."""
+        if not search_term.strip():
+            return []
+        if UserRepo._from_index():
+            return subject_index.search(search_term, solo_docenti, limit, ranked=True)
+        try:
+            rows = get_backend().fetchall(*UserRepo._sql_search(search_term, solo_docenti, limit))
+            return [UserRepo._map_row(r) for r in rows]
+        except Exception as e:
+            logger.error(f"Err UserRepo.search: {e}")
+            return []
+
+    @staticmethod
+    def get_page(search_term='', solo_docenti=False, with_total=True, **page):
+        """
+        Una pagina di soggetti: {'rows', 'cursor', 'total', 'estimated'}.
+        page: sort_by, descending, after (cursore della pagina precedente), limit, offset.
+        """
+        ids = UserRepo._index_ids(search_term, solo_docenti)
+        if ids == []:
+            return empty_page()
+        try:
+            return get_backend().fetch_page(UserRepo._page_query(search_term, solo_docenti, ids=ids, **page),
+                                            UserRepo._map_with_societa, with_total)
+        except Exception as e:
+            logger.error(f"Err UserRepo.get_page: {e}")
+            return empty_page()
+
+    @staticmethod
+    def upsert(data, is_new=True):
+        backend = get_backend()
+        try:
+            UserRepo._index_saved(backend.run_batch([UserRepo._sql_upsert(data, is_new)], UserRepo.UPSERT_LABEL))
+            return True, "Salvataggio completato."
+        except backend.integrity_errors as e:
+            # Gestione errore duplicati (magari un CF duplicato se inserito)
+            return False, f"Errore integrità dati (es. CF già presente): {e}"
+        except Exception as e:
+            return False, f"Errore DB: {str(e)}"
+
+    @staticmethod
+    def delete(id_utente):
+        """
+        Elimina per ID, non per CF
+        """
+        try:
+            get_backend().execute(UserRepo.SQL_DELETE, (id_utente,))
+            subject_index.remove(id_utente)
+            return True, "Eliminato"
+        except Exception as e:
+            return False, str(e)
+
+    @staticmethod
+    def get_select_options():
+        """
+        Restituisce un dizionario {ID: 'Cognome Nome (CF)'}
+        da usare nelle ui.select
+        """
+        try:
+            return UserRepo._map_options(get_backend().fetchall(UserRepo.SQL_SELECT_OPTIONS))
+        except Exception as e:
+            print(f"Err options: {e}")
+            return {}
+
+    @staticmethod
+    def load_search_index():
+        """(Ri)carica l'indice di ricerca in memoria con tutti i soggetti. Restituisce quanti."""
+        subject_index.begin_load()
+        try:
+            rows = get_backend().query_all('SoggettiList')
+        except Exception as e:
+            subject_index.cancel_load()
+            logger.error(f"Indice ricerca soggetti non caricato: {e}")
+            return 0
+        subject_index.load([UserRepo._map_row(r) for r in rows])
+        return len(rows)
+
+    # --- Elenchi di soggetti (inserimento massivo in creaattestati) ---
+    @staticmethod
+    def _nominativo_expr(alias=''):
+        """Cognome e nome come li confronta resolve_list (indice ix_soggetti_nominativo, migrazione 9)."""
+        if _normalized_search():
+            return f"wsm_normalizza(coalesce({alias}COGNOME, '') || ' ' || coalesce({alias}NOME, ''))"
+        return f"UPPER({alias}COGNOME || ' ' || {alias}NOME)"
+
+    @staticmethod
+    def _name_keys(nominativo):
+        if _normalized_search():
+            return _name_orders(fold_text(nominativo).split())
+        return _name_orders(nominativo.upper().split())
+
+    @staticmethod
+    def _sql_resolve_list(entries):
+        dialect = get_backend().dialect
+        cfs = sorted({cf for _, cf, _ in entries if cf})
+        names = sorted({k for _, _, n in entries if n for k in UserRepo._name_keys(n)})
+        conditions, params = [], []
+        for expr, values in (("s.CODICE_FISCALE", cfs), (UserRepo._nominativo_expr('s.'), names)):
+            if values:
+                sql, p = dialect.any_of(expr, values)
+                conditions.append(sql)
+                params.extend(p)
+        columns = ', '.join('s.' + c.strip() for c in UserRepo.PAGE_COLUMNS.split(','))
+        sql = (f"SELECT {columns}, e.DESCRIZIONE, {UserRepo._nominativo_expr('s.')} "
+               "FROM T_SOGGETTI s LEFT JOIN T_ENTI e ON s.ID_ENTE_FK = e.ID_ENTE "
+               f"WHERE {' OR '.join(conditions)} ORDER BY s.COGNOME, s.NOME, s.ID_SOGGETTO")
+        return sql, tuple(params)
+
+    @staticmethod
+    def _resolve_entries(entries, rows):
+        """
+        {'found': soggetti trovati una volta sola, 'ambiguous': [(riga, candidati)],
+         'unmatched': [righe senza soggetto]}. I soggetti hanno anche SOCIETA.
+        """
+        by_cf, by_name = defaultdict(list), defaultdict(list)
+        for r in rows:
+            u = UserRepo._map_with_societa(r)
+            if u['CODICE_FISCALE']:
+                by_cf[u['CODICE_FISCALE'].upper()].append(u)
+            by_name[r[9]].append(u)
+
+        result = {'found': [], 'ambiguous': [], 'unmatched': []}
+        seen = set()
+        for line, cf, nominativo in entries:
+            if cf:
+                matches = by_cf.get(cf, [])
+            else:
+                matches = list({u['ID_UTENTE']: u for k in UserRepo._name_keys(nominativo)
+                                for u in by_name.get(k, [])}.values())
+            if len(matches) == 1:
+                if matches[0]['ID_UTENTE'] not in seen:
+                    seen.add(matches[0]['ID_UTENTE'])
+                    result['found'].append(matches[0])
+            elif matches:
+                result['ambiguous'].append((line, matches))
+            else:
+                result['unmatched'].append(line)
+        return result
+
+    @staticmethod
+    def resolve_list(text):
+        """Soggetti di un elenco incollato o di un CSV (vedi parse_subject_lines), con una sola query."""
+        entries = parse_subject_lines(text)
+        if not entries:
+            return UserRepo._resolve_entries([], [])
+        try:
+            rows = get_backend().fetchall(*UserRepo._sql_resolve_list(entries))
+        except Exception as e:
+            logger.error(f"Err UserRepo.resolve_list: {e}")
+            rows = []
+        return UserRepo._resolve_entries(entries, rows)
+
+    # --- Dipendenti di un ente (inserimento massivo in creaattestati) ---
+    # filtro: 'tutti'; 'senza_corso' = mai fatto il corso; 'da_rinnovare' = nessun attestato
+    # del corso ancora valido fra days_lookahead giorni (mai fatto, scaduto o in scadenza)
+    ENTE_FILTERS = ('tutti', 'senza_corso', 'da_rinnovare')
+
+    @staticmethod
+    def _sql_by_ente(id_ente, id_corso=None, filtro='tutti', days_lookahead=60, today=None):
+        """
+        Una query sull'indice ix_soggetti_ente; il controllo sugli attestati è un NOT EXISTS
+        che usa l'indice univoco (soggetto, corso, data) di T_ATTESTATI.
+        """
+        columns = ', '.join('s.' + c.strip() for c in UserRepo.PAGE_COLUMNS.split(','))
+        sql = (f"SELECT {columns}, e.DESCRIZIONE FROM T_SOGGETTI s "
+               "LEFT JOIN T_ENTI e ON s.ID_ENTE_FK = e.ID_ENTE WHERE s.ID_ENTE_FK = %s")
+        params = [id_ente]
+        if filtro != 'tutti' and id_corso is not None:
+            sql += " AND NOT EXISTS (SELECT 1 FROM T_ATTESTATI a"
+            if filtro == 'da_rinnovare':
+                years = f'COALESCE(c.validita_anni, {DEFAULT_VALIDITA_ANNI})'
+                limit_date = (today or date.today()) + timedelta(days=days_lookahead)
+                # Come in _scadenze_query: la finestra su data_svolgimento fa lavorare l'indice
+                sql += (" JOIN T_CORSI c ON a.ID_CORSO_FK = c.ID_CORSO"
+                        " WHERE a.ID_SOGGETTO = s.ID_SOGGETTO AND a.ID_CORSO_FK = %s"
+                        f" AND a.DATA_SVOLGIMENTO >= {_add_years('CAST(%s AS DATE)', f'-{years}')}"
+                        f" AND {AttestatiRepo._expiry_expr()} > %s)")
+                params += [id_corso, limit_date - timedelta(days=1), limit_date]
+            else:
+                sql += " WHERE a.ID_SOGGETTO = s.ID_SOGGETTO AND a.ID_CORSO_FK = %s)"
+                params.append(id_corso)
+        sql += " ORDER BY s.COGNOME, s.NOME, s.ID_SOGGETTO"
+        return sql, tuple(params)
+
+    @staticmethod
+    def _map_with_societa(r):
+        return dict(UserRepo._map_row(r[:8]), SOCIETA=r[8] or '')
+
+    @staticmethod
+    def get_by_ente(id_ente, id_corso=None, filtro='tutti', days_lookahead=60):
+        """Soggetti dell'ente (con SOCIETA), eventualmente solo chi non ha il corso o deve rinnovarlo."""
+        try:
+            rows = get_backend().fetchall(*UserRepo._sql_by_ente(id_ente, id_corso, filtro, days_lookahead))
+            return [UserRepo._map_with_societa(r) for r in rows]
+        except Exception as e:
+            logger.error(f"Err UserRepo.get_by_ente: {e}")
+            return []
+
+# --- SCADENZE ---
+# Validità usata quando il corso non ha validita_anni (stesso default della pagina corsi)
+DEFAULT_VALIDITA_ANNI = 5
+
+def _scadenza(data_svol, validita_anni):
+    """Data di scadenza calcolata in Python (29/02 -> 28/02 come fa il DB)."""
+    if not isinstance(data_svol, date):
+        return None
+    anni = validita_anni or DEFAULT_VALIDITA_ANNI
+    try:
+        return data_svol.replace(year=data_svol.year + anni)
+    except ValueError:
+        return data_svol.replace(year=data_svol.year + anni, day=28)
+
+# --- REPOSITORY ATTESTATI ---
+@instrumented
+class AttestatiRepo:
+    # --- SQL e mappature (condivise con AsyncAttestatiRepo) ---
+    # Senza filtro le date coprono tutto l'intervallo: la query resta sempre la stessa
+    HISTORY_MIN_DATE = date(1, 1, 1)
+    HISTORY_MAX_DATE = date(9999, 12, 31)
+
+    @staticmethod
+    def _query_history(search='', start_date=None, end_date=None):
+        # <<< MODIFICA: La JOIN ora usa ID_SOGGETTO (vedi queries.json)
+        params = []
+        name = 'AttestatiHistory'
+
+        # Filtro Ricerca (Cerca ancora per testo su Cognome/Nome/CF recuperati dalla join)
+        if search:
+            term = f"%{search.lower()}%"
+            name = 'AttestatiHistorySearch'
+            params.extend([term, term, term, term])
+
+        # Filtri Date
+        params.append(start_date or AttestatiRepo.HISTORY_MIN_DATE)
+        params.append(end_date or AttestatiRepo.HISTORY_MAX_DATE)
+        return name, tuple(params)
+
+    # --- Paginazione (tabella archivio) ---
+    PAGE_COLUMNS = ("a.id_attestato, a.data_svolgimento, s.codice_fiscale, s.cognome, s.nome, c.nome_corso, "
+                    "c.validita_anni, d.hash_documento")
+
+    @staticmethod
+    def _expiry_expr():
+        # Scadenza calcolata dal DB con la validità del corso
+        return _add_years('a.data_svolgimento', f'COALESCE(c.validita_anni, {DEFAULT_VALIDITA_ANNI})')
+
+    @staticmethod
+    def _page_sorts():
+        return {
+            'DATA_FMT': ('a.data_svolgimento',),
+            'SCADENZA_FMT': (AttestatiRepo._expiry_expr(),),
+            'CORSISTA': ("COALESCE(s.cognome, '')", "COALESCE(s.nome, '')"),
+            'CORSO': ("COALESCE(c.nome_corso, '')",),
+        }
+    PAGE_FROM = """public.t_attestati a
+            JOIN public.t_soggetti s ON a.ID_SOGGETTO = s.ID_SOGGETTO
+            JOIN public.t_corsi c ON a.id_corso_fk = c.id_corso
+            LEFT JOIN t_documenti_attestati d ON d.id_attestato = a.id_attestato"""
+
+    @staticmethod
+    def _page_query(search='', start_date=None, end_date=None, sort_by=None, descending=True,
+                    after=None, limit=DEFAULT_PAGE_SIZE, offset=0):
+        conditions, params = [], []
+        if search:
+            term = f"%{search.lower()}%"
+            conditions.append("""(
+                LOWER(s.cognome) LIKE %s OR
+                LOWER(s.nome) LIKE %s OR
+                LOWER(s.codice_fiscale) LIKE %s OR
+                LOWER(c.nome_corso) LIKE %s
+            )""")
+            params.extend([term, term, term, term])
+        if start_date:
+            conditions.append("a.data_svolgimento >= %s")
+            params.append(start_date)
+        if end_date:
+            conditions.append("a.data_svolgimento <= %s")
+            params.append(end_date)
+        return PageQuery(AttestatiRepo.PAGE_COLUMNS, AttestatiRepo.PAGE_FROM, conditions, params,
+                         resolve_sort(AttestatiRepo._page_sorts(), sort_by, 'DATA_FMT'), 'a.id_attestato',
+                         descending, after, limit, offset)
+
+    @staticmethod
+    def _map_history_row(row):
+        data_svol = row[1]
+
+        # Calcolo scadenza con la validità del corso (row[6], default 5 anni)
+        scadenza = _scadenza(data_svol, row[6] if len(row) > 6 else None)
+
+        return {
+            'ID': row[0],
+            'DATA_EMISSIONE': data_svol,
+            'CORSISTA': f"{row[3]} {row[4]}", # Cognome + Nome
+            'CF': row[2] if row[2] else "-",  # Gestiamo il caso CF nullo
+            'CORSO': row[5],
+            'SCADENZA': scadenza,
+            # Documento generato disponibile nell'archivio (download/ristampa senza rigenerare)
+            'DOCUMENTO': row[7] if len(row) > 7 else None,
+        }
+
+    # <<< MODIFICA: Scrive nella colonna ID_SOGGETTO
+    SQL_INSERT = """
+        INSERT INTO public.t_attestati
+        (ID_SOGGETTO, id_corso_fk, data_svolgimento)
+        VALUES (%s, %s, %s)
+    """
+
+    # --- Scadenzario ---
+    SCADENZE_MODES = ('in_scadenza', 'scaduti', 'tutti')
+    SCADENZE_GRACE_DAYS = 60   # in_scadenza mostra anche gli scaduti da meno di 60 giorni
+    SCADENZE_COLUMNS = ("a.id_attestato, a.data_svolgimento, s.codice_fiscale, s.cognome, s.nome, "
+                        "c.nome_corso, e.DESCRIZIONE")
+    SCADENZE_FROM = """public.t_attestati a
+            JOIN public.t_soggetti s ON a.ID_SOGGETTO = s.ID_SOGGETTO
+            JOIN public.t_corsi c ON a.id_corso_fk = c.id_corso
+            LEFT JOIN T_ENTI e ON s.ID_ENTE_FK = e.ID_ENTE"""
+
+    @staticmethod
+    def _scadenze_query(mode='in_scadenza', days_lookahead=60, search='', today=None, sort_by=None,
+                        descending=False, after=None, limit=DEFAULT_PAGE_SIZE, offset=0):
+        """
+        Attestati in scadenza calcolati dal DB: scadenza = data_svolgimento + validita_anni del corso.
+        Oltre al filtro esatto sulla scadenza, la finestra viene riportata su data_svolgimento
+        (per ogni corso: limite - validita_anni) così l'indice (id_corso_fk, data_svolgimento) lavora.
+        """
+        today = today or date.today()
+        expiry = AttestatiRepo._expiry_expr()
+        years = f'COALESCE(c.validita_anni, {DEFAULT_VALIDITA_ANNI})'
+        conditions, params = [], []
+
+        def seek_from(limit_date):
+            # data_svolgimento >= limite - validità (un giorno di margine per il 29 febbraio)
+            conditions.append(f"a.data_svolgimento >= {_add_years('CAST(%s AS DATE)', f'-{years}')}")
+            params.append(limit_date - timedelta(days=1))
+
+        def seek_to(limit_date):
+            conditions.append(f"a.data_svolgimento <= {_add_years('CAST(%s AS DATE)', f'-{years}')}")
+            params.append(limit_date + timedelta(days=1))
+
+        if mode == 'scaduti':
+            seek_to(today)
+            conditions.append(f"{expiry} < %s")
+            params.append(today)
+        elif mode == 'in_scadenza':
+            lo = today - timedelta(days=AttestatiRepo.SCADENZE_GRACE_DAYS)
+            hi = today + timedelta(days=int(days_lookahead))
+            seek_from(lo)
+            seek_to(hi)
+            conditions.append(f"{expiry} BETWEEN %s AND %s")
+            params.extend([lo, hi])
+
+        if search:
+            term = f"%{search.lower()}%"
+            conditions.append("""(
+                LOWER(s.cognome) LIKE %s OR
+                LOWER(s.nome) LIKE %s OR
+                LOWER(s.codice_fiscale) LIKE %s OR
+                LOWER(c.nome_corso) LIKE %s OR
+                LOWER(e.DESCRIZIONE) LIKE %s
+            )""")
+            params.extend([term] * 5)
+
+        # Ordinamento predefinito: giorni rimanenti (= scadenza) crescenti
+        sorts = {
+            'SCADENZA_FMT': (expiry,),
+            'CORSISTA': ("COALESCE(s.cognome, '')", "COALESCE(s.nome, '')"),
+            'CORSO': ("COALESCE(c.nome_corso, '')",),
+        }
+        return PageQuery(f"{AttestatiRepo.SCADENZE_COLUMNS}, {expiry}", AttestatiRepo.SCADENZE_FROM,
+                         conditions, params, resolve_sort(sorts, sort_by, 'SCADENZA_FMT'), 'a.id_attestato',
+                         descending, after, limit, offset)
+
+    @staticmethod
+    def _map_scadenza_row(row, today=None):
+        today = today or date.today()
+        scadenza = row[7]
+        if isinstance(scadenza, datetime):
+            scadenza = scadenza.date()
+        return {
+            'ID': row[0],
+            'DATA_EMISSIONE': row[1],
+            'CORSISTA': f"{row[3]} {row[4]}",
+            'CF': row[2] if row[2] else "-",
+            'CORSO': row[5],
+            'ENTE': row[6] or '',
+            'SCADENZA': scadenza,
+            'GIORNI_RIMASTI': (scadenza - today).days if scadenza else None,
+        }
+
+    # Inserimento massivo: un attestato per (soggetto, corso, data), rilanciare un lotto non duplica
+    BULK_TABLE = "public.t_attestati"
+    BULK_COLUMNS = ('ID_SOGGETTO', 'id_corso_fk', 'data_svolgimento')
+    BULK_RETURNING = ('id_attestato', 'ID_SOGGETTO', 'id_corso_fk', 'data_svolgimento')
+
+    @staticmethod
+    def _bulk_rows(records):
+        # Toglie i doppioni del lotto (stesso soggetto due volte nello stesso corso/data)
+        return list(dict.fromkeys(tuple(r) for r in records))
+
+    @staticmethod
+    def _map_bulk_result(rows):
+        return {(r[1], r[2], r[3]): r[0] for r in rows}
+
+    # Documenti generati (vedi attestati/artefatti.py): ultimo documento di ogni attestato
+    DOCS_TABLE = "t_documenti_attestati"
+    DOCS_COLUMNS = ('id_attestato', 'hash_documento', 'nome_file')
+    DOCS_KEYS = ('id_attestato',)
+
+    @staticmethod
+    def _sql_documents(count):
+        return (f"SELECT id_attestato, hash_documento, nome_file FROM t_documenti_attestati "
+                f"WHERE id_attestato IN ({', '.join(['%s'] * count)})")
+
+    @staticmethod
+    def _map_documents(rows):
+        return {r[0]: {'HASH': r[1].strip(), 'NOME_FILE': r[2]} for r in rows}
+
+    @staticmethod
+    def _sql_linked_hashes(count):
+        # Indice ix_documenti_hash; lista IN (non ANY) così il confronto resta su CHAR e usa l'indice
+        return (f"SELECT DISTINCT hash_documento FROM t_documenti_attestati "
+                f"WHERE hash_documento IN ({', '.join(['%s'] * count)})")
+
+    # --- API sincrona ---
+    @staticmethod
+    def get_history(search='', start_date=None, end_date=None):
+        """
+        Recupera lo storico unendo t_attestati, t_soggetti e t_corsi.
+        JOIN aggiornata per usare ID_SOGGETTO invece del CF.
+        """
+        try:
+            rows = get_backend().query_all(*AttestatiRepo._query_history(search, start_date, end_date))
+            # Mappatura risultati per la UI
+            return [AttestatiRepo._map_history_row(row) for row in rows]
+        except Exception as e:
+            print(f"Errore AttestatiRepo: {e}")
+            return []
+
+    @staticmethod
+    def get_history_page(search='', start_date=None, end_date=None, with_total=True, **page):
+        """Una pagina dello storico: {'rows', 'cursor', 'total', 'estimated'}."""
+        try:
+            return get_backend().fetch_page(AttestatiRepo._page_query(search, start_date, end_date, **page),
+                                            AttestatiRepo._map_history_row, with_total)
+        except Exception as e:
+            logger.error(f"Errore AttestatiRepo.get_history_page: {e}")
+            return empty_page()
+
+    @staticmethod
+    def get_scadenze_page(mode='in_scadenza', days_lookahead=60, search='', with_total=True, **page):
+        """Pagina dello scadenzario, già filtrata e ordinata dal DB: {'rows', 'cursor', 'total', 'estimated'}."""
+        try:
+            return get_backend().fetch_page(AttestatiRepo._scadenze_query(mode, days_lookahead, search, **page),
+                                            AttestatiRepo._map_scadenza_row, with_total)
+        except Exception as e:
+            logger.error(f"Errore AttestatiRepo.get_scadenze_page: {e}")
+            return empty_page()
+
+    @staticmethod
+    def insert_attestato(id_soggetto, id_corso, data_svolgimento):
+        """
+        Salva un nuovo attestato.
+        <<< MODIFICA: Accetta id_soggetto (INT) invece di cf (STR)
+        """
+        try:
+            # id_soggetto qui deve essere un NUMERO
+            get_backend().execute(AttestatiRepo.SQL_INSERT, (id_soggetto, id_corso, data_svolgimento))
+            return True
+        except Exception as e:
+            # Il rollback lo fa già il context manager del pool
+            print(f"Errore Insert Attestato: {e}")
+            return False
+
+    @staticmethod
+    def insert_many(records):
+        """
+        Salva un intero lotto di attestati in una sola transazione.
+        records: sequenza di (id_soggetto, id_corso, data_svolgimento).
+        Restituisce (True, {(id_soggetto, id_corso, data): id_attestato}) oppure (False, messaggio):
+        in caso di errore non viene salvato nessun attestato del lotto.
+        """
+        rows = AttestatiRepo._bulk_rows(records)
+        if not rows:
+            return True, {}
+        try:
+            result = get_backend().bulk_upsert(
+                AttestatiRepo.BULK_TABLE, AttestatiRepo.BULK_COLUMNS, AttestatiRepo.BULK_COLUMNS,
+                rows, AttestatiRepo.BULK_RETURNING)
+            return True, AttestatiRepo._map_bulk_result(result)
+        except Exception as e:
+            logger.error(f"Errore Insert lotto attestati: {e}")
+            return False, f"Errore DB: {str(e)}"
+
+    @staticmethod
+    def link_documents(links):
+        """
+        Collega gli attestati ai documenti generati, in una transazione.
+        links: sequenza di (id_attestato, hash_documento, nome_file). Restituisce True/False.
+        """
+        rows = list({r[0]: tuple(r) for r in links}.values())
+        if not rows:
+            return True
+        try:
+            get_backend().bulk_upsert(AttestatiRepo.DOCS_TABLE, AttestatiRepo.DOCS_COLUMNS,
+                                      AttestatiRepo.DOCS_KEYS, rows, AttestatiRepo.DOCS_KEYS)
+            return True
+        except Exception as e:
+            logger.error(f"Errore collegamento documenti attestati: {e}")
+            return False
+
+    @staticmethod
+    def get_documents(ids):
+        """{id_attestato: {'HASH', 'NOME_FILE'}} per gli attestati con un documento generato."""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+        try:
+            return AttestatiRepo._map_documents(get_backend().fetchall(AttestatiRepo._sql_documents(len(ids)), tuple(ids)))
+        except Exception as e:
+            logger.error(f"Errore lettura documenti attestati: {e}")
+            return {}
+
+    @staticmethod
+    def linked_hashes(keys):
+        """
+        Le chiavi dell'archivio ancora collegate a un attestato. Gli errori si propagano:
+        la pulizia dell'archivio non deve scambiare un DB irraggiungibile per "nessun collegamento".
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return set()
+        rows = get_backend().fetchall(AttestatiRepo._sql_linked_hashes(len(keys)), tuple(keys))
+        return {r[0].strip() for r in rows}
+
+# --- REPOSITORY AUTENTICAZIONE ---
+@instrumented
+class AuthRepo:
+    SQL_ALL_USERS = "SELECT USERNAME, RUOLO FROM T_AUTENTICAZIONE ORDER BY USERNAME"
+    SQL_CREATE_USER = "INSERT INTO T_AUTENTICAZIONE (USERNAME, PASSWORD_HASH, RUOLO) VALUES (%s, %s, %s)"
+    SQL_DELETE_USER = "DELETE FROM T_AUTENTICAZIONE WHERE USERNAME = %s"
+
+    @staticmethod
+    def _hash_password(password_clear):
+        return bcrypt.hashpw(password_clear.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+    @staticmethod
+    def get_all_users():
+        """Recupera tutti gli utenti di sistema (senza password hash)"""
+        try:
+            rows = get_backend().fetchall(AuthRepo.SQL_ALL_USERS)
+            return [{'USERNAME': r[0], 'RUOLO': r[1]} for r in rows]
+        except Exception as e:
+            print(f"Err AuthRepo.get_all: {e}")
+            return []
+
+    @staticmethod
+    def create_user(username, password_clear, role='user'):
+        """Crea un nuovo utente con password criptata"""
+        backend = get_backend()
+        try:
+            # 1. Cripta la password (prima di prendere la connessione: bcrypt è lento)
+            pwd_hash = AuthRepo._hash_password(password_clear)
+            backend.execute(AuthRepo.SQL_CREATE_USER, (username, pwd_hash, role))
+            return True, "Utente creato con successo."
+        except backend.integrity_errors:
+            logger.info("Errore: Username già esistente")
+            return False, "Errore: Username già esistente."
+        except Exception as e:
+            return False, f"Errore DB: {str(e)}"
+
+    @staticmethod
+    def delete_user(username):
+        """Elimina un utente"""
+        try:
+            get_backend().execute(AuthRepo.SQL_DELETE_USER, (username,))
+            return True
+        except Exception: return False
+
+@instrumented
+class CorsoRepo:
+    SQL_NEXT_ID = "SELECT COALESCE(MAX(id_corso), 0) + 1 FROM public.t_corsi"
+    SEQUENCE = "seq_t_corsi"
+    SQL_DELETE = "DELETE FROM public.t_corsi WHERE id_corso = %s"
+
+    # --- SQL (condivise con AsyncCorsoRepo) ---
+    @staticmethod
+    def _sql_get_all(search=''):
+        # SELECT che include validita_anni
+        query = """
+            SELECT id_corso, nome_corso, ore_durata, codice_breve, programma, template_file, validita_anni
+            FROM public.t_corsi
+        """
+        params = []
+        if search:
+            query += f" WHERE {_ilike('nome_corso')} OR {_ilike('codice_breve')}"
+            term = f"%{search}%"
+            params = [term, term]
+
+        query += " ORDER BY id_corso ASC"
+        return query, tuple(params)
+
+    # --- Paginazione (tabella gestionecorsi) ---
+    PAGE_SORTS = {
+        'ID_CORSO': (),
+        'NOME_CORSO': ("COALESCE(nome_corso, '')",),
+        'CODICE_BREVE': ("COALESCE(codice_breve, '')",),
+    }
+    PAGE_COLUMNS = "id_corso, nome_corso, ore_durata, codice_breve, programma, template_file, validita_anni"
+    PAGE_FIELDS = ('ID_CORSO', 'NOME_CORSO', 'ORE_DURATA', 'CODICE_BREVE', 'PROGRAMMA', 'TEMPLATE_FILE', 'VALIDITA_ANNI')
+
+    @staticmethod
+    def _page_query(search='', sort_by=None, descending=False, after=None, limit=DEFAULT_PAGE_SIZE, offset=0):
+        conditions, params = [], []
+        if search:
+            conditions.append(f"({_ilike('nome_corso')} OR {_ilike('codice_breve')})")
+            term = f"%{search}%"
+            params = [term, term]
+        return PageQuery(CorsoRepo.PAGE_COLUMNS, "public.t_corsi", conditions, params,
+                         resolve_sort(CorsoRepo.PAGE_SORTS, sort_by, 'ID_CORSO'), 'id_corso',
+                         descending, after, limit, offset)
+
+    @staticmethod
+    def _map_row(r):
+        return dict(zip(CorsoRepo.PAGE_FIELDS, r))
+
+    @staticmethod
+    def _sql_upsert(data, is_new):
+        # Recuperiamo il valore SENZA default. Se manca è None -> DB NULL
+        val_anni = data.get('VALIDITA_ANNI')
+
+        if is_new:
+            # INSERT
+            query = """
+                INSERT INTO public.t_corsi
+                (id_corso, nome_corso, ore_durata, codice_breve, programma, template_file, validita_anni)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """
+            params = (
+                data['ID_CORSO'], data['NOME_CORSO'], data['ORE_DURATA'],
+                data['CODICE_BREVE'], data['PROGRAMMA'], data['TEMPLATE_FILE'],
+                val_anni # Passa None se vuoto
+            )
+            return query, params, "Corso creato"
+
+        # UPDATE
+        query = """
+            UPDATE public.t_corsi
+            SET nome_corso=%s, ore_durata=%s, codice_breve=%s,
+                programma=%s, template_file=%s, validita_anni=%s
+            WHERE id_corso=%s
+        """
+        params = (
+            data['NOME_CORSO'], data['ORE_DURATA'],
+            data['CODICE_BREVE'], data['PROGRAMMA'], data['TEMPLATE_FILE'],
+            val_anni, # Passa None se vuoto
+            data['ID_CORSO']
+        )
+        return query, params, "Corso aggiornato"
+
+    # --- API sincrona ---
+    @staticmethod
+    def get_all(search=''):
+        try:
+            return get_backend().fetchall_dicts(*CorsoRepo._sql_get_all(search))
+        except Exception as e:
+            print(f"Errore CorsoRepo.get_all: {e}")
+            return []
+
+    @staticmethod
+    def get_page(search='', with_total=True, **page):
+        """Una pagina di corsi: {'rows', 'cursor', 'total', 'estimated'}."""
+        try:
+            return get_backend().fetch_page(CorsoRepo._page_query(search, **page), CorsoRepo._map_row, with_total)
+        except Exception as e:
+            logger.error(f"Errore CorsoRepo.get_page: {e}")
+            return empty_page()
+
+    @staticmethod
+    def get_next_id():
+        backend = get_backend()
+        try:
+            return backend.next_value(CorsoRepo.SEQUENCE)
+        except Exception:
+            # Sequenza non ancora creata (migrazione 3 non applicata)
+            return backend.fetchone(CorsoRepo.SQL_NEXT_ID)[0]
+
+    @staticmethod
+    def upsert(data, is_new):
+        try:
+            query, params, msg = CorsoRepo._sql_upsert(data, is_new)
+            get_backend().execute(query, params)
+            return True, msg
+        except Exception as e:
+            return False, str(e)
+
+    @staticmethod
+    def delete(id_corso):
+        get_backend().execute(CorsoRepo.SQL_DELETE, (id_corso,))
+        return True, "Eliminato"
+
+# --- REPOSITORY ENTI (COMPLETA) ---
+@instrumented
+class EnteRepo:
+    SQL_MAX_ID = "SELECT MAX(ID_ENTE) FROM T_ENTI"
+    SEQUENCE = "seq_t_enti"
+    SQL_DELETE = "DELETE FROM T_ENTI WHERE ID_ENTE = %s"
+
+    # --- SQL (condivise con AsyncEnteRepo) ---
+    @staticmethod
+    def _sql_get_all(search_term=''):
+        sql = "SELECT ID_ENTE, DESCRIZIONE, P_IVA FROM T_ENTI"
+        params = []
+
+        if search_term:
+            term = search_term.upper()
+            sql += f" WHERE {_ilike('UPPER(DESCRIZIONE)')} OR {_ilike('UPPER(P_IVA)')} OR {_ilike('CAST(ID_ENTE AS VARCHAR(50))')}"
+            params = [term, term, term]
+
+        sql += " ORDER BY DESCRIZIONE"
+        return sql, tuple(params)
+
+    # --- Paginazione (tabella gestioneenti) ---
+    PAGE_SORTS = {
+        'DESCRIZIONE': ("COALESCE(DESCRIZIONE, '')",),
+        'ID_ENTE': (),
+        'P_IVA': ("COALESCE(P_IVA, '')",),
+    }
+
+    @staticmethod
+    def _page_query(search_term='', sort_by=None, descending=False, after=None, limit=DEFAULT_PAGE_SIZE, offset=0):
+        conditions, params = [], []
+        if search_term:
+            term = search_term.upper()
+            conditions.append(f"({_ilike('UPPER(DESCRIZIONE)')} OR {_ilike('UPPER(P_IVA)')} OR {_ilike('CAST(ID_ENTE AS VARCHAR(50))')})")
+            params = [term, term, term]
+        return PageQuery("ID_ENTE, DESCRIZIONE, P_IVA", "T_ENTI", conditions, params,
+                         resolve_sort(EnteRepo.PAGE_SORTS, sort_by, 'DESCRIZIONE'), 'ID_ENTE',
+                         descending, after, limit, offset)
+
+    @staticmethod
+    def _map_row(r):
+        return {'ID_ENTE': r[0], 'DESCRIZIONE': r[1], 'P_IVA': r[2]}
+
+    @staticmethod
+    def _sql_upsert(data, is_new=True):
+        if is_new:
+            sql = "INSERT INTO T_ENTI (ID_ENTE, DESCRIZIONE, P_IVA) VALUES (%s, %s, %s)"
+            params = (data['ID_ENTE'], data['DESCRIZIONE'], data['P_IVA'])
+        else:
+            sql = "UPDATE T_ENTI SET DESCRIZIONE=%s, P_IVA=%s WHERE ID_ENTE=%s"
+            params = (data['DESCRIZIONE'], data['P_IVA'], data['ID_ENTE'])
+        return sql, params
+
+    # --- API sincrona ---
+    @staticmethod
+    def get_all(search_term=''):
+        try:
+            rows = get_backend().fetchall(*EnteRepo._sql_get_all(search_term))
+            # Restituisce la lista di dizionari
+            return [EnteRepo._map_row(r) for r in rows]
+        except Exception as e:
+            print(f"Errore EnteRepo.get_all: {e}")
+            return []
+
+    @staticmethod
+    def get_page(search_term='', with_total=True, **page):
+        """Una pagina di enti: {'rows', 'cursor', 'total', 'estimated'}."""
+        try:
+            return get_backend().fetch_page(EnteRepo._page_query(search_term, **page), EnteRepo._map_row, with_total)
+        except Exception as e:
+            logger.error(f"Errore EnteRepo.get_page: {e}")
+            return empty_page()
+
+    @staticmethod
+    def get_next_id():
+        """Prossimo ID dalla sequenza (MAX + 1 se la sequenza non c'è ancora)"""
+        try:
+            return get_backend().next_value(EnteRepo.SEQUENCE)
+        except Exception:
+            pass
+        try:
+            row = get_backend().fetchone(EnteRepo.SQL_MAX_ID)
+            max_id = row[0] if row and row[0] is not None else 0
+            return max_id + 1
+        except Exception as e:
+            print(f"Errore calcolo ID Ente: {e}")
+            return 1
+
+    @staticmethod
+    def upsert(data, is_new=True):
+        try:
+            get_backend().execute(*EnteRepo._sql_upsert(data, is_new))
+            return True, "Salvataggio completato."
+        except Exception as e:
+            return False, f"Errore DB: {str(e)}"
+
+    @staticmethod
+    def delete(id_ente):
+        try:
+            get_backend().execute(EnteRepo.SQL_DELETE, (id_ente,))
+            return True
+        except Exception:
+            return False
+
+# --- REPOSITORY LAVORI (coda persistente) ---
+JOB_QUEUED = 'in_coda'
+JOB_RUNNING = 'in_corso'
+JOB_DONE = 'completato'
+JOB_FAILED = 'errore'
+JOB_FINAL_STATES = (JOB_DONE, JOB_FAILED)
+
+@instrumented
+class JobRepo:
+    SEQUENCE = "seq_t_lavori"
+    # POSIZIONE: lavori in coda prima di questo (0 = il prossimo a partire)
+    SQL_COLUMNS = """
+        l.ID_LAVORO, l.TIPO, l.STATO, l.UTENTE, l.TOTALE, l.FATTI, l.FILE_RISULTATO, l.ERRORE,
+        l.CREATO_IL, l.AVVIATO_IL, l.FINITO_IL,
+        (SELECT COUNT(*) FROM T_LAVORI q WHERE q.STATO = 'in_coda' AND q.ID_LAVORO < l.ID_LAVORO)
+    """
+    SQL_INSERT = """
+        INSERT INTO T_LAVORI (ID_LAVORO, TIPO, STATO, UTENTE, PARAMETRI, TOTALE, FATTI)
+        VALUES (%s, %s, %s, %s, %s, %s, 0)
+    """
+    SQL_GET = f"SELECT {SQL_COLUMNS} FROM T_LAVORI l WHERE l.ID_LAVORO = %s"
+    SQL_FOR_USER = f"SELECT {SQL_COLUMNS} FROM T_LAVORI l WHERE l.UTENTE = %s ORDER BY l.ID_LAVORO DESC"
+    SQL_NEXT_QUEUED = "SELECT MIN(ID_LAVORO) FROM T_LAVORI WHERE STATO = 'in_coda'"
+    # Il lavoro è preso solo se è ancora in coda: due worker non eseguono lo stesso lavoro.
+    # ESECUTORE = il JobRunner che lo esegue; HEARTBEAT_IL = il suo ultimo segnale di vita
+    SQL_CLAIM = """
+        UPDATE T_LAVORI SET STATO = 'in_corso', AVVIATO_IL = CURRENT_TIMESTAMP, FATTI = 0,
+        ESECUTORE = %s, HEARTBEAT_IL = CURRENT_TIMESTAMP
+        WHERE ID_LAVORO = %s AND STATO = 'in_coda'
+    """
+    SQL_PARAMS = "SELECT PARAMETRI FROM T_LAVORI WHERE ID_LAVORO = %s"
+    # Avanzamento, esito ed errore valgono solo se il lavoro è ancora di chi li scrive
+    # (un lavoro rimesso in coda e preso da un altro esecutore non si sovrascrive)
+    SQL_PROGRESS = """
+        UPDATE T_LAVORI SET FATTI = %s, HEARTBEAT_IL = CURRENT_TIMESTAMP
+        WHERE ID_LAVORO = %s AND ESECUTORE = %s AND STATO = 'in_corso'
+    """
+    # Su un lavoro completato ERRORE è una nota (es. attestati non convertiti in PDF)
+    SQL_FINISH = """
+        UPDATE T_LAVORI SET STATO = 'completato', FATTI = TOTALE, FILE_RISULTATO = %s, ERRORE = %s,
+        FINITO_IL = CURRENT_TIMESTAMP WHERE ID_LAVORO = %s AND ESECUTORE = %s
+    """
+    SQL_FAIL = """
+        UPDATE T_LAVORI SET STATO = 'errore', ERRORE = %s, FINITO_IL = CURRENT_TIMESTAMP
+        WHERE ID_LAVORO = %s AND ESECUTORE = %s
+    """
+    SQL_HEARTBEAT = "UPDATE T_LAVORI SET HEARTBEAT_IL = CURRENT_TIMESTAMP WHERE STATO = 'in_corso' AND ESECUTORE = %s"
+    SQL_REQUEUE_SET = "UPDATE T_LAVORI SET STATO = 'in_coda', FATTI = 0, AVVIATO_IL = NULL, ESECUTORE = NULL, HEARTBEAT_IL = NULL"
+    # Lavori di questo esecutore che si ferma: tornano subito in coda
+    SQL_RELEASE = f"{SQL_REQUEUE_SET} WHERE STATO = 'in_corso' AND ESECUTORE = %s"
+
+    ERROR_MAX_LEN = 1000
+
+    @staticmethod
+    def _map_row(r):
+        return {
+            'ID_LAVORO': r[0], 'TIPO': r[1], 'STATO': r[2], 'UTENTE': r[3],
+            'TOTALE': r[4] or 0, 'FATTI': r[5] or 0, 'FILE_RISULTATO': r[6], 'ERRORE': r[7],
+            'CREATO_IL': r[8], 'AVVIATO_IL': r[9], 'FINITO_IL': r[10],
+            'POSIZIONE': (r[11] + 1) if r[2] == JOB_QUEUED else None,
+        }
+
+    @staticmethod
+    def _sql_for_user(limit):
+        return get_backend().dialect.paginate(JobRepo.SQL_FOR_USER, limit, 0)
+
+    @staticmethod
+    def _load_params(raw):
+        return json.loads(raw) if raw else {}
+
+    @staticmethod
+    def _sql_requeue_stale(stale_seconds):
+        """
+        Lavori 'in_corso' il cui esecutore non dà segni di vita da stale_seconds (processo morto
+        o riavviato): tornano in coda e ripartono da capo. Quelli di un esecutore vivo, anche di
+        un'altra istanza dell'app, restano dove sono. Il confronto usa l'orologio del database.
+        """
+        limit = get_backend().dialect.add_seconds('CURRENT_TIMESTAMP', -int(stale_seconds))
+        return (f"{JobRepo.SQL_REQUEUE_SET} WHERE STATO = 'in_corso' "
+                f"AND (HEARTBEAT_IL IS NULL OR HEARTBEAT_IL < {limit})")
+
+    # --- API sincrona ---
+    @staticmethod
+    def create(tipo, utente, parametri, totale):
+        """Mette in coda un lavoro. parametri: dizionario serializzabile in JSON. Restituisce l'ID o None."""
+        try:
+            job_id = get_backend().next_value(JobRepo.SEQUENCE)
+            get_backend().execute(JobRepo.SQL_INSERT, (job_id, tipo, JOB_QUEUED, utente,
+                                                       json.dumps(parametri, default=str), totale))
+            return job_id
+        except Exception as e:
+            logger.error(f"Errore creazione lavoro: {e}")
+            return None
+
+    @staticmethod
+    def get(job_id):
+        row = get_backend().fetchone(JobRepo.SQL_GET, (job_id,))
+        return JobRepo._map_row(row) if row else None
+
+    @staticmethod
+    def list_for_user(utente, limit=5):
+        try:
+            return [JobRepo._map_row(r) for r in get_backend().fetchall(JobRepo._sql_for_user(limit), (utente,))]
+        except Exception as e:
+            logger.error(f"Errore lista lavori: {e}")
+            return []
+
+    @staticmethod
+    def claim_next(runner_id):
+        """Prende il prossimo lavoro in coda: (job, parametri) oppure None se la coda è vuota."""
+        backend = get_backend()
+        while True:
+            row = backend.fetchone(JobRepo.SQL_NEXT_QUEUED)
+            if not row or row[0] is None:
+                return None
+            if backend.execute(JobRepo.SQL_CLAIM, (runner_id, row[0])) == 1:
+                raw = backend.fetchone(JobRepo.SQL_PARAMS, (row[0],))[0]
+                return JobRepo.get(row[0]), JobRepo._load_params(raw)
+
+    @staticmethod
+    def set_progress(job_id, runner_id, fatti):
+        return get_backend().execute(JobRepo.SQL_PROGRESS, (fatti, job_id, runner_id))
+
+    @staticmethod
+    def finish(job_id, runner_id, file_risultato, nota=None):
+        """Restituisce 0 se il lavoro non è più di runner_id (rimesso in coda nel frattempo)."""
+        return get_backend().execute(JobRepo.SQL_FINISH, (file_risultato, nota, job_id, runner_id))
+
+    @staticmethod
+    def fail(job_id, runner_id, errore):
+        return get_backend().execute(JobRepo.SQL_FAIL, (str(errore)[:JobRepo.ERROR_MAX_LEN], job_id, runner_id))
+
+    @staticmethod
+    def heartbeat(runner_id):
+        return get_backend().execute(JobRepo.SQL_HEARTBEAT, (runner_id,))
+
+    @staticmethod
+    def requeue_stale(stale_seconds):
+        return get_backend().execute(JobRepo._sql_requeue_stale(stale_seconds))
+
+    @staticmethod
+    def release(runner_id):
+        return get_backend().execute(JobRepo.SQL_RELEASE, (runner_id,))
+
+# --- HELPERS RICERCA E DATI ---
+def _sql_user_details(search_term: str):
+    # Prepariamo la query base
+    sql = """
+        SELECT s.CODICE_FISCALE, s.COGNOME, s.NOME, s.DATA_NASCITA, s.LUOGO_NASCITA, e.DESCRIZIONE
+        FROM T_SOGGETTI s
+        LEFT JOIN T_ENTI e ON s.ID_ENTE_FK = e.ID_ENTE
+        WHERE
+    """
+
+    # RICERCA_NORM (migrazione 8): parole senza accenti (copre "Di Marco", "Rossi Mario", "D'Angelo")
+    if _normalized_search():
+        condition, params = _name_search(search_term, 's.')
+        return sql + " " + condition, params
+
+    params = []
+    conditions = []
+
+    # 1. CERCA LA FRASE INTERA (Risolve il caso "Di Marco")
+    # Cerca se l'intera stringa digitata corrisponde all'inizio di un Cognome, Nome o CF
+    full_pattern = search_term + '%'
+    conditions.append(f"({_ilike('s.COGNOME')} OR {_ilike('s.NOME')} OR {_ilike('s.CODICE_FISCALE')})")
+    params.extend([full_pattern, full_pattern, full_pattern])
+
+    # 2. CERCA LE PAROLE SPEZZATE (Risolve il caso "Rossi Mario")
+    # Solo se ci sono almeno due parole separate da spazio
+    parts = search_term.split()
+    if len(parts) >= 2:
+        p1 = parts[0] + '%'
+        p2 = parts[1] + '%'
+        # Cerca: (Cognome=Parola1 E Nome=Parola2) OPPURE (Cognome=Parola2 E Nome=Parola1)
+        conditions.append(f"(({_ilike('s.COGNOME')} AND {_ilike('s.NOME')}) OR ({_ilike('s.COGNOME')} AND {_ilike('s.NOME')}))")
+        params.extend([p1, p2, p2, p1])
+
+    # Unisce le due logiche con "OR" (trova o l'uno o l'altro)
+    sql += " (" + " OR ".join(conditions) + ")"
+    return sql, tuple(params)
+
+def _map_user_details(r):
+    return {
+        "CODICE_FISCALE": r[0], "COGNOME": r[1], "NOME": r[2],
+        "DATA_NASCITA": r[3], "LUOGO_NASCITA": r[4], "SOCIETA": r[5] if r[5] else ""
+    }
+
+@timed("get_user_details_from_db_sync")
+def get_user_details_from_db_sync(search_term: str):
+    search_term = search_term.strip()
+    if not search_term: return []
+    try:
+        rows = get_backend().fetchall(*_sql_user_details(search_term))
+        return [_map_user_details(r) for r in rows]
+    except Exception as e:
+        print(f"Errore ricerca: {e}")
+        return []
+
+# Recuperiamo TUTTI i campi, incluso TEMPLATE_FILE (che è il 6° campo, indice 5)
+SQL_CORSI_LIST = "SELECT ID_CORSO, NOME_CORSO, ORE_DURATA, CODICE_BREVE, PROGRAMMA, TEMPLATE_FILE FROM T_CORSI ORDER BY NOME_CORSO"
+
+def _map_corsi_rows(rows):
+    return [{
+        "id": r[0],
+        "nome": r[1],
+        "ore": r[2],
+        "codice": r[3],
+        "programma": r[4] if r[4] else "",
+        "template": r[5] if r[5] else "modello.docx"
+    } for r in rows]
+
+@timed("get_corsi_from_db_sync")
+def get_corsi_from_db_sync():
+    try:
+        return _map_corsi_rows(get_backend().fetchall(SQL_CORSI_LIST))
+    except Exception as e:
+        print(f"Err Get Corsi: {e}")
+        logger.error(f"Errore critico durante la lettura del CorsoRepo: {e}")
+        return []
+
+# --- MODIFICA QUI: Usiamo DATA_CREAZIONE invece di DATA_SVOLGIMENTO ---
+# (query "CountAttestatiOggi" in queries.json)
+
+@timed("get_count_attestati_oggi_sync")
+def get_count_attestati_oggi_sync():
+    """Conta gli attestati GENERATI oggi (Data Creazione)"""
+    try:
+        row = get_backend().query_one('CountAttestatiOggi')
+        return row[0] if row else 0
+    except Exception as e:
+        print(f"Err Count Oggi: {e}")
+        return 0
+
+# --- LOGIN ---
+# (query "LoginHash" in queries.json)
+
+def _verify_password(username, plain_password, row):
+    """Verifica bcrypt dell'hash letto dal DB (CPU-bound: va fatta fuori dalla connessione)."""
+    if row:
+        logger.info("Utente TROVATO nel database")
+        stored_hash = row[0]
+
+        # Debug dell'hash (stampiamo solo i primi caratteri per sicurezza)
+        logger.debug(f"Hash nel DB (primi 10 car): {str(stored_hash)[:10]}...")
+
+        # Conversione se necessario
+        if isinstance(stored_hash, str):
+            stored_hash = stored_hash.encode('utf-8')
+
+        # Verifica
+        if bcrypt.checkpw(plain_password.encode('utf-8'), stored_hash):
+            logger.info("Accesso consentito")
+            return True
+        else:
+            logger.warning("PASSWORD ERRATA! Il controllo bcrypt ha fallito")
+    else:
+        logger.info(f"Utente : '{username}' NON TROVATO nella tabella T_AUTENTICAZIONE")
+
+    return False
+
+@timed("check_user_credentials_sync")
+def check_user_credentials_sync(username, plain_password):
+    logger.debug(f"Tentativo di accesso per utente '{username}'")
+    try:
+        row = get_backend().query_one('LoginHash', (username,))
+        # La verifica bcrypt è lenta: la facciamo dopo aver restituito la connessione al pool
+        return _verify_password(username, plain_password, row)
+    except Exception as e:
+        logger.warning(f" Errore grave!! {e}")
+        return False
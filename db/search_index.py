@@ -0,0 +1,228 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+
+# --- INDICE DI RICERCA DEI SOGGETTI (in memoria) ---
+# La ricerca dei soggetti (dialog di creaattestati, gestioneutenti) si fa qui invece che su
+# T_SOGGETTI: chiavi ordinate, maiuscole e senza accenti (COGNOME, NOME, CF e le singole parole
+# di cognome e nome) e ricerca per prefisso con bisect, in microsecondi.
+# Si carica all'avvio (UserRepo.load_search_index) e UserRepo.upsert/delete lo aggiornano
+# a ogni scrittura. Le modifiche fatte da altri processi (es. l'app Firebird) arrivano con
+# il ricaricamento periodico (config "search": {"refresh_seconds": ...}).
+# Finché non è caricato, i repository cercano sul database come prima.
+# Serve dove anche il database cerca per prefisso (Firebird, PostgreSQL senza migrazione 8):
+# con RICERCA_NORM la ricerca per somiglianza la fa sempre il database (UserRepo.uses_search_index).
+
+# Lettere latine con segni diacritici (Latin-1, Latin Extended-A/B, Latin Extended Additional)
+# la cui scomposizione NFKD è una sola lettera ASCII più gli accenti: "ò" -> "o", "š" -> "s".
+# Più alcune lettere senza scomposizione ma con una base ovvia ("ł" -> "l", "ø" -> "o");
+# le altre ("ß", "æ", ...) restano come sono e diventano separatori. La stessa tabella
+# genera la translate() di wsm_normalizza su PostgreSQL (migrazione 8): i due lati coincidono.
+_FOLD_RANGES = ((0x00C0, 0x024F), (0x1E00, 0x1EFF))
+_FOLD_EXTRA = ('ŁłØøĐđĦħıĿŀŦŧ', 'LlOoDdHhiLlTt')
+
+
+def _fold_table():
+    accented, plain = [], []
+    for first, last in _FOLD_RANGES:
+        for code in range(first, last + 1):
+            c = chr(code)
+            base = ''.join(x for x in unicodedata.normalize('NFKD', c) if not unicodedata.combining(x))
+            if len(base) == 1 and base.isascii() and base.isalnum():
+                accented.append(c)
+                plain.append(base)
+    for c, base in zip(*_FOLD_EXTRA):
+        if c not in accented:
+            accented.append(c)
+            plain.append(base)
+    return ''.join(accented), ''.join(plain)
+
+
+FOLD_FROM, FOLD_TO = _fold_table()
+_FOLD = str.maketrans(FOLD_FROM, FOLD_TO)
+
+# Tutto ciò che non è lettera o cifra ASCII separa le parole ("D'ANGELO" -> D ANGELO).
+# Il maiuscolo si fa dopo, quando restano solo caratteri ASCII (Python e PostgreSQL
+# non mettono in maiuscolo allo stesso modo gli altri: "ß" -> "SS" solo in Python)
+_SEPARATORS_RE = re.compile(r"[^A-Za-z0-9]+")
+
+DEFAULT_REFRESH_SECONDS = 300
+
+
+def fold_text(text):
+    """
+    Testo confrontabile: maiuscolo, senza accenti, parole di sole lettere e cifre separate
+    da uno spazio ("Niccolò D'Angelo" -> "NICCOLO D ANGELO"). È la stessa normalizzazione
+    di wsm_normalizza su PostgreSQL (migrazione 8).
+    """
+    return _SEPARATORS_RE.sub(' ', (text or '').translate(_FOLD)).strip().upper()
+
+
+_normalize = fold_text
+
+
+def _words(text):
+    return text.split()
+
+
+class SubjectIndex:
+    """
+    Righe dei soggetti (come UserRepo._map_row) cercabili per prefisso.
+    search("Di Marco"): frase intera all'inizio di cognome, nome o CF;
+    search("Rossi Mario"): ogni parola all'inizio di una parola di cognome o nome, in qualsiasi ordine.
+    """
+    def __init__(self, refresh_seconds=DEFAULT_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._rows = {}       # ID_UTENTE -> riga
+        self._entries = {}    # ID_UTENTE -> chiavi della riga
+        self._keys = []       # (chiave, ID_UTENTE) ordinate
+        self._changes = None  # scritture arrivate durante un caricamento: {id: riga | None}
+
+    # --- Stato ---
+    @property
+    def ready(self):
+        return self.loaded_at is not None
+
+    def expired(self):
+        return (self.ready and bool(self.refresh_seconds)
+                and time.monotonic() - self.loaded_at > self.refresh_seconds)
+
+    def __len__(self):
+        return len(self._rows)
+
+    # --- Caricamento ---
+    def begin_load(self):
+        """Da chiamare PRIMA di leggere T_SOGGETTI: le scritture nel frattempo non vanno perse."""
+        with self._lock:
+            self._changes = {}
+
+    def load(self, rows):
+        """Sostituisce il contenuto con le righe lette (poi riapplica le scritture intervenute)."""
+        entries = {r['ID_UTENTE']: self._row_keys(r) for r in rows}
+        keys = sorted((k, uid) for uid, row_keys in entries.items() for k in row_keys)
+        with self._lock:
+            self._rows = {r['ID_UTENTE']: r for r in rows}
+            self._entries = entries
+            self._keys = keys
+            changes, self._changes = self._changes or {}, None
+            for uid, row in changes.items():
+                self._remove(uid)
+                if row is not None:
+                    self._add(row)
+            self.loaded_at = time.monotonic()
+
+    def cancel_load(self):
+        """Caricamento fallito: si tiene il contenuto di prima."""
+        with self._lock:
+            self._changes = None
+
+    def clear(self):
+        with self._lock:
+            self._rows, self._entries, self._keys = {}, {}, []
+            self._changes = None
+            self.loaded_at = None
+
+    # --- Scritture (write-through dai repository) ---
+    def put(self, row):
+        with self._lock:
+            if self._changes is not None:
+                self._changes[row['ID_UTENTE']] = row
+            self._remove(row['ID_UTENTE'])
+            self._add(row)
+
+    def remove(self, uid):
+        with self._lock:
+            if self._changes is not None:
+                self._changes[uid] = None
+            self._remove(uid)
+
+    @staticmethod
+    def _row_keys(row):
+        fields = [_normalize(row.get(f)) for f in ('COGNOME', 'NOME', 'CODICE_FISCALE')]
+        keys = {f for f in fields if f}
+        for f in fields[:2]:
+            keys.update(_words(f))
+            # "D ANGELO" si trova anche scrivendo "DANGELO"
+            keys.add(f.replace(' ', ''))
+        keys.discard('')
+        return keys
+
+    def _add(self, row):
+        uid = row['ID_UTENTE']
+        row_keys = self._row_keys(row)
+        self._rows[uid] = row
+        self._entries[uid] = row_keys
+        for k in row_keys:
+            bisect.insort(self._keys, (k, uid))
+
+    def _remove(self, uid):
+        self._rows.pop(uid, None)
+        for k in self._entries.pop(uid, ()):
+            i = bisect.bisect_left(self._keys, (k, uid))
+            if i < len(self._keys) and self._keys[i] == (k, uid):
+                del self._keys[i]
+
+    # --- Ricerca ---
+    def _prefixed(self, prefix):
+        """ID con almeno una chiave che inizia per prefix."""
+        ids = set()
+        i = bisect.bisect_left(self._keys, (prefix,))
+        while i < len(self._keys) and self._keys[i][0].startswith(prefix):
+            ids.add(self._keys[i][1])
+            i += 1
+        return ids
+
+    @staticmethod
+    def _rank(row, phrase):
+        """0 = cognome o CF uguali alla ricerca, 1 = iniziano con essa, 2 = il nome inizia con essa, 3 = parole."""
+        cognome, nome, cf = (_normalize(row.get(f)) for f in ('COGNOME', 'NOME', 'CODICE_FISCALE'))
+        if phrase in (cognome, cf):
+            return 0
+        if cognome.startswith(phrase) or cf.startswith(phrase):
+            return 1
+        return 2 if nome.startswith(phrase) else 3
+
+    @staticmethod
+    def _sort_key(row):
+        return (row['COGNOME'] or '').upper(), (row['NOME'] or '').upper(), row['ID_UTENTE']
+
+    def search_ids(self, term, solo_docenti=False, limit=None, ranked=False):
+        """
+        ID dei soggetti trovati, in ordine di cognome e nome.
+        ranked: prima le corrispondenze migliori (vedi _rank), poi cognome e nome.
+        """
+        phrase = _normalize(term)
+        if not phrase:
+            return []
+        with self._lock:
+            found = self._prefixed(phrase)
+            words = _words(phrase)
+            if len(words) > 1:
+                by_word = None
+                for w in words:
+                    by_word = self._prefixed(w) if by_word is None else by_word & self._prefixed(w)
+                    if not by_word:
+                        break
+                found |= by_word or set()
+            rows = [self._rows[uid] for uid in found]
+        if solo_docenti:
+            rows = [r for r in rows if r['IS_DOCENTE']]
+        key = (lambda r: (self._rank(r, phrase),) + self._sort_key(r)) if ranked else self._sort_key
+        # Con un limite basta selezionare i primi, senza ordinare tutto
+        rows = heapq.nsmallest(limit, rows, key=key) if limit is not None else sorted(rows, key=key)
+        return [r['ID_UTENTE'] for r in rows]
+
+    def search(self, term, solo_docenti=False, limit=None, ranked=False):
+        """Righe dei soggetti trovati (stesso formato di UserRepo.get_all)."""
+        ids = self.search_ids(term, solo_docenti, limit, ranked)
+        with self._lock:
+            return [self._rows[uid] for uid in ids if uid in self._rows]
+
+
+# Un indice per processo, come il Backend
+subject_index = SubjectIndex()
@@ -1,21 +1,37 @@
-import json
-import fdb
-import psycopg2
-import bcrypt
 import asyncio
 from nicegui import ui, app, run
 import os
-from docx import Document
-from datetime import datetime, date , timedelta
 import tempfile
-import shutil
 import zipfile
+from datetime import datetime, date
 import re
 import logging
-import csv
 import smtplib
+import sys
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from urllib.parse import urlencode
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+
+from db import (
+    get_backend,
+    UserRepo, AsyncUserRepo, AsyncAttestatiRepo, AsyncAuthRepo, AsyncCorsoRepo, AsyncEnteRepo,
+    allocate_session_numbers_async, get_corsi_async, get_count_attestati_oggi_async,
+    check_user_credentials_async, empty_page, stream_export, xlsx_available,
+    get_metrics_text, timed, AsyncJobRepo, JOB_DONE, JOB_FAILED, JOB_FINAL_STATES,
+    subject_index,
+)
+from db.search_index import DEFAULT_REFRESH_SECONDS
+from attestati import invalidate_template, ArtefactStore
+from attestati.artefatti import DEFAULT_STORE_DIR
+from attestati.jobs import (
+    JobRunner, JOB_TYPE_ATTESTATI, FORMAT_DOCX, FORMAT_PDF, HEARTBEAT_SECONDS, STALE_SECONDS, build_job_params,
+)
+from attestati.pdf import pdf_available
+from attestati.validazione import inspect_template, describe_problems, get_template_index
+from componenti import PagedTable, LiveSearch
 
 #-- LOGGING --
 logging.basicConfig(
@@ -26,953 +42,175 @@ logging.basicConfig(
 )
 logger = logging.getLogger()
 
+# psycopg 3 in modalità async non funziona con il ProactorEventLoop di Windows
+if sys.platform == 'win32':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 # --- LOG DI AVVIO ---
 logger.info("WorkSafeManager avviato!")
 
 # --- CONFIGURAZIONE ---
-try:
-    with open('config_postgres.json', 'r') as f:
-        config = json.load(f)
-except FileNotFoundError:
-    logger.error("ATTENZIONE: File config_postgres.json non trovato. Uso parametri di default.")
-    config = {
-        'host': 'localhost', 
-        'database': 'postgres',  
-        'user': 'postgres',
-        'password': 'abcd1234', 
-        'port': 5432
-    }
+# Il backend (Firebird / PostgreSQL) si legge dal file indicato da WSM_CONFIG
+# (default config_postgres.json). Le pagine qui sotto non dipendono dal database.
+backend = get_backend()
+logger.info(f"Backend database: {backend.name} ({backend.cfg['path']})")
 
-# --- DB CONNECTION ---
-def get_db_connection():
-    try:
-        return psycopg2.connect(**config)
-        
-    except psycopg2.Error as e:
-        logger.error(f"Errore durante la connessione a PostgreSQL: {e}")
-        return None
-
-# -- TEST CONNESSIONE -- 
+# -- TEST CONNESSIONE --
 if __name__ == "__main__":
-    conn = get_db_connection()
-    if conn:
-        logger.info("Connessione a PostgresSQL riuscita")
-        conn.close()
-
-# --- HELPERS CALCOLO SESSIONI ---
-def get_next_session_number_sync(id_corso, data_svolgimento: date):
-    """
-    Conta le sessioni (date distinte) per QUESTO specifico corso (id_corso)
-    nello stesso mese/anno, precedenti alla data attuale.
-    """
-    conn = None
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        mese = data_svolgimento.month
-        anno = data_svolgimento.year
-        
-        # Conta le date distinte per QUESTO corso in QUESTO mese
-        sql = """
-    SELECT COUNT(DISTINCT DATA_SVOLGIMENTO) 
-    FROM T_ATTESTATI 
-    WHERE ID_CORSO_FK = %s 
-    AND EXTRACT(MONTH FROM DATA_SVOLGIMENTO) = %s 
-    AND EXTRACT(YEAR FROM DATA_SVOLGIMENTO) = %s
-    AND DATA_SVOLGIMENTO < %s
-"""
-
-# Nota importante: i parametri devono essere passati nell'ordine esatto dei %s
-        cur.execute(sql, (id_corso, mese, anno, data_svolgimento))
-        row = cur.fetchone()
-        count_prev = row[0] if row else 0
-        
-        return count_prev + 1
-        
-    except Exception as e:
-        logger.info(f"Errore calcolo sessione: {e}")
-        return 1 
-    finally:
-        if conn: conn.close()
-
-# --- REPOSITORY SOGGETTI ---
-class UserRepo:
-    @staticmethod
-    def get_all(search_term='', solo_docenti=False):
-        """
-        Recupera utenti con il nuovo ID univoco.
-        """
-        conn = None
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            
-            # <<< MODIFICA 1: Selezioniamo l'ID come primo campo
-            # Assumo che la colonna PK si chiami ID_SOGGETTO
-            sql = """
-                SELECT ID_SOGGETTO, CODICE_FISCALE, COGNOME, NOME, 
-                       DATA_NASCITA, LUOGO_NASCITA, ID_ENTE_FK, IS_DOCENTE 
-                FROM T_SOGGETTI
-            """
-            
-            conditions = []
-            params = []
-            
-            # Filtro Ricerca (Search)
-            if search_term:
-                term = search_term.upper()
-                # La ricerca testuale funziona ancora anche sul CF se presente
-                conditions.append("(UPPER(COGNOME) ILIKE %s OR UPPER(NOME) ILIKE %s OR UPPER(CODICE_FISCALE) ILIKE %s)")
-                params.extend([term, term, term])
-            
-            # Filtro Docente
-            if solo_docenti:
-                conditions.append("IS_DOCENTE = 1")
-            
-            if conditions:
-                sql += " WHERE " + " AND ".join(conditions)
-            
-            sql += " ORDER BY COGNOME, NOME"
-            
-            cur.execute(sql, tuple(params))
-            rows = cur.fetchall()
-            
-            result = []
-            for r in rows:
-                # Gestione Data
-                d_nascita = r[4] # <<< Nota: gli indici sono shiftati di +1 perché c'è l'ID all'inizio
-                if isinstance(d_nascita, (date, datetime)):
-                    d_nascita = d_nascita.strftime('%Y-%m-%d')
-                elif d_nascita is None:
-                    d_nascita = ''
-                
-                result.append({
-                    # <<< MODIFICA: Mappiamo l'ID del DB nel campo ID_UTENTE usato dalla UI
-                    'ID_UTENTE': r[0],       # ID_SOGGETTO
-                    'CODICE_FISCALE': r[1],  # Ora può essere None
-                    'COGNOME': r[2], 
-                    'NOME': r[3],
-                    'DATA_NASCITA': str(d_nascita), 
-                    'LUOGO_NASCITA': r[5], 
-                    'ID_ENTE_FK': r[6],
-                    'IS_DOCENTE': bool(r[7])
-                })
-            return result
-        except Exception as e:
-            print(f"Err UserRepo: {e}")
-            return []
-        finally:
-            if conn: conn.close()
-
-    @staticmethod
-    def upsert(data, is_new=True):
-        conn = None
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            
-            # 1. FIX DATA NASCITA
-            dt_nascita = None
-            raw_data = str(data.get('DATA_NASCITA', '')).strip()
-            if raw_data and raw_data != 'None':
-                try:
-                    if '-' in raw_data:
-                        dt_nascita = datetime.strptime(raw_data, '%Y-%m-%d').date()
-                    elif '/' in raw_data:
-                        dt_nascita = datetime.strptime(raw_data, '%d/%m/%Y').date()
-                except ValueError: pass
-            
-            # 2. FIX ID ENTE
-            id_ente_val = str(data.get('ID_ENTE_FK', '')).strip()
-            if not id_ente_val or id_ente_val == 'None': 
-                id_ente_val = None 
-
-            # 3. GESTIONE CF NULLABLE
-            # Se il CF è vuoto, salviamo NULL (None in Python) nel DB
-            cf_val = data.get('CODICE_FISCALE', '').strip().upper()
-            if not cf_val:
-                cf_val = None
-
-            # 4. GESTIONE DOCENTE
-            is_doc = 1 if data.get('IS_DOCENTE') else 0
-
-            if is_new:
-                # <<< INSERT: Non passiamo l'ID, lo genera il DB
-                sql = """
-                    INSERT INTO T_SOGGETTI 
-                    (CODICE_FISCALE, COGNOME, NOME, DATA_NASCITA, LUOGO_NASCITA, ID_ENTE_FK, IS_DOCENTE) 
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """
-                params = (cf_val, data['COGNOME'], data['NOME'], dt_nascita, data['LUOGO_NASCITA'], id_ente_val, is_doc)
-            else:
-                # <<< UPDATE: Usiamo l'ID per trovare la riga, NON il CF
-                sql = """
-                    UPDATE T_SOGGETTI 
-                    SET CODICE_FISCALE=%s, COGNOME=%s, NOME=%s, DATA_NASCITA=%s, 
-                        LUOGO_NASCITA=%s, ID_ENTE_FK=%s, IS_DOCENTE=%s 
-                    WHERE ID_SOGGETTO=%s
-                """
-                # Recuperiamo l'ID passato dalla UI
-                id_row = data['ID_UTENTE']
-                params = (cf_val, data['COGNOME'], data['NOME'], dt_nascita, data['LUOGO_NASCITA'], id_ente_val, is_doc, id_row)
-            
-            cur.execute(sql, params)
-            conn.commit()
-            return True, "Salvataggio completato."
-            
-        except fdb.IntegrityError as e:
-            # Gestione errore duplicati (magari un CF duplicato se inserito)
-            return False, f"Errore integrità dati (es. CF già presente): {e}"
-        except Exception as e:
-            return False, f"Errore DB: {str(e)}"
-        finally:
-            if conn: conn.close()
-
-    @staticmethod
-    def delete(id_utente):
-        """
-        Elimina per ID, non per CF
-        """
-        conn = None
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            # <<< MODIFICA: Delete WHERE ID_SOGGETTO
-            cur.execute("DELETE FROM T_SOGGETTI WHERE ID_SOGGETTO = %s", (id_utente,))
-            conn.commit()
-            return True, "Eliminato"
-        except Exception as e: 
-            return False, str(e)
-        finally:
-            if conn: conn.close()
-            
-    @staticmethod
-    def get_select_options():
-        """
-        Restituisce un dizionario {ID: 'Cognome Nome (CF)'} 
-        da usare nelle ui.select
-        """
-        conn = None
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            # Selezioniamo ID, Cognome, Nome e CF (per visualizzazione)
-            sql = "SELECT ID_SOGGETTO, COGNOME, NOME, CODICE_FISCALE FROM T_SOGGETTI ORDER BY COGNOME, NOME"
-            cur.execute(sql)
-            rows = cur.fetchall()
-            
-            options = {}
-            for r in rows:
-                id_sogg = r[0]
-                cognome = r[1]
-                nome = r[2]
-                cf = r[3] if r[3] else "No CF"
-                # Crea l'etichetta leggibile
-                options[id_sogg] = f"{cognome} {nome} ({cf})"
-            
-            return options
-        except Exception as e:
-            print(f"Err options: {e}")
-            return {}
-        finally:
-            if conn: conn.close()
-
-# --- REPOSITORY ATTESTATI ---
-class AttestatiRepo:
-    @staticmethod
-    def get_history(search='', start_date=None, end_date=None):
-        """
-        Recupera lo storico unendo t_attestati, t_soggetti e t_corsi.
-        JOIN aggiornata per usare ID_SOGGETTO invece del CF.
-        """
-        conn = None
-        results = []
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # <<< MODIFICA: La JOIN ora usa ID_SOGGETTO
-            query = """
-                SELECT 
-                    a.id_attestato,
-                    a.data_svolgimento,
-                    s.codice_fiscale,
-                    s.cognome,
-                    s.nome,
-                    c.nome_corso
-                FROM public.t_attestati a
-                JOIN public.t_soggetti s ON a.ID_SOGGETTO = s.ID_SOGGETTO
-                JOIN public.t_corsi c ON a.id_corso_fk = c.id_corso
-                WHERE 1=1
-            """
-            
-            params = []
-            
-            # Filtro Ricerca (Cerca ancora per testo su Cognome/Nome/CF recuperati dalla join)
-            if search:
-                term = f"%{search.lower()}%"
-                query += """ AND (
-                    LOWER(s.cognome) LIKE %s OR 
-                    LOWER(s.nome) LIKE %s OR 
-                    LOWER(s.codice_fiscale) LIKE %s OR
-                    LOWER(c.nome_corso) LIKE %s
-                )"""
-                params.extend([term, term, term, term])
-            
-            # Filtri Date
-            if start_date:
-                query += " AND a.data_svolgimento >= %s"
-                params.append(start_date)
-            if end_date:
-                query += " AND a.data_svolgimento <= %s"
-                params.append(end_date)
-                
-            query += " ORDER BY a.data_svolgimento DESC"
-            
-            cursor.execute(query, tuple(params))
-            rows = cursor.fetchall()
-            
-            # Mappatura risultati per la UI
-            for row in rows:
-                data_svol = row[1]
-                
-                # Calcolo scadenza (Esempio: 5 anni)
-                try:
-                    scadenza = data_svol.replace(year=data_svol.year + 5)
-                except:
-                    scadenza = None
-
-                results.append({
-                    'ID': row[0],
-                    'DATA_EMISSIONE': data_svol,
-                    'CORSISTA': f"{row[3]} {row[4]}", # Cognome + Nome
-                    'CF': row[2] if row[2] else "-",  # Gestiamo il caso CF nullo
-                    'CORSO': row[5],
-                    'SCADENZA': scadenza
-                })
-                
-        except Exception as e:
-            print(f"Errore AttestatiRepo: {e}")
-        finally:
-            if conn: conn.close()
-            
-        return results
-    
-    @staticmethod
-    def insert_attestato(id_soggetto, id_corso, data_svolgimento):
-        """
-        Salva un nuovo attestato.
-        <<< MODIFICA: Accetta id_soggetto (INT) invece di cf (STR)
-        """
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # <<< MODIFICA: Scrive nella colonna ID_SOGGETTO
-            query = """
-                INSERT INTO public.t_attestati 
-                (ID_SOGGETTO, id_corso_fk, data_svolgimento)
-                VALUES (%s, %s, %s)
-            """
-            # id_soggetto qui deve essere un NUMERO
-            cursor.execute(query, (id_soggetto, id_corso, data_svolgimento))
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"Errore Insert Attestato: {e}")
-            if conn: conn.rollback()
-            return False
-        finally:
-            if conn: conn.close()
-
-# --- REPOSITORY AUTENTICAZIONE ---
-class AuthRepo:
-    @staticmethod
-    def get_all_users():
-        """Recupera tutti gli utenti di sistema (senza password hash)"""
-        conn = None
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute("SELECT USERNAME, RUOLO FROM T_AUTENTICAZIONE ORDER BY USERNAME")
-            rows = cur.fetchall()
-            return [{'USERNAME': r[0], 'RUOLO': r[1]} for r in rows]
-        except Exception as e:
-            print(f"Err AuthRepo.get_all: {e}")
-            return []
-        finally:
-            if conn: conn.close()
-
-    @staticmethod
-    def create_user(username, password_clear, role='user'):
-        """Crea un nuovo utente con password criptata"""
-        conn = None
-        try:
-            # 1. Cripta la password
-            pwd_hash = bcrypt.hashpw(password_clear.encode('utf-8'), bcrypt.gensalt())
-            
-            conn = get_db_connection()
-            cur = conn.cursor()
-            
-            sql = "INSERT INTO T_AUTENTICAZIONE (USERNAME, PASSWORD_HASH, RUOLO) VALUES (%s, %s, %s)"
-            cur.execute(sql, (username, pwd_hash.decode('utf-8'), role))
-            conn.commit()
-            return True, "Utente creato con successo."
-        except psycopg2.IntegrityError:
-            return False, "Errore: Username già esistente."
-            logger.info("Errore: Username già esistente")
-        except Exception as e:
-            return False, f"Errore DB: {str(e)}"
-        finally:
-            if conn: conn.close()
-
-    @staticmethod
-    def delete_user(username):
-        """Elimina un utente"""
-        conn = None
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute("DELETE FROM T_AUTENTICAZIONE WHERE USERNAME = %s", (username,))
-            conn.commit()
-            return True
-        except Exception: return False
-        finally:
-            if conn: conn.close()
-
-class CorsoRepo:
-    @staticmethod
-    def get_all(search=''):
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # SELECT che include validita_anni
-            query = """
-                SELECT id_corso, nome_corso, ore_durata, codice_breve, programma, template_file, validita_anni
-                FROM public.t_corsi
-            """
-            params = []
-            if search:
-                query += " WHERE nome_corso ILIKE %s OR codice_breve ILIKE %s"
-                term = f"%{search}%"
-                params = [term, term]
-            
-            query += " ORDER BY id_corso ASC"
-            cursor.execute(query, tuple(params))
-            
-            col_names = [desc[0].upper() for desc in cursor.description]
-            results = []
-            for row in cursor.fetchall():
-                results.append(dict(zip(col_names, row)))
-            return results
-        except Exception as e:
-            print(f"Errore CorsoRepo.get_all: {e}")
-            return []
-        finally:
-            if conn: conn.close()
-
-    @staticmethod
-    def get_next_id():
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COALESCE(MAX(id_corso), 0) + 1 FROM public.t_corsi")
-        res = cursor.fetchone()[0]
-        conn.close()
-        return res
-
-    @staticmethod
-    def upsert(data, is_new):
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Recuperiamo il valore SENZA default. Se manca è None -> DB NULL
-            val_anni = data.get('VALIDITA_ANNI') 
-
-            if is_new:
-                # INSERT
-                query = """
-                    INSERT INTO public.t_corsi 
-                    (id_corso, nome_corso, ore_durata, codice_breve, programma, template_file, validita_anni)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(query, (
-                    data['ID_CORSO'], data['NOME_CORSO'], data['ORE_DURATA'], 
-                    data['CODICE_BREVE'], data['PROGRAMMA'], data['TEMPLATE_FILE'],
-                    val_anni # Passa None se vuoto
-                ))
-                msg = "Corso creato"
-            else:
-                # UPDATE
-                query = """
-                    UPDATE public.t_corsi 
-                    SET nome_corso=%s, ore_durata=%s, codice_breve=%s, 
-                        programma=%s, template_file=%s, validita_anni=%s
-                    WHERE id_corso=%s
-                """
-                cursor.execute(query, (
-                    data['NOME_CORSO'], data['ORE_DURATA'], 
-                    data['CODICE_BREVE'], data['PROGRAMMA'], data['TEMPLATE_FILE'],
-                    val_anni, # Passa None se vuoto
-                    data['ID_CORSO']
-                ))
-                msg = "Corso aggiornato"
-            
-            conn.commit()
-            return True, msg
-        except Exception as e:
-            if conn: conn.rollback()
-            return False, str(e)
-        finally:
-            if conn: conn.close()
-
-    @staticmethod
-    def delete(id_corso):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM public.t_corsi WHERE id_corso = %s", (id_corso,))
-        conn.commit()
-        conn.close()
-        return True, "Eliminato"
-
-# --- REPOSITORY ENTI (COMPLETA) ---
-class EnteRepo:
-    @staticmethod
-    def get_all(search_term=''):
-        conn = None
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            
-            sql = "SELECT ID_ENTE, DESCRIZIONE, P_IVA FROM T_ENTI"
-            params = []
-            
-            if search_term:
-                term = search_term.upper()
-                sql += " WHERE UPPER(DESCRIZIONE) ILIKE %s OR UPPER(P_IVA) ILIKE %s OR CAST(ID_ENTE AS VARCHAR(50)) ILIKE %s"
-                params = [term, term, term]
-            
-            sql += " ORDER BY DESCRIZIONE"
-            
-            cur.execute(sql, tuple(params))
-            rows = cur.fetchall()
-            
-            # Restituisce la lista di dizionari
-            return [{'ID_ENTE': r[0], 'DESCRIZIONE': r[1], 'P_IVA': r[2]} for r in rows]
-            
-        except Exception as e:
-            print(f"Errore EnteRepo.get_all: {e}")
-            return []
-        finally:
-            if conn: conn.close()
-
-    @staticmethod
-    def get_next_id():
-        """Calcola il prossimo ID disponibile (MAX + 1)"""
-        conn = None
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute("SELECT MAX(ID_ENTE) FROM T_ENTI")
-            row = cur.fetchone()
-            max_id = row[0] if row and row[0] is not None else 0
-            return max_id + 1
-        except Exception as e:
-            print(f"Errore calcolo ID Ente: {e}")
-            return 1 
-        finally:
-            if conn: conn.close()
-
-    @staticmethod
-    def upsert(data, is_new=True):
-        conn = None
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            
-            if is_new:
-                sql = "INSERT INTO T_ENTI (ID_ENTE, DESCRIZIONE, P_IVA) VALUES (%s, %s, %s)"
-                params = (data['ID_ENTE'], data['DESCRIZIONE'], data['P_IVA'])
-            else:
-                sql = "UPDATE T_ENTI SET DESCRIZIONE=%s, P_IVA=%s WHERE ID_ENTE=%s"
-                params = (data['DESCRIZIONE'], data['P_IVA'], data['ID_ENTE'])
-            
-            cur.execute(sql, params)
-            conn.commit()
-            return True, "Salvataggio completato."
-            
-        except Exception as e:
-            return False, f"Errore DB: {str(e)}"
-        finally:
-            if conn: conn.close()
-
-    @staticmethod
-    def delete(id_ente):
-        conn = None
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute("DELETE FROM T_ENTI WHERE ID_ENTE = %s", (id_ente,))
-            conn.commit()
-            return True
-        except Exception:
-            return False
-        finally:
-            if conn: conn.close()
-
-    @staticmethod
-    def upsert(data, is_new=True):
-        conn = None
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            if is_new:
-                sql = "INSERT INTO T_ENTI (ID_ENTE, DESCRIZIONE, P_IVA) VALUES (%s, %s, %s)"
-                params = (data['ID_ENTE'], data['DESCRIZIONE'], data['P_IVA'])
-            else:
-                sql = "UPDATE T_ENTI SET DESCRIZIONE=%s, P_IVA=%s WHERE ID_ENTE=%s"
-                params = (data['DESCRIZIONE'], data['P_IVA'], data['ID_ENTE'])
-            cur.execute(sql, params)
-            conn.commit()
-            return True, "Salvataggio completato."
-        except Exception as e:
-            return False, f"Errore DB: {str(e)}"
-        finally:
-            if conn: conn.close()
-
-    @staticmethod
-    def delete(id_ente):
-        conn = None
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute("DELETE FROM T_ENTI WHERE ID_ENTE = %s", (id_ente,))
-            conn.commit()
-            return True
-        except Exception: return False
-        finally:
-            if conn: conn.close()
-
-    @staticmethod
-    def get_history(search='', start_date=None, end_date=None):
-        """
-        Recupera lo storico unendo t_attestati, t_soggetti e t_corsi.
-        """
-        conn = None
-        results = []
-        try:
-            # Usa la tua funzione di connessione che è già in questo file
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # QUERY CORRETTA PER LA TUA TABELLA t_attestati
-            query = """
-                SELECT 
-                    a.id_attestato,
-                    a.data_svolgimento,
-                    s.codice_fiscale,
-                    s.cognome,
-                    s.nome,
-                    c.nome_corso
-                FROM public.t_attestati a
-                JOIN public.t_soggetti s ON a.id_soggetto_fk = s.codice_fiscale
-                JOIN public.t_corsi c ON a.id_corso_fk = c.id_corso
-                WHERE 1=1
-            """
-            
-            params = []
-            
-            # Filtro Ricerca
-            if search:
-                term = f"%{search.lower()}%"
-                query += """ AND (
-                    LOWER(s.cognome) LIKE %s OR 
-                    LOWER(s.nome) LIKE %s OR 
-                    LOWER(s.codice_fiscale) LIKE %s OR
-                    LOWER(c.nome_corso) LIKE %s
-                )"""
-                params.extend([term, term, term, term])
-            
-            # Filtri Date
-            if start_date:
-                query += " AND a.data_svolgimento >= %s"
-                params.append(start_date)
-            if end_date:
-                query += " AND a.data_svolgimento <= %s"
-                params.append(end_date)
-                
-            query += " ORDER BY a.data_svolgimento DESC"
-            
-            cursor.execute(query, tuple(params))
-            rows = cursor.fetchall()
-            
-            # Mappatura risultati per la UI
-            for row in rows:
-                # I dati arrivano nell'ordine della SELECT
-                data_svol = row[1]
-                
-                # Calcolo scadenza (Esempio: 5 anni dopo lo svolgimento)
-                try:
-                    scadenza = data_svol.replace(year=data_svol.year + 5)
-                except:
-                    scadenza = None
-
-                results.append({
-                    'ID': row[0],
-                    'DATA_EMISSIONE': data_svol,
-                    'CORSISTA': f"{row[3]} {row[4]}", # Cognome + Nome
-                    'CF': row[2],
-                    'CORSO': row[5],
-                    'SCADENZA': scadenza
-                })
-                
-        except Exception as e:
-            print(f"Errore AttestatiRepo: {e}")
-        finally:
-            if conn: conn.close()
-            
-        return results
-
-# --- HELPERS RICERCA E DATI ---
-def get_user_details_from_db_sync(search_term: str):
-    search_term = search_term.strip()
-    if not search_term: return []
-    
-    # Prepariamo la query base
-    sql = """
-        SELECT s.CODICE_FISCALE, s.COGNOME, s.NOME, s.DATA_NASCITA, s.LUOGO_NASCITA, e.DESCRIZIONE 
-        FROM T_SOGGETTI s 
-        LEFT JOIN T_ENTI e ON s.ID_ENTE_FK = e.ID_ENTE
-        WHERE 
-    """
-    
-    params = []
-    conditions = []
-
-    # 1. CERCA LA FRASE INTERA (Risolve il caso "Di Marco")
-    # Cerca se l'intera stringa digitata corrisponde all'inizio di un Cognome, Nome o CF
-    full_pattern = search_term + '%'
-    conditions.append("(s.COGNOME ILIKE %s OR s.NOME ILIKE %s OR s.CODICE_FISCALE ILIKE %s)")
-    params.extend([full_pattern, full_pattern, full_pattern])
-
-    # 2. CERCA LE PAROLE SPEZZATE (Risolve il caso "Rossi Mario")
-    # Solo se ci sono almeno due parole separate da spazio
-    parts = search_term.split()
-    if len(parts) >= 2:
-        p1 = parts[0] + '%'
-        p2 = parts[1] + '%' 
-        # Cerca: (Cognome=Parola1 E Nome=Parola2) OPPURE (Cognome=Parola2 E Nome=Parola1)
-        conditions.append("((s.COGNOME ILIKE %s AND s.NOME ILIKE %s) OR (s.COGNOME ILIKE %s AND s.NOME ILIKE %s))")
-        params.extend([p1, p2, p2, p1])
-
-    # Unisce le due logiche con "OR" (trova o l'uno o l'altro)
-    sql += " (" + " OR ".join(conditions) + ")"
-    
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(sql, tuple(params))
-        rows = cur.fetchall()
-        conn.close()
-        return [{
-            "CODICE_FISCALE": r[0], "COGNOME": r[1], "NOME": r[2],
-            "DATA_NASCITA": r[3], "LUOGO_NASCITA": r[4], "SOCIETA": r[5] if r[5] else ""
-        } for r in rows]
+        with backend.connection():
+            logger.info(f"Connessione a {backend.name} riuscita")
     except Exception as e:
-        print(f"Errore ricerca: {e}")
-        return []
-
-def get_corsi_from_db_sync():
+        logger.error(f"Errore durante la connessione a {backend.name}: {e}")
+
+# --- CODA LAVORI (generazione in background) ---
+# I lotti di attestati girano nel JobRunner, non nel click della pagina: al massimo
+# jobs.max_concurrent alla volta, e un riavvio li riprende dalla tabella T_LAVORI.
+jobs_cfg = backend.cfg.get('jobs') or {}
+artefact_store = ArtefactStore(jobs_cfg.get('store_dir', DEFAULT_STORE_DIR))
+job_runner = JobRunner(run.cpu_bound,
+                       max_concurrent=jobs_cfg.get('max_concurrent', 1),
+                       output_dir=jobs_cfg.get('output_dir', 'exports'),
+                       keep_days=jobs_cfg.get('keep_days', 7),
+                       soffice=jobs_cfg.get('soffice'),
+                       store_dir=artefact_store.root,
+                       heartbeat_seconds=jobs_cfg.get('heartbeat_seconds', HEARTBEAT_SECONDS),
+                       stale_seconds=jobs_cfg.get('stale_seconds', STALE_SECONDS))
+
+# --- INDICE RICERCA SOGGETTI ---
+# Ricerca soggetti in memoria (db/search_index.py), ricaricata ogni search.refresh_seconds
+search_cfg = backend.cfg.get('search') or {}
+subject_index.refresh_seconds = search_cfg.get('refresh_seconds', DEFAULT_REFRESH_SECONDS)
+
+# --- CICLO DI VITA POOL ---
+async def on_app_startup():
+    await backend.open()
+    # Con la ricerca per somiglianza sul database (migrazione 8) l'indice non serve
+    if search_cfg.get('index', True) and UserRepo.uses_search_index():
+        n = await AsyncUserRepo.load_search_index()
+        logger.info(f"Indice ricerca soggetti: {n} soggetti")
+    await job_runner.start()
+
+async def on_app_shutdown():
+    await job_runner.stop()
+    await backend.close()
+
+app.on_startup(on_app_startup)
+app.on_shutdown(on_app_shutdown)
+
+# --- METRICHE (Prometheus) ---
+# Tempi delle query per operazione (archivio, scadenzario, generazione...), solo da localhost
+LOCAL_CLIENTS = ('127.0.0.1', '::1', 'localhost')
+
+@app.get('/metrics')
+async def metrics_route(request: Request):
+    if request.client is None or request.client.host not in LOCAL_CLIENTS:
+        raise HTTPException(status_code=403, detail="Metriche disponibili solo in locale")
+    return PlainTextResponse(get_metrics_text(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+# --- ESPORTAZIONI (download in streaming) ---
+# Il file non viene mai creato sul server: le righe passano dal cursore del DB
+# al browser a blocchi (vedi db/export.py).
+def _parse_export_date(value):
+    if not value:
+        return None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Recuperiamo TUTTI i campi, incluso TEMPLATE_FILE (che è il 6° campo, indice 5)
-        cur.execute("SELECT ID_CORSO, NOME_CORSO, ORE_DURATA, CODICE_BREVE, PROGRAMMA, TEMPLATE_FILE FROM T_CORSI ORDER BY NOME_CORSO")
-        rows = cur.fetchall()
-        conn.close()
-        
-        return [{
-            "id": r[0], 
-            "nome": r[1], 
-            "ore": r[2], 
-            "codice": r[3], 
-            "programma": r[4] if r[4] else "",
-            "template": r[5] if r[5] else "modello.docx" 
-        } for r in rows]
-        
-    except Exception as e:
-        print(f"Err Get Corsi: {e}")
-        logger.error(f"Errore critico durante la lettura del CorsoRepo: {e}")
-        return []
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Data non valida: {value}")
 
-def save_attestato_to_db_sync(cf, id_corso, data_str):
+@app.get('/export/{nome}')
+async def export_route(nome: str, formato: str = 'csv', search: str = '',
+                       date_start: str = '', date_end: str = '', solo_docenti: bool = False):
+    if not app.storage.user.get('authenticated', False):
+        raise HTTPException(status_code=401, detail="Accesso non autorizzato")
     try:
-        dt = None
-        if isinstance(data_str, (date, datetime)):
-            dt = data_str
-        elif re.search(r'\d{4}-\d{2}-\d{2}', str(data_str)):
-             dt = datetime.strptime(re.search(r'\d{4}-\d{2}-\d{2}', str(data_str)).group(0), '%Y-%m-%d').date()
-        elif re.search(r'\d{2}/\d{2}/\d{4}', str(data_str)):
-             dt = datetime.strptime(re.search(r'\d{2}/\d{2}/\d{4}', str(data_str)).group(0), '%d/%m/%Y').date()
-        data_val = dt if dt else date.today()
-        
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO T_ATTESTATI (ID_SOGGETTO_FK, ID_CORSO_FK, DATA_SVOLGIMENTO) VALUES (%s, %s, %s)", (cf, id_corso, data_val))
-        conn.commit()
-        conn.close()
-        return True
-    except Exception as e:
-        logger.error(f"Errore durante il salvataggio dell'Attestato: {e}", exc_info=True)
-        return False
-
-def get_count_attestati_oggi_sync():
-    """Conta gli attestati GENERATI oggi (Data Creazione)"""
-    conn = None
+        filename, media_type, body = stream_export(
+            nome, formato, search=search, solo_docenti=solo_docenti,
+            date_start=_parse_export_date(date_start), date_end=_parse_export_date(date_end),
+        )
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Esportazione sconosciuta: {nome}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(body, media_type=media_type,
+                             headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.get('/lavori/{id_lavoro}/download')
+async def job_download_route(id_lavoro: int):
+    if not app.storage.user.get('authenticated', False):
+        raise HTTPException(status_code=401, detail="Accesso non autorizzato")
+    job = await AsyncJobRepo.get(id_lavoro)
+    # Il lavoro di un altro utente risponde come inesistente: non si rivela nemmeno che c'è
+    if not job or job['UTENTE'] != app.storage.user.get('username') or job['STATO'] != JOB_DONE:
+        raise HTTPException(status_code=404, detail="Lavoro non trovato o non ancora completato")
+    path = job['FILE_RISULTATO']
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="File del lavoro non più disponibile")
+    return FileResponse(path, media_type='application/zip', filename=os.path.basename(path))
+
+# --- DOCUMENTI GENERATI (download e ristampa dall'archivio, senza rigenerare) ---
+DOCX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+# Attestati ristampabili in una volta sola
+REPRINT_MAX = 500
+REPRINT_CHUNK = 64 * 1024
+
+@app.get('/attestati/{id_attestato}/documento')
+async def attestato_document_route(id_attestato: int):
+    if not app.storage.user.get('authenticated', False):
+        raise HTTPException(status_code=401, detail="Accesso non autorizzato")
+    doc = (await AsyncAttestatiRepo.get_documents([id_attestato])).get(id_attestato)
+    if not doc or not artefact_store.exists(doc['HASH']):
+        raise HTTPException(status_code=404, detail="Documento non disponibile: va rigenerato")
+    return FileResponse(artefact_store.path(doc['HASH']), media_type=DOCX_MEDIA_TYPE,
+                        filename=doc['NOME_FILE'] or f"attestato_{id_attestato}.docx")
+
+def _reprint_zip(docs, missing):
+    """ZIP dei documenti già generati (in RAM fino a 8 MB, poi su disco)."""
+    buf = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    names = set()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED) as z:
+        for id_attestato, doc in docs.items():
+            name = doc['NOME_FILE'] or f"attestato_{id_attestato}.docx"
+            if name in names:
+                name = f"{os.path.splitext(name)[0]} ({id_attestato}).docx"
+            names.add(name)
+            z.write(artefact_store.path(doc['HASH']), name)
+        if missing:
+            z.writestr('non_disponibili.txt', "Attestati da rigenerare (nessun documento in archivio):\r\n"
+                       + "\r\n".join(str(i) for i in missing))
+    buf.seek(0)
+    return buf
+
+def _iter_file(f):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # --- MODIFICA QUI: Usiamo DATA_CREAZIONE invece di DATA_SVOLGIMENTO ---
-        cur.execute("SELECT COUNT(*) FROM T_ATTESTATI WHERE DATA_CREAZIONE = CURRENT_DATE")
-        
-        row = cur.fetchone()
-        return row[0] if row else 0
-    except Exception as e:
-        print(f"Err Count Oggi: {e}")
-        return 0
+        while chunk := f.read(REPRINT_CHUNK):
+            yield chunk
     finally:
-        if conn: conn.close()
+        f.close()
 
-def generate_certificate_sync(data_map, template_file="modello.docx", output_dir=None):
-    if not os.path.exists(template_file): raise FileNotFoundError("Template mancante")
-    
-    doc = Document(template_file)
-    local_map = data_map.copy()
-    
-    # --- 1. FIX FORMATO DATA NASCITA (Invariato) ---
-    dob = local_map.get("{{DATA_NASCITA}}")
-    if isinstance(dob, (datetime, date)): 
-        local_map["{{DATA_NASCITA}}"] = dob.strftime('%d/%m/%Y')
-    elif isinstance(dob, str) and '-' in dob:
-        try:
-            dt_obj = datetime.strptime(dob.strip(), '%Y-%m-%d')
-            local_map["{{DATA_NASCITA}}"] = dt_obj.strftime('%d/%m/%Y')
-        except ValueError: pass 
-
-    # --- 2. SOSTITUZIONE NEL WORD (Invariato) ---
-    def replace_in_p(p, m):
-        if not p.text: return
-        for k, v in m.items():
-            if k in p.text: 
-                valore = str(v) if v is not None else ''
-                p.text = p.text.replace(k, valore)
-
-    for p in doc.paragraphs: replace_in_p(p, local_map)
-    for t in doc.tables:
-        for r in t.rows:
-            for c in r.cells:
-                for p in c.paragraphs: replace_in_p(p, local_map)
-                      
-    # --- 3. COSTRUZIONE NOME FILE PERSONALIZZATO ---
-    
-    # A. Estrazione Dati Base
-    # .strip() toglie spazi extra ai lati, .upper() forza il maiuscolo
-    cognome = str(local_map.get('{{COGNOME}}', 'COGNOME')).strip().upper()
-    nome = str(local_map.get('{{NOME}}', 'NOME')).strip().upper()
-    azienda = str(local_map.get('{{SOCIETA}}', 'PRIVATI')).strip().upper()
-    
-    # Se azienda è vuota o None, mettiamo PRIVATI
-    if not azienda or azienda == 'NONE': 
-        azienda = "PRIVATI"
-
-    # B. Calcolo Mese e Anno (es. DIC 25)
-    # Usiamo la data rilascio presente nella mappa (formato atteso: gg/mm/aaaa)
-    data_txt = str(local_map.get('{{DATA_RILASCIOAT}}', ''))
-    
-    mesi_ita = ["", "GEN", "FEB", "MAR", "APR", "MAG", "GIU", "LUG", "AGO", "SET", "OTT", "NOV", "DIC"]
-    mese_str = "GEN" # Default
-    anno_str = "25"  # Default
-
-    try:
-        # Se la data c'è (es. "03/12/2025") la splittiamo
-        if '/' in data_txt:
-            parti = data_txt.split('/') # diventa ['03', '12', '2025']
-            if len(parti) == 3:
-                num_mese = int(parti[1]) # prende 12
-                mese_str = mesi_ita[num_mese] # prende "DIC" dalla lista
-                anno_str = parti[2][-2:] # prende gli ultimi 2 caratteri dell'anno ("25")
-    except:
-        pass # In caso di errore usa i default o la data di oggi
-
-    nome_grezzo = f"{cognome} {nome} {mese_str} {anno_str} {azienda}"
-    
-    fname = re.sub(r'[^\w\s\.\-]', '', nome_grezzo)
-    
-    # Rimuove doppi spazi eventuali creati dalla pulizia
-    fname = re.sub(r'\s+', ' ', fname).strip() + ".docx"
-
-    # -----------------------------------------------
-
-    out_path = os.path.join(output_dir, fname) if output_dir else fname
-    doc.save(out_path)
-    return out_path
-
-def generate_zip_sync(files, base, name="attestati.zip"):
-    with zipfile.ZipFile(name, 'w', zipfile.ZIP_DEFLATED) as z:
-        for f in files: z.write(f, arcname=os.path.relpath(f, base))
-    return name
-
-def check_user_credentials_sync(username, plain_password):
-    print(f"--- DEBUG LOGIN: Tento accesso per utente '{username}' ---")
-    conn = None
+@app.get('/attestati/ristampa')
+async def reprint_route(ids: str):
+    if not app.storage.user.get('authenticated', False):
+        raise HTTPException(status_code=401, detail="Accesso non autorizzato")
     try:
-        conn = get_db_connection()
-        if not conn:
-            print("--- DEBUG: Impossibile connettersi al DB! ---")
-            return False
-            
-        cur = conn.cursor()
-        logger.info(" Connessione al DB OK. Cerco utente")
-        
-        # Cerca l'hash
-        cur.execute("SELECT PASSWORD_HASH FROM T_AUTENTICAZIONE WHERE USERNAME = %s", (username,))
-        row = cur.fetchone()
-        
-        if row:
-            logger.info("Utente TROVATO nel database")
-            stored_hash = row[0]
-            
-            # Debug dell'hash (stampiamo solo i primi caratteri per sicurezza)
-            logger.debug(f"Hash nel DB (primi 10 car): {str(stored_hash)[:10]}...")
-        
-            # Conversione se necessario
-            if isinstance(stored_hash, str):
-                stored_hash = stored_hash.encode('utf-8')
-            
-            # Verifica
-            if bcrypt.checkpw(plain_password.encode('utf-8'), stored_hash):
-                logger.info("Accesso consentito")
-                return True
-            else:
-                logger.warning("PASSWORD ERRATA! Il controllo bcrypt ha fallito")
-        else:
-            logger.info(f"Utente : '{username}' NON TROVATO nella tabella T_AUTENTICAZIONE")
-                
-        return False
-        
-    except Exception as e:
-        logger.warning(" Errore grave!!")
-        return False
-    finally:
-        if conn: conn.close()       
+        wanted = [int(x) for x in ids.split(',') if x.strip()][:REPRINT_MAX]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Elenco attestati non valido")
+    found = await AsyncAttestatiRepo.get_documents(wanted)
+    docs = {i: d for i, d in found.items() if artefact_store.exists(d['HASH'])}
+    missing = [i for i in wanted if i not in docs]
+    if not docs:
+        raise HTTPException(status_code=404, detail="Nessun documento disponibile: vanno rigenerati")
+    buf = await asyncio.to_thread(_reprint_zip, docs, missing)
+    filename = f"Ristampa_{datetime.now().strftime('%d%m%Y_%H%M%S')}.zip"
+    return StreamingResponse(_iter_file(buf), media_type='application/zip',
+                             headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+def download_export(nome, formato='csv', **filtri):
+    """Fa partire nel browser il download di /export/<nome> con i filtri della pagina."""
+    query = urlencode({'formato': formato, **{k: v for k, v in filtri.items() if v}})
+    ui.download.from_url(f'/export/{nome}?{query}')
 
 # --- PAGES ---
 @ui.page('/')
@@ -1002,7 +240,7 @@ def login_page():
                 # --- LA VERA VERIFICA DI SICUREZZA ---
                 # Chiama la funzione che controlla nel DB (T_AUTENTICAZIONE)
                 # Se questa restituisce False, NON entri.
-                is_valid = await asyncio.to_thread(check_user_credentials_sync, user, pwd)
+                is_valid = await check_user_credentials_async(user, pwd)
 
                 if is_valid:
                     app.storage.user['authenticated'] = True
@@ -1038,7 +276,7 @@ def gestione_accessi_page():
 
     # --- 2. LOGICA ---
     async def refresh_table():
-        rows = await asyncio.to_thread(AuthRepo.get_all_users)
+        rows = await AsyncAuthRepo.get_all_users()
         if table_ref: 
             table_ref.rows = rows
             table_ref.update()
@@ -1053,7 +291,7 @@ def gestione_accessi_page():
             ui.notify("Username e Password obbligatori!", type='warning')
             return
 
-        success, msg = await asyncio.to_thread(AuthRepo.create_user, u, p, r)
+        success, msg = await AsyncAuthRepo.create_user(u, p, r)
         if success:
             ui.notify(msg, type='positive')
             dialog_ref.close()
@@ -1066,7 +304,7 @@ def gestione_accessi_page():
             ui.notify("Non puoi cancellare l'utente admin principale!", type='warning')
             return
             
-        await asyncio.to_thread(AuthRepo.delete_user, row['USERNAME'])
+        await AsyncAuthRepo.delete_user(row['USERNAME'])
         ui.notify(f"Utente {row['USERNAME']} eliminato.", type='info')
         await refresh_table()
 
@@ -1150,6 +388,7 @@ def gestionecorsi_page():
     dialog_label = None
     confirm_dialog = None
     table_ref = None
+    paged_table = None
 
     # --- HELPER ---
     def get_template_files():
@@ -1170,12 +409,30 @@ def gestionecorsi_page():
             # 2. Percorso DIRETTO alla tua cartella specifica
             target_path = os.path.join(ABSOLUTE_PATH_TO_TEMPLATES, filename)
             
-            # 3. Scrittura del file
+            # 3. Scrittura in un file temporaneo e analisi: un modello rotto non sostituisce quello buono
+            upload_path = target_path + '.upload'
             e.content.seek(0)
-            with open(target_path, 'wb') as f:
+            with open(upload_path, 'wb') as f:
                 f.write(e.content.read())
-            
-            ui.notify(f"Caricato con successo in: templates/{filename}", type='positive')
+            try:
+                info = await asyncio.to_thread(inspect_template, upload_path)
+                errors, warnings = describe_problems(info)
+                if errors:
+                    ui.notify(f"Modello rifiutato: {'; '.join(errors)}", type='negative', multi_line=True, close_button=True)
+                    return
+                os.replace(upload_path, target_path)
+            finally:
+                if os.path.exists(upload_path):
+                    os.remove(upload_path)
+            # Il modello compilato in cache non vale più (anche se mtime/dimensione coincidono)
+            invalidate_template(target_path)
+            get_template_index(ABSOLUTE_PATH_TO_TEMPLATES).put(filename, info)
+            
+            if warnings:
+                ui.notify(f"Caricato in templates/{filename}, ma: {' | '.join(warnings)}",
+                          type='warning', multi_line=True, close_button=True)
+            else:
+                ui.notify(f"Caricato con successo in: templates/{filename} ({len(info['keys'])} segnaposto)", type='positive')
             
             # 4. Aggiornamento select
             if template_select:
@@ -1189,11 +446,15 @@ def gestionecorsi_page():
             ui.notify(f"Errore caricamento: {ex}", type='negative')
             
     # --- LOGICA ---
+    async def fetch_page(**page):
+        # Solo la pagina visibile: ordinamento e paginazione li fa il DB
+        return await AsyncCorsoRepo.get_page(state['search'], **page)
+
     async def refresh_table():
-        rows = await asyncio.to_thread(CorsoRepo.get_all, state['search'])
-        if table_ref: 
-            table_ref.rows = rows
-            table_ref.update()
+        if paged_table: await paged_table.refresh()
+
+    async def reload_table():
+        if paged_table: await paged_table.reload()
             
     def open_confirm_delete(row):
         # Salviamo la riga che vogliamo cancellare nello "state"
@@ -1232,13 +493,13 @@ def gestionecorsi_page():
         
         # 4. Chiamata al Database (Upsert: Insert o Update)
         # Nota: Assumiamo che CorsoRepo.upsert accetti (dati, is_new)
-        success, msg = await asyncio.to_thread(CorsoRepo.upsert, data, state['is_new'])
+        success, msg = await AsyncCorsoRepo.upsert(data, state['is_new'])
         
         # 5. Gestione esito
         if success:
             ui.notify(msg, type='positive')
             dialog_ref.close()    # Chiude il popup
-            await refresh_table() # Ricarica la tabella
+            await reload_table()  # Ricarica la pagina corrente
         else:
             ui.notify(f"Errore salvataggio: {msg}", type='negative')
 
@@ -1269,7 +530,7 @@ def gestionecorsi_page():
         else:
             state['is_new'] = True
             dialog_label.text = "Nuovo Corso"
-            next_id = await asyncio.to_thread(CorsoRepo.get_next_id)
+            next_id = await AsyncCorsoRepo.get_next_id()
             id_input.value = next_id
             nome_input.value = ''
             ore_input.value = 8
@@ -1297,13 +558,13 @@ def gestionecorsi_page():
 
         try:
             # 3. Tentativo di cancellazione
-            success, msg = await asyncio.to_thread(CorsoRepo.delete, corso_id)
+            success, msg = await AsyncCorsoRepo.delete(corso_id)
             
             if success:
                 ui.notify(msg, type='positive')
                 confirm_dialog.close()
                 state['row_to_delete'] = None
-                await refresh_table()
+                await reload_table()
             else:
                 # 4. GESTIONE SPECIFICA ERRORI (Attestati collegati)
                 msg_str = str(msg).lower()
@@ -1329,7 +590,9 @@ def gestionecorsi_page():
             with ui.row().classes('items-center gap-4'):
                 ui.button(icon='arrow_back', on_click=lambda: ui.navigate.to('/dashboard')).props('flat round dense text-color=slate-700')
                 ui.label('Gestione Corsi').classes('text-3xl font-bold text-slate-800')
-            ui.button('Nuovo Corso', icon='add', on_click=lambda: open_dialog(None)).props('unelevated color=primary')
+            with ui.row().classes('gap-2'):
+                ui.button('Esporta', icon='file_download', on_click=lambda: download_export('corsi', search=state['search'])).props('outline color=green')
+                ui.button('Nuovo Corso', icon='add', on_click=lambda: open_dialog(None)).props('unelevated color=primary')
 
         with ui.card().classes('w-full p-2 mb-4 flex flex-row items-center gap-4 max-w-screen-xl'):
             ui.icon('search').classes('text-grey ml-2')
@@ -1347,7 +610,8 @@ def gestionecorsi_page():
             {'name': 'azioni', 'label': '', 'field': 'azioni', 'align': 'right'},
         ]
         
-        table_ref = ui.table(columns=cols, rows=[], row_key='ID_CORSO').classes('w-full shadow-md bg-white max-w-screen-xl')
+        paged_table = PagedTable(cols, 'ID_CORSO', fetch_page, sort_by='ID_CORSO')
+        table_ref = paged_table.table.classes('w-full shadow-md bg-white max-w-screen-xl')
         
         table_ref.add_slot('body-cell-azioni', r'''
             <q-td key="azioni" :props="props">
@@ -1496,7 +760,7 @@ def dashboard_page():
     # --- LOGICA DI AGGIORNAMENTO ---
     async def update_counter():
         # Esegue la funzione DB in un thread separato per non bloccare la UI
-        n = await asyncio.to_thread(get_count_attestati_oggi_sync)
+        n = await get_count_attestati_oggi_async()
         count_label.set_text(f"{n}")
     
     # Aggiorna subito e poi ogni 10 secondi
@@ -1504,14 +768,14 @@ def dashboard_page():
     ui.timer(10.0, update_counter)
 
 @ui.page('/creaattestati')
-def creaattestati_page():
+async def creaattestati_page():
     if not app.storage.user.get('authenticated', False):
          ui.navigate.to('/')
          return
 
     # --- CARICAMENTO DATI ---
     # Assumo che i corsi siano invariati
-    corsi_raw = get_corsi_from_db_sync()
+    corsi_raw = await get_corsi_async()
     corsi_opts = {c["id"]: c["nome"] for c in corsi_raw}
     corsi_ore = {c["id"]: c["ore"] for c in corsi_raw}
     corsi_codici = {c["id"]: (c["codice"].strip() if c["codice"] else "GEN") for c in corsi_raw}
@@ -1521,7 +785,7 @@ def creaattestati_page():
     
     # --- CARICAMENTO DOCENTI ---
     # <<< MODIFICA: La chiave del dizionario docenti ora è l'ID (Intero), non il CF
-    docenti_list = UserRepo.get_all(solo_docenti=True)
+    docenti_list = await AsyncUserRepo.get_all(solo_docenti=True)
     docenti_opts = {d['ID_UTENTE']: f"{d['COGNOME']} {d['NOME']}" for d in docenti_list}
 
     # <<< MODIFICA: Questo dizionario userà l'ID_UTENTE come chiave, non più il CF stringa
@@ -1532,11 +796,43 @@ def creaattestati_page():
     with search_dialog, ui.card().classes('w-full max-w-lg'):
         ui.label('Cerca Soggetto').classes('text-xl font-bold mb-2')
         with ui.row().classes('w-full gap-2'):
-            search_input = ui.input(label='Cerca...').classes('flex-grow').props('outlined')
+            search_input = ui.input(label='Cerca...', placeholder='Cognome, nome o CF').classes('flex-grow').props('outlined autofocus')
             search_btn = ui.button('Cerca').props('color=primary')
         search_results_area = ui.column().classes('w-full mt-2')
         ui.button('Chiudi', on_click=search_dialog.close).props('flat color=grey').classes('ml-auto')
 
+    # Dialogo Inserimento da elenco (codici fiscali / nominativi incollati o CSV)
+    bulk_dialog = ui.dialog()
+    with bulk_dialog, ui.card().classes('w-full max-w-2xl'):
+        ui.label('Aggiungi da elenco').classes('text-xl font-bold')
+        ui.label('Un soggetto per riga: codice fiscale oppure Cognome Nome. Va bene anche un CSV (; , o tab).') \
+            .classes('text-sm text-gray-500')
+        bulk_input = ui.textarea(placeholder='RSSMRA80A01H501U\nBianchi Giulia\n...') \
+            .props('outlined rows=10').classes('w-full font-mono')
+        with ui.row().classes('w-full items-center gap-2'):
+            bulk_upload = ui.upload(auto_upload=True, multiple=False, label='Carica CSV') \
+                .props('accept=".csv,.txt" flat dense color=primary no-thumbnails').classes('w-auto')
+            ui.space()
+            ui.button('Chiudi', on_click=bulk_dialog.close).props('flat color=grey')
+            bulk_btn = ui.button('Aggiungi tutti', icon='group_add').props('color=primary')
+        bulk_results_area = ui.column().classes('w-full mt-2 gap-1')
+
+    # Dialogo Inserimento di tutti i dipendenti di un ente (con filtro sul corso)
+    ente_dialog = ui.dialog()
+    with ente_dialog, ui.card().classes('w-full max-w-lg'):
+        ui.label("Aggiungi dipendenti dell'ente").classes('text-xl font-bold')
+        ente_select = ui.select(options={}, label='Ente', with_input=True).props('outlined').classes('w-full')
+        ente_filtro = ui.radio({'tutti': 'Tutti', 'senza_corso': 'Senza il corso', 'da_rinnovare': 'Da rinnovare'},
+                               value='tutti').props('inline')
+        ente_corso = ui.select(options=corsi_opts, label='Corso').props('outlined').classes('w-full')
+        ente_giorni = ui.number(label='In scadenza entro (giorni)', value=60, min=0, format='%d') \
+            .props('outlined').classes('w-full')
+        ente_corso.bind_visibility_from(ente_filtro, 'value', backward=lambda v: v != 'tutti')
+        ente_giorni.bind_visibility_from(ente_filtro, 'value', backward=lambda v: v == 'da_rinnovare')
+        with ui.row().classes('w-full justify-end'):
+            ui.button('Chiudi', on_click=ente_dialog.close).props('flat color=grey')
+            ente_btn = ui.button('Aggiungi tutti', icon='groups').props('color=primary')
+
     with ui.column().classes('w-full items-center p-8'):
         with ui.row().classes('w-full items-center mb-4'): 
             ui.button('Torna', on_click=lambda: ui.navigate.to('/dashboard'), icon='arrow_back').props('flat round')
@@ -1661,14 +957,17 @@ def creaattestati_page():
                     ui.button(icon='delete', on_click=lambda _, u=uid: rimuovi_soggetto(u)) \
                         .props('flat round dense color=red size=sm').classes('mt-1')
 
+        def nuovo_elemento(u_data):
+            # <<< MODIFICA: Struttura dati aggiornata con 'docente_id'
+            return {'user': u_data, 'cid': None, 'docente_id': None, 'per': None, 'date_extra': '', 'ore': None}
+
         def process_user_addition(u_data):
             # <<< MODIFICA: Chiave univoca è ID_UTENTE
             uid = u_data['ID_UTENTE']
             if uid in soggetti:
                 ui.notify("Utente già in lista!", color='orange'); return
             
-            # <<< MODIFICA: Struttura dati aggiornata con 'docente_id'
-            soggetti[uid] = {'user': u_data, 'cid': None, 'docente_id': None, 'per': None, 'date_extra': '', 'ore': None}
+            soggetti[uid] = nuovo_elemento(u_data)
             render_lista_soggetti.refresh()
             count_label.set_text(f"Totale: {len(soggetti)}")
             ui.notify(f"Aggiunto: {u_data['COGNOME']}", color='green')
@@ -1696,43 +995,156 @@ def creaattestati_page():
             soggetti.clear(); render_lista_soggetti.refresh(); count_label.set_text("Totale: 0")
 
         def open_search_ui():
+            live_search.cancel()
             search_input.value = ""; search_results_area.clear(); search_dialog.open()
 
-        async def perform_search():
-            term = search_input.value
-            if not term: return
-            # Nota: UserRepo.get_all ritorna già la struttura corretta con ID_UTENTE
-            res = await asyncio.to_thread(UserRepo.get_all, term)
-            
+        def mostra_risultati(term, res):
+            # Risposta arrivata tardi (testo già cambiato o dialog chiuso): non si mostra
+            if term != (search_input.value or '').strip():
+                return
             search_results_area.clear()
             if not res:
                 with search_results_area: ui.label("Nessun risultato.").classes('text-red italic')
                 return
-            
+            with search_results_area:
+                if len(res) >= AsyncUserRepo.SEARCH_LIMIT:
+                    ui.label(f"Primi {len(res)} risultati: continua a scrivere per restringere.") \
+                        .classes('text-xs text-gray-500 italic')
+                with ui.list().props('bordered separator dense'):
+                    for u in res:
+                        dob = u['DATA_NASCITA'] if u['DATA_NASCITA'] else "-"
+                        lbl = f"{u['COGNOME']} {u['NOME']} ({dob})"
+                        # Cliccando passiamo l'intero oggetto utente 'u'
+                        with ui.item().props('clickable').on('click', lambda e, x=u: (process_user_addition(x), search_dialog.close())):
+                            with ui.item_section():
+                                ui.item_label(lbl)
+                                # Mostra CF o ID se CF manca
+                                sub_lbl = u['CODICE_FISCALE'] if u['CODICE_FISCALE'] else f"ID: {u['ID_UTENTE']}"
+                                ui.item_label(sub_lbl).props('caption')
+
+        # Risultati mentre si digita: una ricerca dopo ogni pausa, solo l'ultima conta
+        live_search = LiveSearch(AsyncUserRepo.search, mostra_risultati)
+        search_input.on_value_change(lambda e: live_search.request(e.value))
+
+        async def perform_search():
+            # Invio / bottone: ricerca immediata (annulla quella in attesa)
+            live_search.cancel()
+            term = (search_input.value or '').strip()
+            if not term: return
+            res = await AsyncUserRepo.search(term)
             # Se un solo risultato, aggiungi diretto
             if len(res) == 1:
                 process_user_addition(res[0]); search_dialog.close()
             else:
-                with search_results_area:
-                    with ui.list().props('bordered separator dense'):
-                        for u in res:
-                            dob = u['DATA_NASCITA'] if u['DATA_NASCITA'] else "-"
-                            lbl = f"{u['COGNOME']} {u['NOME']} ({dob})"
-                            # Cliccando passiamo l'intero oggetto utente 'u'
-                            with ui.item().props('clickable').on('click', lambda e, x=u: (process_user_addition(x), search_dialog.close())):
-                                with ui.item_section():
-                                    ui.item_label(lbl)
-                                    # Mostra CF o ID se CF manca
-                                    sub_lbl = u['CODICE_FISCALE'] if u['CODICE_FISCALE'] else f"ID: {u['ID_UTENTE']}"
-                                    ui.item_label(sub_lbl).props('caption')
+                mostra_risultati(term, res)
         
         search_btn.on_click(perform_search)
         search_input.on('keydown.enter', perform_search)
 
+        # --- INSERIMENTO DA ELENCO ---
+        def aggiungi_soggetti(users, cid=None):
+            """
+            Aggiunge tutti i soggetti non ancora in lista con un solo refresh. Restituisce quanti.
+            cid: corso già impostato sulle nuove righe (con le sue ore).
+            """
+            nuovi = 0
+            for u in users:
+                if u['ID_UTENTE'] not in soggetti:
+                    item = nuovo_elemento(u)
+                    if cid is not None:
+                        item['cid'], item['ore'] = cid, corsi_ore.get(cid)
+                    soggetti[u['ID_UTENTE']] = item
+                    nuovi += 1
+            if nuovi:
+                render_lista_soggetti.refresh()
+                count_label.set_text(f"Totale: {len(soggetti)}")
+            return nuovi
+
+        def open_bulk_ui():
+            bulk_input.value = ""; bulk_results_area.clear(); bulk_dialog.open()
+
+        def aggiungi_candidato(u, riga_ui):
+            process_user_addition(u)
+            riga_ui.delete()
+
+        async def perform_bulk_add():
+            testo = bulk_input.value or ''
+            if not testo.strip(): return
+            res = await AsyncUserRepo.resolve_list(testo)
+            nuovi = aggiungi_soggetti(res['found'])
+            gia_presenti = len(res['found']) - nuovi
+
+            bulk_results_area.clear()
+            with bulk_results_area:
+                ui.label(f"Aggiunti {nuovi} soggetti" + (f" ({gia_presenti} già in lista)" if gia_presenti else "")) \
+                    .classes('text-sm font-bold text-green-700')
+                # Più soggetti per la stessa riga: si sceglie a mano
+                if res['ambiguous']:
+                    ui.label(f"Da scegliere ({len(res['ambiguous'])}):").classes('text-sm font-bold text-orange-700 mt-2')
+                    for riga, candidati in res['ambiguous']:
+                        with ui.column().classes('w-full gap-0 pl-2') as riga_ui:
+                            ui.label(riga).classes('text-sm font-mono')
+                            with ui.row().classes('gap-1'):
+                                for u in candidati:
+                                    dettaglio = u['CODICE_FISCALE'] or u['DATA_NASCITA'] or f"ID: {u['ID_UTENTE']}"
+                                    ui.button(f"{u['COGNOME']} {u['NOME']} ({dettaglio})",
+                                              on_click=lambda _, x=u, r=riga_ui: aggiungi_candidato(x, r)) \
+                                        .props('flat dense no-caps size=sm color=primary')
+                # Righe senza soggetto: restano nel riquadro per correggerle e riprovare
+                if res['unmatched']:
+                    ui.label(f"Non trovati ({len(res['unmatched'])}):").classes('text-sm font-bold text-red-700 mt-2')
+                    for riga in res['unmatched']:
+                        ui.label(riga).classes('text-sm font-mono pl-2')
+            bulk_input.value = '\n'.join(res['unmatched'])
+            if nuovi:
+                ui.notify(f"Aggiunti {nuovi} soggetti", color='green')
+
+        def handle_bulk_upload(e):
+            e.content.seek(0)
+            raw = e.content.read()
+            try:
+                testo = raw.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                # CSV salvati da Excel su Windows
+                testo = raw.decode('cp1252')
+            bulk_input.value = testo
+            bulk_upload.reset()
+
+        bulk_upload.on_upload(handle_bulk_upload)
+        bulk_btn.on_click(perform_bulk_add)
+
+        # --- INSERIMENTO DEI DIPENDENTI DI UN ENTE ---
+        async def open_ente_ui():
+            enti = await AsyncEnteRepo.get_all('')
+            ente_select.options = {e['ID_ENTE']: e['DESCRIZIONE'] for e in enti}
+            ente_select.update()
+            ente_dialog.open()
+
+        async def perform_ente_add():
+            if ente_select.value is None:
+                ui.notify("Scegli l'ente", color='orange'); return
+            filtro = ente_filtro.value
+            if filtro != 'tutti' and ente_corso.value is None:
+                ui.notify("Scegli il corso", color='orange'); return
+            cid = ente_corso.value if filtro != 'tutti' else None
+            # Una sola query (indice su ID_ENTE_FK), SOCIETA già risolta
+            users = await AsyncUserRepo.get_by_ente(ente_select.value, cid, filtro, int(ente_giorni.value or 0))
+            if not users:
+                ui.notify("Nessun soggetto da aggiungere", color='orange'); return
+            nuovi = aggiungi_soggetti(users, cid)
+            gia_presenti = len(users) - nuovi
+            ui.notify(f"Aggiunti {nuovi} soggetti" + (f" ({gia_presenti} già in lista)" if gia_presenti else ""),
+                      color='green' if nuovi else 'orange')
+            ente_dialog.close()
+
+        ente_btn.on_click(perform_ente_add)
+
         with ui.row().classes('w-full justify-between items-center mt-2 mb-2'):
              ui.label('Lista Destinatari').classes('text-xl font-bold')
              with ui.row():
                  ui.button('Aggiungi', on_click=open_search_ui, icon='person_add').props('color=primary')
+                 ui.button('Da elenco', on_click=open_bulk_ui, icon='playlist_add').props('color=primary outline')
+                 ui.button('Da ente', on_click=open_ente_ui, icon='groups').props('color=primary outline')
                  ui.button('Svuota', on_click=svuota_lista, icon='delete_sweep').props('color=red flat')
 
         with ui.column().classes('w-full p-4 border rounded shadow-md bg-white'):
@@ -1740,6 +1152,7 @@ def creaattestati_page():
             render_lista_soggetti()
 
         # --- GENERAZIONE PDF/ZIP ---
+        @timed('generazione')
         async def on_generate():
             items = list(soggetti.values())
             if not items: 
@@ -1748,15 +1161,26 @@ def creaattestati_page():
             if any(not x['cid'] or not x['calendario_txt'] for x in items): 
                 ui.notify("Dati mancanti (Corso o Calendario)!", color='red'); return
 
-            ui.notify("Generazione in corso...", spinner=True)
-            
-            z_path = None
-            tmp = None
+            # Controllo preliminare di tutti i modelli, prima di calcolare sessioni o mettere in coda
+            template_index = get_template_index("templates")
+            for nome_template in sorted({corsi_templates.get(x['cid']) or 'modello.docx' for x in items}):
+                info = await asyncio.to_thread(template_index.get, nome_template)
+                if info is None:
+                    ui.notify(f"Template '{nome_template}' mancante!", color='red'); return
+                errors, warnings = describe_problems(info)
+                if errors:
+                    ui.notify(f"Template '{nome_template}' non valido: {'; '.join(errors)}",
+                              color='red', multi_line=True, close_button=True); return
+                if warnings:
+                    ui.notify(f"Template '{nome_template}': {' | '.join(warnings)}",
+                              color='orange', multi_line=True, close_button=True)
 
             try:
-                tmp = tempfile.mkdtemp()
-                files_to_zip = []
                 grouped_items = {}
+                # Attestati da registrare: salvati dal lavoro dopo il rendering
+                records = []
+                # Attestati da generare: (mappa dati, modello, cartella relativa nello ZIP, sessione)
+                render_tasks = []
                 
                 # FASE 1: Raggruppamento
                 for it in items:
@@ -1773,32 +1197,28 @@ def creaattestati_page():
                     if key not in grouped_items: grouped_items[key] = []
                     grouped_items[key].append(it)
 
-                # FASE 2: Creazione
+                # Numeri di sessione di tutti i gruppi in una sola chiamata (vedi db/repos.py)
+                numeri_sessione = await allocate_session_numbers_async(grouped_items.keys())
+
+                # FASE 2: Preparazione dei dati (i file li crea il lavoro in background)
                 for (cid, dt_inizio_val), group_list in grouped_items.items():
                     codice_corso = corsi_codici.get(cid, "GEN")
                     
-                    # Calcolo sessione (Assicurati che questa funzione accetti ID o Date correttamente)
-                    n_sessione = await asyncio.to_thread(get_next_session_number_sync, cid, dt_inizio_val)
+                    n_sessione = numeri_sessione[(cid, dt_inizio_val)]
                     data_codice = dt_inizio_val.strftime('%d%m%Y')
                     
                     sigla_cartella = f"{n_sessione}{codice_corso}{data_codice}"
-                    path_sigla = os.path.join(tmp, sigla_cartella)
-                    os.makedirs(path_sigla, exist_ok=True)
                     
                     nome_corso_full = corsi_opts[cid]
                     nome_template = corsi_templates.get(cid, 'modello.docx') or 'modello.docx'
                     programma_txt = corsi_programmi.get(cid, '')
                     path_template = os.path.join("templates", nome_template)
-                    
-                    if not os.path.exists(path_template):
-                        ui.notify(f"Template '{nome_template}' mancante!", color='red'); return
 
                     for it in group_list:
                         u = it['user']
                         # Società: se non c'è, usa 'Privati'
                         safe_az = re.sub(r'\W', '_', u.get('SOCIETA') or 'Privati')
-                        final_dir = os.path.join(path_sigla, safe_az)
-                        os.makedirs(final_dir, exist_ok=True)
+                        final_dir = os.path.join(sigla_cartella, safe_az)
                         
                         # <<< MODIFICA: Recupero nome docente da ID
                         nome_docente = docenti_opts.get(it.get('docente_id'), '')
@@ -1827,31 +1247,80 @@ def creaattestati_page():
                             "{{PROGRAMMA}}": programma_txt
                         }
 
-                        f = await asyncio.to_thread(generate_certificate_sync, d_map, path_template, final_dir)
-                        files_to_zip.append(f)
+                        render_tasks.append((d_map, path_template, final_dir, sigla_cartella))
                         
                         # <<< MODIFICA CRITICA: Salvataggio DB usa l'ID, NON il CF
-                        # Qui chiamiamo AttestatiRepo.insert_attestato (o la tua funzione wrapper)
                         # Passiamo u['ID_UTENTE'] che è l'intero
-                        await asyncio.to_thread(AttestatiRepo.insert_attestato, u['ID_UTENTE'], cid, dt_inizio_val)
+                        records.append((u['ID_UTENTE'], cid, dt_inizio_val))
 
-                # FASE 3: Zip
+                # FASE 3: Messa in coda (rendering, salvataggio DB e ZIP li fa il JobRunner)
                 z_name = f"Export_{datetime.now().strftime('%d%m%Y_%H%M%S')}.zip"
-                z_path = await asyncio.to_thread(generate_zip_sync, files_to_zip, tmp, z_name)
-                
-                ui.download(z_path)
-                ui.notify(f"Fatto! {len(files_to_zip)} attestati.", color='green')
-                
+                formato = FORMAT_PDF if pdf_switch is not None and pdf_switch.value else FORMAT_DOCX
+                params = build_job_params(render_tasks, records, z_name, formato, merge=merge_switch.value)
+                job_id = await AsyncJobRepo.create(JOB_TYPE_ATTESTATI, app.storage.user.get('username', ''),
+                                                   params, len(render_tasks))
+                if job_id is None:
+                    ui.notify("Impossibile mettere in coda la generazione", color='red'); return
+                job_runner.wake()
+
+                ui.notify(f"Generazione di {len(render_tasks)} attestati in coda (lavoro n. {job_id})", color='green')
                 soggetti.clear(); render_lista_soggetti.refresh(); count_label.set_text("Totale: 0")
+                await refresh_lavori()
 
             except Exception as e:
                 logger.error(f"Errore generazione: {e}")
                 ui.notify(f"Errore: {e}", color='red', close_button=True, multi_line=True)
-            finally:
-                # ... (pulizia tmp identica a prima) ...
-                pass 
 
         ui.button("Genera attestati", on_click=on_generate).classes('w-full mt-6').props('color=blue size=lg')
+        with ui.row().classes('self-start gap-4'):
+            # Un documento per sessione con tutti gli attestati, da stampare in una volta
+            merge_switch = ui.switch('Documento unico per la stampa')
+            # PDF solo se sul server c'è LibreOffice (vedi attestati/pdf.py)
+            pdf_switch = None
+            if pdf_available(job_runner.soffice):
+                pdf_switch = ui.switch('Genera in PDF')
+
+        # --- LAVORI IN BACKGROUND ---
+        # Ultimi lavori dell'utente: posizione in coda, avanzamento e download a lavoro finito
+        lavori = []
+
+        @ui.refreshable
+        def render_lavori():
+            if not lavori:
+                return
+            with ui.column().classes('w-full p-4 mt-4 border rounded shadow-md bg-white gap-2'):
+                ui.label('Lavori').classes('text-lg font-bold')
+                for job in lavori:
+                    creato = job['CREATO_IL'].strftime('%d/%m/%Y %H:%M') if job['CREATO_IL'] else ''
+                    with ui.row().classes('w-full items-center gap-4'):
+                        ui.label(f"n. {job['ID_LAVORO']} - {creato}").classes('text-sm w-40')
+                        if job['STATO'] == JOB_DONE:
+                            with ui.column().classes('flex-grow gap-0'):
+                                ui.label(f"Completato: {job['TOTALE']} attestati").classes('text-sm text-green-700')
+                                if job['ERRORE']:
+                                    ui.label(job['ERRORE']).classes('text-xs text-gray-600')
+                            ui.button('Scarica', icon='download',
+                                      on_click=lambda j=job: ui.download.from_url(f"/lavori/{j['ID_LAVORO']}/download")) \
+                                .props('flat color=primary')
+                        elif job['STATO'] == JOB_FAILED:
+                            ui.label(f"Errore: {job['ERRORE']}").classes('text-sm text-red-700 flex-grow')
+                        elif job['POSIZIONE']:
+                            ui.label(f"In coda (posizione {job['POSIZIONE']})").classes('text-sm text-gray-600 flex-grow')
+                        else:
+                            totale = job['TOTALE'] or 1
+                            with ui.column().classes('flex-grow gap-1'):
+                                ui.label(f"Generati {job['FATTI']} di {job['TOTALE']} attestati").classes('text-sm text-gray-600')
+                                ui.linear_progress(value=job['FATTI'] / totale, show_value=False).props('instant-feedback')
+
+        async def refresh_lavori():
+            lavori[:] = await AsyncJobRepo.list_for_user(app.storage.user.get('username', ''))
+            render_lavori.refresh()
+            # Il polling serve solo finché c'è qualcosa in coda o in corso
+            lavori_timer.active = any(j['STATO'] not in JOB_FINAL_STATES for j in lavori)
+
+        render_lavori()
+        lavori_timer = ui.timer(2.0, refresh_lavori, active=False)
+        ui.timer(0.1, refresh_lavori, once=True)
 
 @ui.page('/gestioneutenti')
 def gestioneutenti_page():
@@ -1874,6 +1343,7 @@ def gestioneutenti_page():
     
     dialog_label = None
     table_ref = None
+    paged_table = None
     dialog_ref = None
     confirm_dialog = None 
 
@@ -1882,22 +1352,19 @@ def gestioneutenti_page():
     async def get_enti_options():
         """Recupera la lista enti per la select dal DB reale"""
         try:
-            enti = await asyncio.to_thread(EnteRepo.get_all, '')
+            enti = await AsyncEnteRepo.get_all('')
             # Restituisce dict {ID: "Nome (P.IVA)"}
             return {e['ID_ENTE']: f"{e['DESCRIZIONE']} ({e['P_IVA']})" for e in enti}
         except Exception as e:
             ui.notify(f"Errore caricamento Enti: {e}", color='red')
             return {}
 
-    async def refresh_table():
-        """Ricarica la tabella dal DB reale"""
+    async def fetch_page(**page):
+        """Una pagina di utenti dal DB reale (ordinamento e paginazione lato server)"""
         try:
-            # 1. Recuperiamo gli utenti
-            rows = await asyncio.to_thread(UserRepo.get_all, state['search'])
-            
-            # 2. Recuperiamo la mappa degli Enti per mostrare il nome nella tabella
-            # (Per evitare di mostrare solo l'ID o il campo società vuoto)
-            opzioni_enti = await get_enti_options()
+            # Utenti della pagina, con il nome dell'ente già risolto dalla query (SOCIETA)
+            result = await AsyncUserRepo.get_page(state['search'], **page)
+            rows = result['rows']
             
             # Formattazione dati per visualizzazione
             for r in rows:
@@ -1913,20 +1380,20 @@ def gestioneutenti_page():
                 else:
                     r['DATA_DISPLAY'] = ''
 
-                # Risoluzione Nome Ente da ID
-                id_ente = r.get('ID_ENTE_FK')
-                # Se l'ID c'è nella mappa usa quello, altrimenti usa stringa vuota o fallback
-                if id_ente in opzioni_enti:
-                    # opzioni_enti è "Nome (Piva)", prendiamo tutto o solo il nome
-                    r['ENTE_DISPLAY'] = opzioni_enti[id_ente]
-                else:
-                    r['ENTE_DISPLAY'] = '-'
+                r['ENTE_DISPLAY'] = r.get('SOCIETA') or '-'
 
-            if table_ref: 
-                table_ref.rows = rows
-                table_ref.update()
+            return result
         except Exception as e:
             ui.notify(f"Errore caricamento utenti: {e}", color='red')
+            return empty_page()
+
+    async def refresh_table():
+        """Ricarica la tabella dalla prima pagina (nuova ricerca)"""
+        if paged_table: await paged_table.refresh()
+
+    async def reload_table():
+        """Ricarica la pagina corrente (dopo salvataggio / eliminazione)"""
+        if paged_table: await paged_table.reload()
 
     async def open_dialog(row=None):
         """Apre il dialog Creazione/Modifica"""
@@ -1996,12 +1463,12 @@ def gestioneutenti_page():
         }
         
         try:
-            success, msg = await asyncio.to_thread(UserRepo.upsert, data, state['is_new'])
+            success, msg = await AsyncUserRepo.upsert(data, state['is_new'])
             
             if success: 
                 ui.notify(msg, type='positive')
                 dialog_ref.close()
-                await refresh_table()
+                await reload_table()
             else: 
                 ui.notify(msg, type='negative')
         except Exception as e:
@@ -2017,11 +1484,11 @@ def gestioneutenti_page():
         row = state['row_to_delete']
         
         try:
-            success, msg = await asyncio.to_thread(UserRepo.delete, row['CODICE_FISCALE'])
+            success, msg = await AsyncUserRepo.delete(row['ID_UTENTE'])
             
             if success:
                 ui.notify("Utente eliminato", type='positive')
-                await refresh_table()
+                await reload_table()
             else:
                 ui.notify(f"Errore: {msg}", type='negative')
         except Exception as e:
@@ -2039,7 +1506,9 @@ def gestioneutenti_page():
                 ui.button(icon='arrow_back', on_click=lambda: ui.navigate.to('/dashboard')).props('flat round dense text-color=slate-700')
                 ui.label('Gestione Utenti').classes('text-3xl font-bold text-slate-800')
             
-            ui.button('Nuovo Utente', icon='person_add', on_click=lambda: open_dialog(None)).props('unelevated color=primary')
+            with ui.row().classes('gap-2'):
+                ui.button('Esporta', icon='file_download', on_click=lambda: download_export('soggetti', search=state['search'])).props('outline color=green')
+                ui.button('Nuovo Utente', icon='person_add', on_click=lambda: open_dialog(None)).props('unelevated color=primary')
 
         # Barra Ricerca
         with ui.card().classes('w-full p-2 mb-4 flex flex-row items-center gap-4'):
@@ -2059,7 +1528,9 @@ def gestioneutenti_page():
             {'name': 'azioni', 'label': '', 'field': 'azioni', 'align': 'right'},
         ]
         
-        table_ref = ui.table(columns=cols, rows=[], row_key='CODICE_FISCALE').classes('w-full shadow-md bg-white')
+        # Chiave di riga = ID (il CF può mancare)
+        paged_table = PagedTable(cols, 'ID_UTENTE', fetch_page, sort_by='COGNOME')
+        table_ref = paged_table.table.classes('w-full shadow-md bg-white')
         
         # Slot Badge Docente
         table_ref.add_slot('body-cell-IS_DOCENTE', r'''
@@ -2137,6 +1608,7 @@ def gestioneenti_page():
     dialog_ref = None
     dialog_label = None
     table_ref = None
+    paged_table = None
     
     # Definiamo gli input ma li creeremo dopo nella UI. 
     # Li inizializziamo a None per evitare il NameError, ma Python deve sapere che esistono.
@@ -2146,9 +1618,14 @@ def gestioneenti_page():
 
     # --- 2. LOGICA ---
 
+    async def fetch_page(**page):
+        return await AsyncEnteRepo.get_page(state['search'], **page)
+
     async def refresh_table():
-        rows = await asyncio.to_thread(EnteRepo.get_all, state['search'])
-        if table_ref: table_ref.rows = rows; table_ref.update()
+        if paged_table: await paged_table.refresh()
+
+    async def reload_table():
+        if paged_table: await paged_table.reload()
 
     async def open_dialog(row=None):
         # NOTA: Qui usiamo 'nonlocal' se dovessimo riassegnare l'oggetto input intero, 
@@ -2169,7 +1646,7 @@ def gestioneenti_page():
             state['is_new'] = True
             
             # Calcolo ID automatico
-            next_id = await asyncio.to_thread(EnteRepo.get_next_id)
+            next_id = await AsyncEnteRepo.get_next_id()
             
             id_ente_input.value = next_id     # Precompila
             id_ente_input.props('readonly')   # Blocca modifica
@@ -2189,17 +1666,17 @@ def gestioneenti_page():
 
         data = {'ID_ENTE': id_val, 'DESCRIZIONE': desc_val, 'P_IVA': piva_val}
 
-        success, msg = await asyncio.to_thread(EnteRepo.upsert, data, state['is_new'])
+        success, msg = await AsyncEnteRepo.upsert(data, state['is_new'])
         if success: 
             ui.notify(msg, type='positive')
             dialog_ref.close()
-            await refresh_table()
+            await reload_table()
         else: 
             ui.notify(msg, type='negative')
 
     async def delete_ente(row):
-        await asyncio.to_thread(EnteRepo.delete, row['ID_ENTE'])
-        ui.notify("Eliminato", type='info'); await refresh_table()
+        await AsyncEnteRepo.delete(row['ID_ENTE'])
+        ui.notify("Eliminato", type='info'); await reload_table()
 
     # --- 3. INTERFACCIA UTENTE (UI) ---
     
@@ -2208,7 +1685,9 @@ def gestioneenti_page():
             ui.button(icon='arrow_back', on_click=lambda: ui.navigate.to('/dashboard')).props('flat round dense')
             ui.label('Enti').classes('text-3xl font-bold text-slate-800')
             # NOTA: Qui passiamo open_dialog, che ora è async ma NiceGUI gestisce lambda/async bene
-            ui.button('Nuovo', icon='add', on_click=lambda: open_dialog(None)).props('unelevated color=primary')
+            with ui.row().classes('gap-2'):
+                ui.button('Esporta', icon='file_download', on_click=lambda: download_export('enti', search=state['search'])).props('outline color=green')
+                ui.button('Nuovo', icon='add', on_click=lambda: open_dialog(None)).props('unelevated color=primary')
 
         with ui.card().classes('w-full p-2 mb-4 flex flex-row items-center gap-4'):
             ui.icon('search').classes('text-grey ml-2')
@@ -2221,7 +1700,8 @@ def gestioneenti_page():
             {'name': 'P_IVA', 'label': 'P.IVA', 'field': 'P_IVA', 'align': 'center'},
             {'name': 'azioni', 'label': '', 'field': 'azioni', 'align': 'right'},
         ]
-        table_ref = ui.table(columns=cols, rows=[], row_key='ID_ENTE').classes('w-full shadow-md bg-white')
+        paged_table = PagedTable(cols, 'ID_ENTE', fetch_page, sort_by='DESCRIZIONE')
+        table_ref = paged_table.table.classes('w-full shadow-md bg-white')
         table_ref.add_slot('body-cell-azioni', r'''
             <q-td key="azioni" :props="props">
                 <q-btn icon="edit" size="sm" round flat color="grey-8" @click="$parent.$emit('edit', props.row)" />
@@ -2256,12 +1736,17 @@ def gestionedocenti_page():
     # Variabili UI
     cf_input = None; cognome_input = None; nome_input = None
     data_input_field = None; luogo_input = None; ente_input = None
-    dialog_ref = None; table_ref = None; dialog_label = None
+    dialog_ref = None; table_ref = None; dialog_label = None; paged_table = None
 
-    async def refresh_table():
+    async def fetch_page(**page):
         # --- QUI LA DIFFERENZA: solo_docenti=True ---
-        rows = await asyncio.to_thread(UserRepo.get_all, state['search'], solo_docenti=True)
-        if table_ref: table_ref.rows = rows; table_ref.update()
+        return await AsyncUserRepo.get_page(state['search'], solo_docenti=True, **page)
+
+    async def refresh_table():
+        if paged_table: await paged_table.refresh()
+
+    async def reload_table():
+        if paged_table: await paged_table.reload()
 
     def open_dialog(row=None):
         dialog_ref.open()
@@ -2292,20 +1777,22 @@ def gestionedocenti_page():
             'IS_DOCENTE': True  # --- FORZIAMO CHE SIA UN DOCENTE ---
         }
         
-        success, msg = await asyncio.to_thread(UserRepo.upsert, data, state['is_new'])
-        if success: ui.notify(msg, type='positive'); dialog_ref.close(); await refresh_table()
+        success, msg = await AsyncUserRepo.upsert(data, state['is_new'])
+        if success: ui.notify(msg, type='positive'); dialog_ref.close(); await reload_table()
         else: ui.notify(msg, type='negative')
 
     async def delete_docente(row):
-        await asyncio.to_thread(UserRepo.delete, row['CODICE_FISCALE'])
-        ui.notify("Eliminato", type='info'); await refresh_table()
+        await AsyncUserRepo.delete(row['ID_UTENTE'])
+        ui.notify("Eliminato", type='info'); await reload_table()
 
     # --- UI IDENTICA A GESTIONE UTENTI MA TITOLI DIVERSI ---
     with ui.column().classes('w-full items-center p-8 max-w-screen-xl mx-auto bg-slate-50 min-h-screen'):
         with ui.row().classes('w-full items-center mb-6 justify-between'):
             ui.button(icon='arrow_back', on_click=lambda: ui.navigate.to('/dashboard')).props('flat round dense')
             ui.label('Gestione Docenti').classes('text-3xl font-bold text-slate-800')
-            ui.button('Nuovo Docente', icon='add', on_click=lambda: open_dialog(None)).props('unelevated color=primary')
+            with ui.row().classes('gap-2'):
+                ui.button('Esporta', icon='file_download', on_click=lambda: download_export('soggetti', search=state['search'], solo_docenti=True)).props('outline color=green')
+                ui.button('Nuovo Docente', icon='add', on_click=lambda: open_dialog(None)).props('unelevated color=primary')
 
         # ... SEARCH BAR ...
         with ui.card().classes('w-full p-2 mb-4 flex flex-row items-center gap-4'):
@@ -2320,7 +1807,8 @@ def gestionedocenti_page():
             {'name': 'NOME', 'label': 'Nome', 'field': 'NOME', 'align': 'left'},
             {'name': 'azioni', 'label': '', 'field': 'azioni', 'align': 'right'},
         ]
-        table_ref = ui.table(columns=cols, rows=[], row_key='CODICE_FISCALE').classes('w-full shadow-md bg-white')
+        paged_table = PagedTable(cols, 'ID_UTENTE', fetch_page, sort_by='COGNOME')
+        table_ref = paged_table.table.classes('w-full shadow-md bg-white')
         table_ref.add_slot('body-cell-azioni', r'''
             <q-td key="azioni" :props="props">
                 <q-btn icon="edit" size="sm" round flat color="grey-8" @click="$parent.$emit('edit', props.row)" />
@@ -2355,6 +1843,7 @@ def archivio_page():
 
     state = {'search': '', 'date_start': None, 'date_end': None}
     table_ref = None
+    paged_table = None
 
     # --- HELPER ---
     def format_date(dt_obj):
@@ -2367,74 +1856,24 @@ def archivio_page():
         except: return str(dt_obj)
 
     # --- LOGICA EXPORT EXCEL/CSV ---
-    async def export_excel():
-        """Genera un file CSV (Excel compatibile) con i dati filtrati"""
-        try:
-            # 1. Recupera dati (con gli stessi filtri della tabella)
-            rows = await asyncio.to_thread(AttestatiRepo.get_history, state['search'], state['date_start'], state['date_end'])
-            
-            if not rows:
-                ui.notify("Nessun dato da esportare", color='warning')
-                return
-
-            # 2. Crea file temporaneo
-            # 'utf-8-sig' è fondamentale per far leggere gli accenti a Excel
-            # 'delete=False' perché NiceGUI deve poterlo leggere per inviarlo
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.csv', encoding='utf-8-sig', newline='') as tmp:
-                # Usa ';' come delimitatore perché Excel italiano lo preferisce alla virgola
-                writer = csv.writer(tmp, delimiter=';')
-                
-                # Intestazioni
-                writer.writerow(['ID', 'Data Emissione', 'Corsista', 'Codice Fiscale', 'Corso', 'Scadenza', 'Stato'])
-                
-                today = date.today()
-                
-                # Scrittura righe
-                for r in rows:
-                    # Formattazione dati
-                    d_em = format_date(r.get('DATA_EMISSIONE'))
-                    d_sc = format_date(r.get('SCADENZA'))
-                    
-                    # Calcolo Stato (Testuale per Excel)
-                    stato_str = "SCADUTO"
-                    try:
-                        scad_val = r.get('SCADENZA')
-                        if scad_val:
-                            if isinstance(scad_val, str):
-                                scad_obj = datetime.strptime(scad_val, '%Y-%m-%d').date()
-                            elif isinstance(scad_val, datetime):
-                                scad_obj = scad_val.date()
-                            else:
-                                scad_obj = scad_val
-                            
-                            if scad_obj > today:
-                                stato_str = "VALIDO"
-                    except:
-                        pass # Resta Scaduto se errore
-
-                    writer.writerow([
-                        r.get('ID', ''),
-                        d_em,
-                        r.get('CORSISTA', ''),
-                        r.get('CF', ''),
-                        r.get('CORSO', ''),
-                        d_sc,
-                        stato_str
-                    ])
-                
-                tmp_path = tmp.name
-
-            # 3. Avvia Download
-            ui.download(tmp_path, 'Archivio_Attestati.csv')
-            ui.notify("Export completato!", color='green')
-
-        except Exception as e:
-            ui.notify(f"Errore Export: {e}", color='red')
+    def export_excel(formato='csv'):
+        """Scarica l'archivio con gli stessi filtri della tabella (in streaming dal DB)"""
+        download_export('attestati', formato, search=state['search'],
+                        date_start=state['date_start'], date_end=state['date_end'])
+
+    # --- RISTAMPA (documenti già generati, vedi attestati/artefatti.py) ---
+    def ristampa_selezionati():
+        ids = [r['ID'] for r in table_ref.selected if r.get('DOCUMENTO')]
+        if not ids:
+            ui.notify("Nessun attestato selezionato con documento disponibile", color='orange'); return
+        ui.download.from_url(f"/attestati/ristampa?{urlencode({'ids': ','.join(map(str, ids))})}")
 
     # --- LOGICA TABELLA ---
-    async def refresh_table():
+    async def fetch_page(**page):
         try:
-            rows = await asyncio.to_thread(AttestatiRepo.get_history, state['search'], state['date_start'], state['date_end'])
+            # Solo la pagina visibile (l'archivio può avere decine di migliaia di righe)
+            result = await AsyncAttestatiRepo.get_history_page(state['search'], state['date_start'], state['date_end'], **page)
+            rows = result['rows']
             
             today = date.today()
 
@@ -2459,11 +1898,13 @@ def archivio_page():
                 except Exception as e:
                     print(f"Errore calcolo validità riga {r.get('ID')}: {e}")
 
-            if table_ref: 
-                table_ref.rows = rows
-                table_ref.update()
+            return result
         except Exception as e:
             ui.notify(f"Errore caricamento storico: {e}", color='red')
+            return empty_page()
+
+    async def refresh_table():
+        if paged_table: await paged_table.refresh()
 
     # --- LAYOUT ---
     with ui.column().classes('w-full items-center p-8 max-w-screen-xl mx-auto bg-slate-50 min-h-screen'):
@@ -2475,7 +1916,11 @@ def archivio_page():
                 ui.icon('history', size='lg').classes('text-slate-400')
 
             # Bottone collegato alla funzione export_excel
-            ui.button('Esporta Excel', icon='file_download', on_click=export_excel).props('outline color=green')
+            with ui.row().classes('gap-2'):
+                ui.button('Ristampa selezionati', icon='print', on_click=ristampa_selezionati).props('outline color=primary')
+                ui.button('Esporta Excel', icon='file_download', on_click=export_excel).props('outline color=green')
+                if xlsx_available():
+                    ui.button('XLSX', icon='table_view', on_click=lambda: export_excel('xlsx')).props('outline color=green')
 
         with ui.card().classes('w-full p-4 mb-6 grid grid-cols-1 md:grid-cols-4 gap-4 items-end bg-white shadow-sm'):
             ui.input('Cerca...').props('outlined dense').classes('md:col-span-2').bind_value(state, 'search').on('keydown.enter', refresh_table)
@@ -2489,9 +1934,20 @@ def archivio_page():
             {'name': 'CORSO', 'label': 'Corso', 'field': 'CORSO', 'align': 'left'},
             {'name': 'SCADENZA_FMT', 'label': 'Scadenza', 'field': 'SCADENZA_FMT', 'align': 'center'},
             {'name': 'status', 'label': 'Stato', 'field': 'status', 'align': 'center'},
+            {'name': 'documento', 'label': 'Documento', 'field': 'DOCUMENTO', 'align': 'center'},
         ]
         
-        table_ref = ui.table(columns=cols, rows=[], row_key='ID').classes('w-full shadow-md bg-white')
+        paged_table = PagedTable(cols, 'ID', fetch_page, sort_by='DATA_FMT', descending=True)
+        table_ref = paged_table.table.classes('w-full shadow-md bg-white')
+        table_ref.set_selection('multiple')
+
+        table_ref.add_slot('body-cell-documento', r'''
+            <q-td key="documento" :props="props">
+                <q-btn v-if="props.row.DOCUMENTO" flat round dense icon="download" color="primary"
+                       :href="'/attestati/' + props.row.ID + '/documento'" target="_blank" />
+                <span v-else class="text-xs text-gray-400">-</span>
+            </q-td>
+        ''')
 
         table_ref.add_slot('body-cell-status', r'''
             <q-td key="status" :props="props">
@@ -2518,6 +1974,7 @@ def scadenzario_page():
         'mail_body': ''
     }
     table_ref = None
+    paged_table = None
     email_dialog = None # Riferimento al popup
 
     # --- HELPER ---
@@ -2605,68 +2062,34 @@ def scadenzario_page():
             ui.notify(f"Errore invio: {e}", color='red', multi_line=True)
 
     # --- LOGICA RECUPERO DATI ---
-    async def refresh_table():
+    async def fetch_page(**page):
         try:
-            all_rows = await asyncio.to_thread(AttestatiRepo.get_history, state['search'])
-            
-            if not all_rows:
-                if table_ref: table_ref.update()
-                return
-
-            today = date.today()
-            limit_date = today + timedelta(days=int(state['days_lookahead']))
-            
-            filtered_rows = []
-            
-            for r in all_rows:
-                scad_obj = None
-                try:
-                    raw = r.get('SCADENZA')
-                    if raw:
-                        if isinstance(raw, str): 
-                            scad_obj = datetime.strptime(raw, '%Y-%m-%d').date()
-                        elif isinstance(raw, datetime):
-                            scad_obj = raw.date()
-                        elif isinstance(raw, date): 
-                            scad_obj = raw
-                except: pass
-
-                if not scad_obj: continue 
-
-                include = False
-                days_left = (scad_obj - today).days
-                
-                if state['filter_mode'] == 'scaduti':
-                    if days_left < 0: include = True
-                elif state['filter_mode'] == 'in_scadenza':
-                    if -60 <= days_left <= state['days_lookahead']: include = True
-                else: 
-                    include = True
-
-                if include:
-                    r['GIORNI_RIMASTI'] = days_left
-                    r['SCADENZA_FMT'] = format_date(scad_obj)
-                    
-                    if days_left < 0:
-                        r['STATUS_COLOR'] = 'red'
-                        r['STATUS_LABEL'] = f'SCADUTO da {abs(days_left)} gg'
-                    elif days_left <= 30:
-                        r['STATUS_COLOR'] = 'orange'
-                        r['STATUS_LABEL'] = f'Scade tra {days_left} gg'
-                    else:
-                        r['STATUS_COLOR'] = 'green'
-                        r['STATUS_LABEL'] = f'Scade tra {days_left} gg'
-                    
-                    filtered_rows.append(r)
-
-            filtered_rows.sort(key=lambda x: x['GIORNI_RIMASTI'])
+            # Scadenza, finestra e ordinamento li calcola il DB (validita_anni del corso):
+            # arrivano solo le righe davvero in scadenza, una pagina alla volta
+            result = await AsyncAttestatiRepo.get_scadenze_page(
+                state['filter_mode'], int(state['days_lookahead']), state['search'], **page)
+
+            for r in result['rows']:
+                days_left = r['GIORNI_RIMASTI']
+                r['SCADENZA_FMT'] = format_date(r['SCADENZA'])
+
+                if days_left < 0:
+                    r['STATUS_COLOR'] = 'red'
+                    r['STATUS_LABEL'] = f'SCADUTO da {abs(days_left)} gg'
+                elif days_left <= 30:
+                    r['STATUS_COLOR'] = 'orange'
+                    r['STATUS_LABEL'] = f'Scade tra {days_left} gg'
+                else:
+                    r['STATUS_COLOR'] = 'green'
+                    r['STATUS_LABEL'] = f'Scade tra {days_left} gg'
 
-            if table_ref: 
-                table_ref.rows = filtered_rows
-                table_ref.update()
-                
+            return result
         except Exception as e:
             ui.notify(f"Errore caricamento scadenze: {e}", color='red')
+            return empty_page()
+
+    async def refresh_table():
+        if paged_table: await paged_table.refresh()
 
     # --- LAYOUT ---
     with ui.column().classes('w-full items-center p-8 bg-slate-50 min-h-screen'):
@@ -2711,7 +2134,8 @@ def scadenzario_page():
             {'name': 'azioni', 'label': '', 'field': 'azioni', 'align': 'right'},
         ]
         
-        table_ref = ui.table(columns=cols, rows=[], row_key='ID').classes('w-full shadow-md bg-white max-w-screen-xl')
+        paged_table = PagedTable(cols, 'ID', fetch_page, sort_by='SCADENZA_FMT')
+        table_ref = paged_table.table.classes('w-full shadow-md bg-white max-w-screen-xl')
 
         table_ref.add_slot('body-cell-status', r'''
             <q-td key="status" :props="props">
@@ -0,0 +1,50 @@
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+from attestati.placeholders import apply_edits, compile_part, part_keys
+
+
+def _body(*runs):
+    """Un paragrafo con un run per ogni testo (come Word quando spezza un segnaposto)."""
+    xml = ''.join(f'<w:r><w:t xml:space="preserve">{text}</w:t></w:r>' for text in runs)
+    return parse_xml(f'<w:body {nsdecls("w")}><w:p>{xml}</w:p></w:body>')
+
+
+def _render(root, data_map):
+    apply_edits(root, compile_part(root), data_map)
+    return root
+
+
+def _text(root):
+    return ''.join(t.text or '' for t in root.iter(qn('w:t')))
+
+
+def test_placeholder_split_across_runs():
+    root = _body('Sig. {{COG', 'NOME}} ', 'nato il {{DATA_NASCITA}}')
+    assert part_keys(compile_part(root)) == {'{{COGNOME}}', '{{DATA_NASCITA}}'}
+    _render(root, {'{{COGNOME}}': 'ROSSI', '{{DATA_NASCITA}}': '01/01/1980'})
+    assert _text(root) == 'Sig. ROSSI nato il 01/01/1980'
+    # Il valore va nel run dove il segnaposto inizia, i pezzi restanti spariscono
+    runs = root.findall(f'.//{qn("w:r")}')
+    assert [r.find(qn('w:t')).text for r in runs] == ['Sig. ROSSI', ' ', 'nato il 01/01/1980']
+
+
+def test_newline_and_tab_become_br_and_tab():
+    root = _render(_body('{{PROGRAMMA}}'), {'{{PROGRAMMA}}': 'Modulo 1\nModulo\t2'})
+    run = root.find(f'.//{qn("w:r")}')
+    assert [el.tag for el in run] == [qn('w:t'), qn('w:br'), qn('w:t'), qn('w:tab'), qn('w:t')]
+    assert _text(root) == 'Modulo 1Modulo2'
+
+
+def test_unknown_key_is_left_in_place():
+    root = _render(_body('{{NOME}} {{SCONOSCIUTO}}'), {'{{NOME}}': 'Mario'})
+    assert _text(root) == 'Mario {{SCONOSCIUTO}}'
+
+
+def test_none_value_becomes_empty():
+    root = _render(_body('[{{DOCENTE}}]'), {'{{DOCENTE}}': None})
+    assert _text(root) == '[]'
+
+
+def test_part_without_placeholders_has_no_edits():
+    assert compile_part(_body('Nessun segnaposto', ' {solo graffe}')) == []
@@ -0,0 +1,27 @@
+from db.search_index import FOLD_FROM, FOLD_TO, SubjectIndex, fold_text
+
+
+def test_fold_text_matches_wsm_normalizza():
+    # upper(btrim(regexp_replace(translate(testo, FOLD_FROM, FOLD_TO), '[^A-Za-z0-9]+', ' ', 'g')))
+    assert fold_text("D'Angelo Niccolò") == "D ANGELO NICCOLO"
+    assert fold_text("  Łukasz   Søren-Đorđe ") == "LUKASZ SOREN DORDE"
+    assert fold_text(None) == ""
+
+
+def test_fold_table_is_safe_in_a_sql_literal():
+    # La tabella finisce tra apici nella funzione della migrazione 8
+    assert len(FOLD_FROM) == len(FOLD_TO)
+    assert "'" not in FOLD_FROM + FOLD_TO and "\\" not in FOLD_FROM + FOLD_TO
+    assert FOLD_TO.isascii()
+
+
+def test_index_finds_accented_names_by_prefix():
+    index = SubjectIndex()
+    index.load([
+        {'ID_UTENTE': 1, 'COGNOME': "D'Angelo", 'NOME': 'Niccolò', 'CODICE_FISCALE': 'DNGNCC80A01H501X', 'IS_DOCENTE': 0},
+        {'ID_UTENTE': 2, 'COGNOME': 'Rossi', 'NOME': 'Mario', 'CODICE_FISCALE': None, 'IS_DOCENTE': 1},
+    ])
+    assert index.search_ids('dangelo') == [1]
+    assert index.search_ids('niccolo d') == [1]
+    assert index.search_ids('mario ros', solo_docenti=True) == [2]
+    assert index.search_ids('xyz') == []